@@ -1 +1 @@
-__all__ = ["context", "delegator", "dispatcher", "event", "future", "state"]
+__all__ = ["context", "delegator", "dispatcher", "event", "eventqueue", "future", "processcontext", "scheduler", "state", "statearray", "statetable"]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Run thousands of AsyncContexts on one event loop and queue events between them.
+
+To run:
+    python3 -m benchmarks.bench_async
+"""
+import asyncio
+import threading
+import time
+from context import AsyncContext
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def onPing(self, event, *args, **kwargs):
+        return 'Pong'
+
+async def measure(contexts, events):
+    cs = [AsyncContext('context%d' % i) for i in range(contexts)]
+    objs = [SampleObj() for c in cs]
+    for c, o in zip(cs, objs):
+        Dispatcher.add(obj=o, context=c)
+        c.start()
+
+    event = Event('Ping')
+    start = time.perf_counter()
+    futures = [Dispatcher.queue(event, objs[i % contexts], objs[(i + 1) % contexts]) for i in range(events)]
+    for future in futures:
+        await future
+    elapsed = time.perf_counter() - start
+
+    for c, o in zip(cs, objs):
+        Dispatcher.remove(o)
+        await c.stop()
+
+    return elapsed
+
+def run(events=100000):
+    for contexts in [10, 1000, 10000]:
+        elapsed = asyncio.run(measure(contexts, events))
+        print('%5d contexts, %d threads: %8.0f events/s' % (contexts, threading.active_count(), events / elapsed))
+
+if __name__ == '__main__':
+    run()
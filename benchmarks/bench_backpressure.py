@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Measure a Context with a slow consumer and a fast producer, with an unbounded
+queue and with a bounded queue under each policy.
+
+To run:
+    python3 -m benchmarks.bench_backpressure
+"""
+import queue
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from eventqueue import EventQueue
+
+class SampleObj:
+    def __init__(self):
+        self.processed = 0
+
+    def onDefault(self, event, *args, **kwargs):
+        self.processed += 1
+        # Simulate a slow handler.
+        sum(range(2000))
+
+def measure(event_queue, events, objs=8):
+    c = Context('Benchmark', event_queue=event_queue)
+    os = [SampleObj() for i in range(objs)]
+    for o in os:
+        Dispatcher.add(obj=o, context=c)
+    c.start()
+
+    peak = 0
+    failed = 0
+    event = Event('Refresh')
+    start = time.perf_counter()
+    for i in range(events):
+        try:
+            c.queue(event, None, os[i % objs])
+        except queue.Full:
+            failed += 1
+        if not i % 100:
+            peak = max(peak, event_queue.qsize())
+    produced = time.perf_counter() - start
+    c.stop()
+
+    for o in os:
+        Dispatcher.remove(o)
+
+    return produced, peak, sum([o.processed for o in os]), c.counters()
+
+def run(events=50000, maxsize=1000):
+    print('%d events, maxsize %d' % (events, maxsize))
+    queues = [('Unbounded', EventQueue())]
+    for policy in [EventQueue.POLICY_BLOCK, EventQueue.POLICY_FAIL, EventQueue.POLICY_DROP_OLDEST, EventQueue.POLICY_DROP_NEWEST, EventQueue.POLICY_COALESCE]:
+        queues.append((policy, EventQueue(maxsize, policy)))
+
+    for name, event_queue in queues:
+        produced, peak, processed, counters = measure(event_queue, events)
+        print('%-10s produce: %6.3f s, peak queue: %6d, processed: %6d, %s' % (name, produced, peak, processed, counters))
+
+if __name__ == '__main__':
+    run()
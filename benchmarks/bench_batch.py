@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compare queuing events one at a time with queuing them in batches.
+
+To run:
+    python3 -m benchmarks.bench_batch
+"""
+import time
+from context import Context
+from event import Event
+from eventqueue import EventQueue
+
+class SampleObj:
+    def onPing(self, event, *args, **kwargs):
+        pass
+
+def measure(events, batch):
+    c = Context('Benchmark')
+    objs = [SampleObj() for i in range(100)]
+    event = Event('Ping')
+    requests = [(event, None, objs[i % len(objs)]) for i in range(events)]
+
+    start = time.perf_counter()
+    if batch:
+        for i in range(0, events, batch):
+            c.queue_many(requests[i:i + batch])
+    else:
+        for request in requests:
+            c.queue(*request)
+    queued = time.perf_counter()
+    c.poll()
+    polled = time.perf_counter()
+
+    return events / (queued - start), events / (polled - queued)
+
+def measure_queue(items, batch):
+    q = EventQueue()
+    values = list(range(items))
+
+    start = time.perf_counter()
+    if batch:
+        for i in range(0, items, batch):
+            q.put_many(values[i:i + batch])
+    else:
+        for value in values:
+            q.put(value)
+    put = time.perf_counter()
+    if batch:
+        while q.get_many(False):
+            pass
+    else:
+        while not q.empty():
+            q.get(False)
+    got = time.perf_counter()
+
+    return items / (put - start), items / (got - put)
+
+def run(events=100000):
+    print('Context')
+    for batch in [0, 10, 100, 1000]:
+        print('batch %4d  queue: %8.0f events/s, process: %8.0f events/s' % ((batch,) + measure(events, batch)))
+    print('EventQueue')
+    for batch in [0, 10, 100, 1000]:
+        print('batch %4d  put: %9.0f items/s, get: %9.0f items/s' % ((batch,) + measure_queue(events, batch)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Measure bursts of state change notifications to many listeners, with and
+without coalescing in the listeners' Context.
+
+To run:
+    python3 -m benchmarks.bench_coalesce
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from eventqueue import EventQueue
+from state import State
+from state import StateEvent
+
+class SampleObj:
+    def __init__(self):
+        self.handled = 0
+
+    def onStateChange(self, event):
+        self.handled += 1
+        # Simulate a refresh.
+        sum(range(500))
+
+def measure(event_queue, listeners, bursts, burst):
+    c = Context('Benchmark', event_queue=event_queue)
+    src = SampleObj()
+    Dispatcher.add(obj=src, context=c)
+    os = [SampleObj() for i in range(listeners)]
+    for o in os:
+        Dispatcher.add(obj=o, context=c)
+        Dispatcher.add_listener(src, o)
+
+    start = time.perf_counter()
+    for i in range(bursts):
+        for j in range(burst):
+            Dispatcher.notify(StateEvent(State.EVENT_STATE_CHANGE, new_state=str(j)), src)
+        c.poll()
+    elapsed = time.perf_counter() - start
+
+    for o in os:
+        Dispatcher.remove(o)
+    Dispatcher.remove(src)
+
+    return elapsed, sum([o.handled for o in os])
+
+def run(listeners=100, bursts=20, burst=30):
+    print('%d listeners, %d bursts of %d notifications' % (listeners, bursts, burst))
+    for name, event_queue in [('None', EventQueue()), ('Merge', EventQueue(coalesce=EventQueue.COALESCE_MERGE)), ('Replace', EventQueue(coalesce=EventQueue.COALESCE_REPLACE))]:
+        elapsed, handled = measure(event_queue, listeners, bursts, burst)
+        print('%-8s %6.3f s, handled: %6d' % (name, elapsed, handled))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Compare compiled handler lookups against probing the object for each handler name,
+in a flat state and in a state nested four levels deep, whose handler is in
+its outermost state.
+
+To run:
+    python3 -m benchmarks.bench_delegator
+"""
+import timeit
+from delegator import Delegator
+
+class SampleObj:
+    def __init__(self):
+        self.state = 'Started'
+
+    def identify_state(self, event):
+        return self.state
+
+    def inStarted_onPause(self, *args, **kwargs):
+        pass
+
+    def inConnected_onPause(self, *args, **kwargs):
+        pass
+
+    def onDefault(self, *args, **kwargs):
+        pass
+
+def run(number=200000):
+    o = SampleObj()
+
+    for state in ['Started', 'Connected/Session/Streaming/Buffering']:
+        o.state = state
+        print(state)
+        for event in ['Pause', 'Stop']:
+            compiled = timeit.timeit(lambda: Delegator.get_handler(o, event), number=number)
+            resolved = timeit.timeit(lambda: Delegator.resolve_handler(o, event), number=number)
+            print('    %-6s compiled: %6.3f us, resolved: %6.3f us, speedup: %.1fx' %
+                  (event, compiled * 1e6 / number, resolved * 1e6 / number, resolved / compiled))
+
+if __name__ == '__main__':
+    run()
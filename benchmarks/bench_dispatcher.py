@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Measure Dispatcher.send when the source object is found from the caller.
+
+To run:
+    python3 -m benchmarks.bench_dispatcher
+"""
+import inspect
+import timeit
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+def get_caller_inspect():
+    # The previous implementation of Dispatcher.get_caller().
+    try:
+        return inspect.stack()[2][0].f_locals['self']
+    except KeyError:
+        pass
+
+    return None
+
+class SampleObj:
+    def __init__(self, peer=None):
+        self.peer = peer
+
+    def send(self, depth, event):
+        if depth:
+            return self.send(depth - 1, event)
+        return Dispatcher.send(event, None, self.peer)
+
+    def onPing(self, event, *args, **kwargs):
+        pass
+
+def run(number=2000, depths=(0, 20, 50)):
+    c = Context('Benchmark')
+    o0 = SampleObj()
+    Dispatcher.add(obj=o0, context=c)
+    o1 = SampleObj(peer=o0)
+    Dispatcher.add(obj=o1, context=c)
+    event = Event('Ping')
+
+    get_caller = Dispatcher.get_caller
+    for depth in depths:
+        frames = timeit.timeit(lambda: o1.send(depth, event), number=number)
+        try:
+            Dispatcher.get_caller = staticmethod(get_caller_inspect)
+            stack = timeit.timeit(lambda: o1.send(depth, event), number=number)
+        finally:
+            Dispatcher.get_caller = get_caller
+        print('depth %3d  frame: %8.2f us/send, inspect.stack: %8.2f us/send, speedup: %.0fx' %
+              (depth, frames * 1e6 / number, stack * 1e6 / number, stack / frames))
+
+    Dispatcher.remove(o0)
+    Dispatcher.remove(o1)
+
+if __name__ == '__main__':
+    run()
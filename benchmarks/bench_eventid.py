@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Measure dispatching events whose ids are interned EventIds, integers, and
+strings that are equal to the handler's event name but are not the same
+object, both through Delegator.get_handler() and through Dispatcher.send().
+
+To run:
+    python3 -m benchmarks.bench_eventid
+"""
+import timeit
+from context import Context
+from delegator import Delegator
+from dispatcher import Dispatcher
+from event import Event
+
+class NamedEvent:
+    """
+    An event whose id is not interned.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self):
+        return self.name
+
+class SampleObj:
+    def __init__(self):
+        self.state = 'Started'
+
+    def identify_state(self, event):
+        return self.state
+
+    def inStarted_onButtonPushed(self, event):
+        pass
+
+    def inStarted_on7(self, event):
+        pass
+
+def run(number=200000):
+    context = Context('EventId')
+    o = SampleObj()
+    Dispatcher.add(o, context=context)
+    send = Dispatcher().send
+
+    events = [('interned EventId:', Event('ButtonPushed')),
+              ('integer:', Event(7)),
+              ('string:', NamedEvent(''.join(['Button', 'Pushed'])))]
+    for label, event in events:
+        lookup = timeit.timeit(lambda: Delegator.get_handler(o, event), number=number)
+        sent = timeit.timeit(lambda: send(event, o, o), number=number)
+        print('%-20s get_handler: %6.3f us, send: %6.3f us' % (label, lookup * 1e6 / number, sent * 1e6 / number))
+
+    Dispatcher.remove(o)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Measure notifying 10k listeners spread over 16 contexts: queuing an event for
+each listener and waiting for each future, compared with Dispatcher.notify(),
+which posts one batch for each context and returns a FutureGroup.
+
+To run:
+    python3 -m benchmarks.bench_fanout
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def onTick(self, event):
+        pass
+
+def run(listeners=10000, contexts=16, rounds=10):
+    cs = [Context('Fanout-%d' % i) for i in range(contexts)]
+    source_context = Context('Source')
+    src = SampleObj()
+    Dispatcher.add(src, context=source_context)
+    objs = [SampleObj() for i in range(listeners)]
+    for i, o in enumerate(objs):
+        Dispatcher.add(o, context=cs[i % contexts])
+        Dispatcher.add_listener(src, o)
+    for c in cs:
+        c.start()
+
+    event = Event('Tick')
+    print('%d listeners over %d contexts' % (listeners, contexts))
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        futures = [Dispatcher.queue(event, src, o) for o in objs]
+        for future in futures:
+            future()
+    elapsed = (time.perf_counter() - start) / rounds
+    print('queue each listener:  %8.2f ms/notification' % (elapsed * 1e3))
+
+    fanout = 0
+    start = time.perf_counter()
+    for i in range(rounds):
+        posted = time.perf_counter()
+        group = Dispatcher.notify(event, src)
+        fanout += time.perf_counter() - posted
+        group()
+    elapsed = (time.perf_counter() - start) / rounds
+    print('notify:               %8.2f ms/notification, %.2f ms to post' % (elapsed * 1e3, fanout / rounds * 1e3))
+
+    for c in cs:
+        c.stop()
+    for o in objs:
+        Dispatcher.remove(o)
+    Dispatcher.remove(src)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Measure reading a large Future result with each result policy.
+
+To run:
+    python3 -m benchmarks.bench_future
+"""
+import time
+from future import Future
+
+def records(count):
+    return [{'id': i, 'name': 'record%d' % i, 'values': [i, i + 1, i + 2]} for i in range(count)]
+
+def measure(policy, result, reads):
+    f = Future(lambda: result)
+    f.result_policy = policy
+    f.process()
+
+    start = time.perf_counter()
+    for i in range(reads):
+        f()
+    return (time.perf_counter() - start) * 1e3
+
+def run(count=10000, reads=10):
+    result = records(count)
+    print('%d records, %d reads' % (count, reads))
+    for policy in [Future.RESULT_REFERENCE, Future.RESULT_COPY_ONCE, Future.RESULT_FROZEN, Future.RESULT_DEEPCOPY]:
+        print('%-9s %9.3f ms' % (policy, measure(policy, result, reads)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compare sending events through the default dispatcher on the class, as
+Dispatcher.send(...), with sending them through a bound method of a
+dispatcher instance, and run independent dispatcher shards in threads.
+
+To run:
+    python3 -m benchmarks.bench_instances
+"""
+import threading
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def onDefault(self, event, *args, **kwargs):
+        pass
+
+def measure_send(send, add, events):
+    c = Context('Benchmark')
+    o0 = SampleObj()
+    o1 = SampleObj()
+    add(o0, context=c)
+    add(o1, context=c)
+    event = Event('Event')
+
+    start = time.perf_counter()
+    for i in range(events):
+        send(event, o0, o1)
+    return events / (time.perf_counter() - start)
+
+def measure_shards(shards, objs):
+    """
+    Return the number of objects added, linked, and removed each second by
+    threads that each use their own dispatcher.
+    """
+    def shard():
+        d = Dispatcher.create()
+        c = Context('Shard')
+        hub = SampleObj()
+        d.add(hub, context=c)
+        os = [SampleObj() for i in range(objs)]
+        for o in os:
+            d.add(o, context=c)
+            d.add_listener(hub, o)
+        for o in os:
+            d.remove(o)
+
+    threads = [threading.Thread(target=shard) for i in range(shards)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return shards * objs / (time.perf_counter() - start)
+
+def run(events=200000, objs=50000):
+    print('Dispatcher().send:  %9.0f events/s' % measure_send(lambda *args: Dispatcher().send(*args), Dispatcher.add, events))
+    print('Dispatcher.send:    %9.0f events/s' % measure_send(lambda *args: Dispatcher.send(*args), Dispatcher.add, events))
+    d = Dispatcher.create()
+    print('bound send:         %9.0f events/s' % measure_send(d.send, d.add, events))
+    for shards in [1, 4]:
+        print('%d shards:           %9.0f objects/s' % (shards, measure_shards(shards, objs // shards)))
+
+if __name__ == '__main__':
+    run()
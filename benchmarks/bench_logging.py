@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Measure the per-event cost of logging when it is disabled and enabled.
+
+To run:
+    python3 -m benchmarks.bench_logging
+"""
+import io
+import logging
+import timeit
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def onPing(self, event, *args, **kwargs):
+        pass
+
+def measure(number):
+    c = Context('Benchmark')
+    o0 = SampleObj()
+    Dispatcher.add(obj=o0, context=c)
+    o1 = SampleObj()
+    Dispatcher.add(obj=o1, context=c)
+    event = Event('Ping')
+
+    send = timeit.timeit(lambda: Dispatcher.send(event, o0, o1), number=number)
+
+    for i in range(number):
+        c.queue(event, o0, o1)
+    queue = timeit.timeit(c.poll, number=1)
+
+    Dispatcher.remove(o0)
+    Dispatcher.remove(o1)
+
+    return send * 1e6 / number, queue * 1e6 / number
+
+def run(number=50000):
+    root = logging.getLogger()
+    handler = logging.StreamHandler(io.StringIO())
+    root.addHandler(handler)
+    try:
+        for level in [logging.WARNING, logging.INFO, logging.DEBUG]:
+            root.setLevel(level)
+            send, queue = measure(number)
+            print('%-7s send: %6.2f us/event, queue and poll: %6.2f us/event' % (logging.getLevelName(level), send, queue))
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(logging.WARNING)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Measure the memory used by queued events and by objects registered with the
+Dispatcher, with tracemalloc.
+
+To run:
+    python3 -m benchmarks.bench_memory
+"""
+import gc
+import tracemalloc
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from state import StateEvent
+
+class SampleObj:
+    pass
+
+def measure(function, count):
+    """
+    Return the number of bytes allocated by function for each of count items.
+    The result of function is kept alive until it is measured.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = function(count)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum([stat.size_diff for stat in after.compare_to(before, 'filename')])
+    del result
+    return size / count
+
+def queue_events(count):
+    c = Context('Benchmark')
+    o = SampleObj()
+    Dispatcher.add(obj=o, context=c)
+    events = [Event('Event') for i in range(count)]
+    futures = [c.queue(event, None, o) for event in events]
+    return c, o, events, futures
+
+def queue_state_events(count):
+    c = Context('Benchmark')
+    o = SampleObj()
+    Dispatcher.add(obj=o, context=c)
+    events = [StateEvent('StateChange', 'New', 'Old') for i in range(count)]
+    futures = [c.queue(event, None, o) for event in events]
+    return c, o, events, futures
+
+def add_nodes(count):
+    c = Context('Benchmark')
+    objs = [SampleObj() for i in range(count)]
+    for o in objs:
+        Dispatcher.add(obj=o, context=c)
+    return c, objs
+
+def run(count=100000):
+    print('%d items' % count)
+    print('queued Event:        %6.0f bytes/event' % measure(queue_events, count))
+    print('queued StateEvent:   %6.0f bytes/event' % measure(queue_state_events, count))
+
+    # Subtract the objects themselves, which belong to the application.
+    objs = measure(lambda count: [SampleObj() for i in range(count)], count)
+    print('registered node:     %6.0f bytes/node' % (measure(add_nodes, count) - objs))
+
+if __name__ == '__main__':
+    run()
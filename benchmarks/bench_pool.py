@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Measure PoolContext throughput across worker counts.
+The handler hashes a buffer, which releases the GIL, so the workers can run
+in parallel.
+
+To run:
+    python3 -m benchmarks.bench_pool
+"""
+import hashlib
+import time
+from context import Context
+from context import PoolContext
+from dispatcher import Dispatcher
+from event import Event
+
+DATA = bytes(64 * 1024)
+
+class SampleObj:
+    def onHash(self, event, *args, **kwargs):
+        return hashlib.sha256(DATA).digest()
+
+def measure(workers, objects, events):
+    source = Context('source')
+    src = SampleObj()
+    Dispatcher.add(obj=src, context=source)
+
+    c = PoolContext('pool', workers)
+    objs = [SampleObj() for i in range(objects)]
+    for o in objs:
+        Dispatcher.add(obj=o, context=c)
+    c.start()
+
+    event = Event('Hash')
+    start = time.perf_counter()
+    futures = [Dispatcher.queue(event, src, objs[i % objects]) for i in range(events)]
+    for future in futures:
+        future()
+    elapsed = time.perf_counter() - start
+
+    for o in objs + [src]:
+        Dispatcher.remove(o)
+    c.stop()
+
+    return events / elapsed
+
+def run(objects=256, events=20000):
+    for workers in [1, 2, 4, 8]:
+        print('%d workers: %8.0f events/s' % (workers, measure(workers, objects, events)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare queuing events with futures and posting them without futures: the
+memory allocated for each pending event and the throughput of queuing and
+processing them.
+
+To run:
+    python3 -m benchmarks.bench_post
+"""
+import gc
+import time
+import tracemalloc
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def onDefault(self, event, *args, **kwargs):
+        pass
+
+def setup():
+    c = Context('Benchmark')
+    o = SampleObj()
+    Dispatcher.add(obj=o, context=c)
+    return c, o
+
+def queue_events(c, o, event, count):
+    for i in range(count):
+        c.queue(event, None, o)
+
+def post_events(c, o, event, count):
+    for i in range(count):
+        c.post(event, None, o)
+
+def queue_batch(c, o, event, count):
+    c.queue_many([(event, None, o)] * count)
+
+def post_batch(c, o, event, count):
+    c.post_many([(event, None, o)] * count)
+
+def allocated(function, count):
+    """
+    Return the number of bytes that are allocated for each pending event.
+    """
+    c, o = setup()
+    event = Event('Event')
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    function(c, o, event, count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    Dispatcher.remove(o)
+    return (after - before) / count
+
+def throughput(function, count):
+    """
+    Return the number of events that are queued and processed each second.
+    """
+    c, o = setup()
+    event = Event('Event')
+
+    start = time.perf_counter()
+    function(c, o, event, count)
+    c.poll()
+    elapsed = time.perf_counter() - start
+
+    Dispatcher.remove(o)
+    return count / elapsed
+
+def run(count=200000):
+    print('%d events' % count)
+    for name, function in [('queue', queue_events), ('post', post_events), ('queue_many', queue_batch), ('post_many', post_batch)]:
+        print('%-10s %6.0f bytes/event, %9.0f events/s' % (name, allocated(function, count), throughput(function, count)))
+
+if __name__ == '__main__':
+    run()
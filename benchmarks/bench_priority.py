@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Measure the latency of high-priority events while a Context is flooded with
+low-priority events.
+
+To run:
+    python3 -m benchmarks.bench_priority
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from eventqueue import EventQueue
+from eventqueue import PriorityEventQueue
+
+class SampleObj:
+    def __init__(self):
+        self.latencies = []
+
+    def onBulk(self, event, *args, **kwargs):
+        # Simulate some work.
+        sum(range(200))
+
+    def onUrgent(self, event, queued):
+        self.latencies.append(time.perf_counter() - queued)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def measure(event_queue, bulk, urgent):
+    c = Context('Benchmark', event_queue=event_queue)
+    o = SampleObj()
+    Dispatcher.add(obj=o, context=c)
+    c.start()
+
+    bulk_event = Event('Bulk', Event.PRIORITY_LOW)
+    urgent_event = Event('Urgent', Event.PRIORITY_HIGH)
+    per_urgent = bulk // urgent
+    for i in range(urgent):
+        c.queue_many([(bulk_event, None, o)] * per_urgent)
+        c.queue(urgent_event, None, o, time.perf_counter())
+        time.sleep(0.0005)
+
+    c.stop()
+    Dispatcher.remove(o)
+
+    return percentile(o.latencies, 0.5) * 1e3, percentile(o.latencies, 0.99) * 1e3
+
+def run(bulk=100000, urgent=200):
+    print('%d low-priority events, %d high-priority events' % (bulk, urgent))
+    for name, event_queue in [('EventQueue', EventQueue()), ('PriorityEventQueue', PriorityEventQueue())]:
+        print('%-18s p50: %8.2f ms, p99: %8.2f ms' % ((name,) + measure(event_queue, bulk, urgent)))
+
+if __name__ == '__main__':
+    run()
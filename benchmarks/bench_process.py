@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Measure the throughput of a CPU-bound handler hosted in one Context thread per
+worker and in one ProcessContext per worker.  Threads are limited by the GIL;
+processes should scale with the number of cores.
+
+To run:
+    python3 -m benchmarks.bench_process
+"""
+import os
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from processcontext import ProcessContext
+
+class Worker:
+    def onWork(self, event, n):
+        total = 0
+        for i in range(n):
+            total += i * i
+        return total
+
+def measure_threads(workers, events, n):
+    cs = [Context('thread%d' % i) for i in range(workers)]
+    objs = []
+    for c in cs:
+        o = Worker()
+        Dispatcher.add(obj=o, context=c)
+        objs.append(o)
+        c.start()
+
+    start = time.perf_counter()
+    futures = [cs[i % workers].queue(Event('Work'), None, objs[i % workers], n) for i in range(events)]
+    for future in futures:
+        future()
+    elapsed = time.perf_counter() - start
+
+    for c, o in zip(cs, objs):
+        Dispatcher.remove(o)
+        c.stop()
+
+    return events / elapsed
+
+def measure_processes(workers, events, n):
+    cs = [ProcessContext('process%d' % i) for i in range(workers)]
+    objs = []
+    for c in cs:
+        c.start()
+        objs.append(c.add(Worker))
+
+    start = time.perf_counter()
+    futures = [objs[i % workers].context.queue(Event('Work'), None, objs[i % workers], n) for i in range(events)]
+    for future in futures:
+        future()
+    elapsed = time.perf_counter() - start
+
+    for c, o in zip(cs, objs):
+        c.remove(o)
+        c.stop()
+
+    return events / elapsed
+
+def run(events=400, n=100000):
+    print('%d cores' % os.cpu_count())
+    for workers in [1, 2, 4, 8]:
+        print('%d workers  threads: %6.0f events/s, processes: %6.0f events/s' %
+              (workers, measure_threads(workers, events, n), measure_processes(workers, events, n)))
+
+if __name__ == '__main__':
+    run()
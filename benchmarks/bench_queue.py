@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Measure a Context's queue with 1, 4, and 16 producer threads and one consumer.
+
+To run:
+    python3 -m benchmarks.bench_queue
+"""
+import threading
+import time
+from eventqueue import DequeQueue
+from eventqueue import EventQueue
+
+def measure(q, producers, items):
+    count = items // producers
+
+    def produce():
+        put = q.put
+        for i in range(count):
+            put(i)
+
+    def consume():
+        remaining = count * producers
+        while remaining:
+            remaining -= len(q.get_many())
+
+    consumer = threading.Thread(target=consume)
+    threads = [threading.Thread(target=produce) for i in range(producers)]
+
+    start = time.perf_counter()
+    consumer.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    consumer.join()
+
+    return count * producers / (time.perf_counter() - start)
+
+def run(items=400000):
+    for producers in [1, 4, 16]:
+        print('%2d producers  EventQueue: %9.0f items/s, DequeQueue: %9.0f items/s' %
+              (producers, measure(EventQueue(), producers, items), measure(DequeQueue(), producers, items)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Schedule and cancel timers with the shared Scheduler and with one
+threading.Timer per timer.
+
+To run:
+    python3 -m benchmarks.bench_scheduler
+"""
+import threading
+import time
+from scheduler import Scheduler
+
+def callback():
+    pass
+
+def measure_scheduler(number):
+    s = Scheduler('Benchmark')
+
+    start = time.perf_counter()
+    timers = [s.schedule(60, callback) for i in range(number)]
+    scheduled = time.perf_counter()
+    for timer in timers:
+        timer.cancel()
+    cancelled = time.perf_counter()
+
+    return (scheduled - start) * 1e6 / number, (cancelled - scheduled) * 1e6 / number
+
+def measure_threads(number):
+    start = time.perf_counter()
+    timers = []
+    for i in range(number):
+        timer = threading.Timer(60, callback)
+        timer.start()
+        timers.append(timer)
+    scheduled = time.perf_counter()
+    for timer in timers:
+        timer.cancel()
+    for timer in timers:
+        timer.join()
+    cancelled = time.perf_counter()
+
+    return (scheduled - start) * 1e6 / number, (cancelled - scheduled) * 1e6 / number
+
+def run(number=100000, thread_number=2000):
+    print('Scheduler       %6d timers  schedule: %7.2f us/timer, cancel: %7.2f us/timer' % ((number,) + measure_scheduler(number)))
+    print('threading.Timer %6d timers  schedule: %7.2f us/timer, cancel: %7.2f us/timer' % ((thread_number,) + measure_threads(thread_number)))
+
+if __name__ == '__main__':
+    run()
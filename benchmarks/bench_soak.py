@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Create and drop objects that are added to the Dispatcher, but never removed,
+with listener edges to a long-lived object, and report the memory in use and
+the number of nodes as the lifecycles add up.
+
+To run:
+    python3 -m benchmarks.bench_soak
+"""
+import gc
+import time
+import tracemalloc
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def __init__(self):
+        self.data = bytearray(64)
+
+    def onDefault(self, event, *args, **kwargs):
+        pass
+
+def run(lifecycles=2000000, report=200000):
+    c = Context('Benchmark')
+    source = SampleObj()
+    Dispatcher.add(obj=source, context=c)
+    event = Event('Tick')
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(1, lifecycles + 1):
+        o = SampleObj()
+        Dispatcher.add(obj=o, parent_obj=source, context=c)
+        Dispatcher.add_listener(source, o)
+        Dispatcher.add_listener(o, source)
+        if not i % 100:
+            Dispatcher.notify(event, source)
+            c.poll()
+
+        if not i % report:
+            del o
+            gc.collect()
+            print('%8d lifecycles: %8.0f KiB in use, %d nodes, %.0f lifecycles/s' %
+                  (i, tracemalloc.get_traced_memory()[0] / 1024, len(Dispatcher().nodes), i / (time.perf_counter() - start)))
+    tracemalloc.stop()
+
+    Dispatcher.remove(source)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Measure applying events to 1M instances of a protocol state-machine stored in
+a StateArray, compared with sending the events to State objects, each with
+its own owner and Dispatcher node.  The State objects are measured on a
+smaller population, since each of them takes about a kilobyte, and all of the
+results are reported as transitions per second.
+
+Every other instance is acknowledged, which has a side effect: the enter
+handler of the Connected state is called for it.
+
+To run:
+    python3 -m benchmarks.bench_statearray
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from state import State
+from statearray import StateArray
+from statearray import numpy
+from statetable import StateTable
+
+class StateObj:
+    def __init__(self):
+        self.state = State(self, 'Idle')
+
+    def identify_state(self, event):
+        return self.state.identify_state(event)
+
+    def inIdle_onConnect(self, event):
+        self.state.change_state('Connecting')
+
+    def inConnecting_onAck(self, event):
+        self.state.change_state('Connected')
+
+    def inConnected_onClose(self, event):
+        self.state.change_state('Idle')
+
+class ArrayObj:
+    table = StateTable(['Idle', 'Connecting', 'Connected'], 'Idle')
+    table.add('Idle', 'Connect', 'Connecting')
+    table.add('Connecting', 'Ack', 'Connected')
+    table.add('Connected', 'Close', 'Idle')
+
+    def __init__(self):
+        self.entered = 0
+
+    def inConnected_onEnter(self, event, index):
+        self.entered += 1
+
+def run(instances=1000000, objects=100000):
+    events = [Event('Connect'), Event('Ack'), Event('Close')]
+
+    context = Context('StateArray')
+    objs = [StateObj() for i in range(objects)]
+    for o in objs:
+        Dispatcher.add(o, context=context)
+    send = Dispatcher().send
+    start = time.perf_counter()
+    for event in events:
+        for o in objs:
+            send(event, o, o)
+    elapsed = time.perf_counter() - start
+    print('%-32s %12.0f transitions/s' % ('State, %d objects:' % objects, objects * len(events) / elapsed))
+    for o in objs:
+        Dispatcher.remove(o)
+    del objs
+
+    for use_numpy in [False] + ([True] if numpy is not None else []):
+        o = ArrayObj()
+        states = StateArray(o.table, instances, o, use_numpy=use_numpy)
+        start = time.perf_counter()
+        taken = states.process(events[0])
+        taken += states.process(events[1], range(0, instances, 2))
+        taken += states.process(events[2])
+        elapsed = time.perf_counter() - start
+        label = 'StateArray, %d, %s:' % (instances, 'numpy' if use_numpy else 'array')
+        print('%-32s %12.0f transitions/s, %d handlers' % (label, taken / elapsed, o.entered))
+
+if __name__ == '__main__':
+    run()
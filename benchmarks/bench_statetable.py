@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure the transition throughput of a three-state machine driven by events
+that the Dispatcher sends to its owner: State, whose handlers call
+change_state(), compared with a TableState that takes the transitions of a
+compiled StateTable.  The TableState is also measured with events passed to
+process() directly.
+
+To run:
+    python3 -m benchmarks.bench_statetable
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from state import State
+from statetable import StateTable
+from statetable import TableState
+
+class StateObj:
+    def __init__(self):
+        self.state = State(self, 'Stopped')
+
+    def identify_state(self, event):
+        return self.state.identify_state(event)
+
+    def inStopped_onStart(self, event):
+        self.state.change_state('Started')
+
+    def inStarted_onPause(self, event):
+        self.state.change_state('Paused')
+
+    def inPaused_onStop(self, event):
+        self.state.change_state('Stopped')
+
+    def inStarted_onEnter(self, event):
+        pass
+
+    def inPaused_onLeave(self, event):
+        pass
+
+class TableObj:
+    table = StateTable(['Stopped', 'Started', 'Paused'], 'Stopped')
+    table.add('Stopped', 'Start', 'Started')
+    table.add('Started', 'Pause', 'Paused')
+    table.add('Paused', 'Stop', 'Stopped')
+
+    def __init__(self):
+        self.state = TableState(self, self.table)
+
+    def identify_state(self, event):
+        return self.state.identify_state(event)
+
+    def onDefault(self, event):
+        return self.state.process(event)
+
+    def inStarted_onEnter(self, event):
+        pass
+
+    def inPaused_onLeave(self, event):
+        pass
+
+def run(transitions=300000):
+    context = Context('StateTable')
+    events = [Event('Start'), Event('Pause'), Event('Stop')]
+    rounds = transitions // len(events)
+
+    for label, cls in (('State:', StateObj), ('TableState:', TableObj)):
+        o = cls()
+        Dispatcher.add(o, context=context)
+        send = Dispatcher().send
+        start = time.perf_counter()
+        for i in range(rounds):
+            for event in events:
+                send(event, o, o)
+        elapsed = time.perf_counter() - start
+        print('%-24s %10.0f transitions/s' % (label, rounds * len(events) / elapsed))
+        Dispatcher.remove(o)
+
+    o = TableObj()
+    process = o.state.process
+    start = time.perf_counter()
+    for i in range(rounds):
+        for event in events:
+            process(event)
+    elapsed = time.perf_counter() - start
+    print('%-24s %10.0f transitions/s' % ('TableState.process():', rounds * len(events) / elapsed))
+
+if __name__ == '__main__':
+    run()
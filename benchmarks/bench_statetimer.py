@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Measure restarting a state timer: scheduling a new timeout event and
+cancelling the previous one, as State did before it had a StateTimer,
+compared with restarting a StateTimer, and with re-entering a timed state
+through State.change_state().  Also reports the number of timers that are
+pending in the scheduler.
+
+To run:
+    python3 -m benchmarks.bench_statetimer
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from future import ScheduledFuture
+from state import State
+from state import StateEvent
+
+class SampleObj:
+    def __init__(self):
+        self.state = State(self, 'Idle', {'Waiting': 60})
+
+    def identify_state(self, event):
+        return self.state.identify_state(event)
+
+def measure(label, function, restarts):
+    start = time.perf_counter()
+    for i in range(restarts):
+        function()
+    elapsed = time.perf_counter() - start
+    print('%-24s %8.2f us/restart, %6d pending timers' %
+          (label, elapsed / restarts * 1e6, len(ScheduledFuture.scheduler)))
+
+def run(restarts=100000):
+    context = Context('StateTimer')
+    o = SampleObj()
+    Dispatcher.add(o, context=context)
+
+    timer = [None]
+    def reschedule():
+        if timer[0]:
+            timer[0].cancel()
+        timer[0] = Dispatcher.schedule(60, StateEvent(State.EVENT_TIMEOUT, new_state='Waiting', priority=Event.PRIORITY_HIGH), o, o)
+    measure('schedule and cancel:', reschedule, restarts)
+    timer[0].cancel()
+
+    o.state.change_state('Waiting')
+    measure('StateTimer.restart():', lambda: o.state.state_timer.restart(60, 'Waiting'), restarts)
+
+    def reenter():
+        o.state.change_state('Idle')
+        o.state.change_state('Waiting')
+    measure('change_state():', reenter, restarts)
+
+    o.state.stop_state_timer()
+    Dispatcher.remove(o)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Stress the Dispatcher registry with threads that concurrently add, remove,
+and drop objects, change listeners, and send and notify events.
+
+To run:
+    python3 -m benchmarks.bench_stress
+"""
+import random
+import threading
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+class SampleObj:
+    def __init__(self):
+        self.handled = 0
+
+    def onDefault(self, event, *args, **kwargs):
+        self.handled += 1
+
+def measure(threads, operations, hubs=8):
+    contexts = [Context('Stress-%d' % i) for i in range(threads)]
+    hub_objs = [SampleObj() for i in range(hubs)]
+    for i, hub in enumerate(hub_objs):
+        Dispatcher.add(obj=hub, context=contexts[i % threads])
+    errors = []
+    event = Event('Tick')
+
+    def work(index):
+        c = contexts[index]
+        rand = random.Random(index)
+        objs = []
+        for i in range(operations):
+            try:
+                choice = rand.random()
+                if choice < 0.2 or not objs:
+                    o = SampleObj()
+                    Dispatcher.add(obj=o, context=c)
+                    Dispatcher.add_listener(rand.choice(hub_objs), o)
+                    Dispatcher.add_listener(o, rand.choice(hub_objs))
+                    objs.append(o)
+                elif choice < 0.3:
+                    Dispatcher.remove(objs.pop(rand.randrange(len(objs))))
+                elif choice < 0.4:
+                    # Drop the object without removing it.
+                    objs.pop(rand.randrange(len(objs)))
+                elif choice < 0.6:
+                    Dispatcher.remove_listener(rand.choice(hub_objs), rand.choice(objs))
+                elif choice < 0.8:
+                    Dispatcher.notify(event, rand.choice(hub_objs))
+                else:
+                    Dispatcher.post(event, rand.choice(objs), rand.choice(hub_objs))
+                if not i % 50:
+                    c.poll()
+            except Exception as e:
+                errors.append(e)
+        c.poll()
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    for c in contexts:
+        c.poll()
+
+    # Every remaining edge must lead to a live object.
+    dead = sum([1 for hub in hub_objs for node in Dispatcher().get_node(hub).listeners if node.obj is None])
+    for hub in hub_objs:
+        Dispatcher.remove(hub)
+
+    return threads * operations / elapsed, len(errors), dead
+
+def run(operations=50000):
+    for threads in [1, 4, 16]:
+        rate, errors, dead = measure(threads, operations // threads)
+        print('%2d threads: %8.0f operations/s, errors: %d, dead edges: %d' % (threads, rate, errors, dead))
+
+if __name__ == '__main__':
+    run()
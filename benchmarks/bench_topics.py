@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Measure notifying 1k listeners of 100 event types when each listener only
+handles one of them: listeners of all events, which are queued every event
+and look up a handler that does not exist, compared with listeners that
+subscribe to the id of the event they handle.
+
+To run:
+    python3 -m benchmarks.bench_topics
+"""
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+
+def sample_class(name):
+    def handler(self, event):
+        self.events += 1
+    return type('SampleObj' + name, (object,), {'events': 0, 'on' + name: handler})
+
+def run(listeners=1000, event_types=100, rounds=5):
+    context = Context('Topics')
+    source_context = Context('Source')
+    src = sample_class('Source')()
+    Dispatcher.add(src, context=source_context)
+
+    names = ['Event%d' % i for i in range(event_types)]
+    events = [Event(name) for name in names]
+    classes = [sample_class(name) for name in names]
+    objs = [classes[i % event_types]() for i in range(listeners)]
+    for o in objs:
+        Dispatcher.add(o, context=context)
+    context.start()
+
+    print('%d listeners, %d event types, each listener handles one' % (listeners, event_types))
+
+    for label, subscribe in (('listen to all events:', False), ('subscribe by event id:', True)):
+        for i, o in enumerate(objs):
+            if subscribe:
+                Dispatcher.add_listener(src, o, [events[i % event_types]])
+            else:
+                Dispatcher.add_listener(src, o)
+
+        start = time.perf_counter()
+        for i in range(rounds):
+            for event in events:
+                Dispatcher.notify(event, src)
+            # Wait for the events to be processed.
+            Dispatcher.queue(events[0], src, objs[0])()
+        elapsed = (time.perf_counter() - start) / (rounds * event_types)
+        print('%-24s %8.2f us/notification' % (label, elapsed * 1e6))
+
+        for o in objs:
+            Dispatcher.remove_listener(src, o)
+
+    context.stop()
+    for o in objs:
+        Dispatcher.remove(o)
+    Dispatcher.remove(src)
+
+if __name__ == '__main__':
+    run()
@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
+import asyncio
 import logging
 import queue
 import threading
 from dispatcher import Dispatcher
+from event import Event
+from eventqueue import EventQueue
+from future import AsyncFuture
+from future import AsyncScheduledFuture
 from future import Future
+from future import PostedEvent
 from future import ScheduledFuture
 
 class Context:
-    def __init__(self, name):
+    log = logging.getLogger('Context')
+
+    def __init__(self, name, result_policy=None, event_queue=None):
+        """
+        If a result policy is specified, it is used for the futures of this context.
+        If an event queue is not specified, an EventQueue is used.  A DequeQueue
+        has less contention when many threads queue events for this context,
+        and a PriorityEventQueue processes events in order of their priority.
+        An EventQueue or PriorityEventQueue with a maxsize limits the number of
+        pending events, and its policy decides what happens to the events that
+        are queued while it is full.  One with a coalesce mode processes
+        duplicate events that are pending at the same time once.
+        """
         super(Context, self).__init__()
-        self.log = logging.getLogger(self.__class__.__name__)
 
-        self.__queue = queue.Queue()
+        self.name = name
+        self.result_policy = result_policy
+
+        self.__queue = event_queue if event_queue is not None else EventQueue()
         self.__thread = threading.Thread(None, self.run, name)
 
     def queue(self, event, src_obj, dst_obj, *args, **kwargs):
@@ -22,12 +42,65 @@ class Context:
         if not dst_obj:
             raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
 
-        self.log.debug('Queue ' + str(event()) + '.')
-        future = Future(Dispatcher.send, event, src_obj, dst_obj, *args, **kwargs)
+        self.log.debug('Queue %s.', event)
+        future = self.__prepare(Future(Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs), event)
         self.__queue.put(future)
 
         return future
 
+    def queue_many(self, events, *args, **kwargs):
+        """
+        Queue a batch of events with one lock acquisition.
+        Each item of events is a tuple of (event, src_obj, dst_obj), and each
+        event is processed with args and kwargs.
+        Returns a list of the futures of the events.
+        """
+        futures = []
+        for event, src_obj, dst_obj in events:
+            if not dst_obj:
+                raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+
+            self.log.debug('Queue %s.', event)
+            futures.append(self.__prepare(Future(Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs), event))
+
+        self.__queue.put_many(futures)
+
+        return futures
+
+    def post(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Queue an event like queue(), but without a future, for events whose
+        result is not needed.
+        """
+        if not dst_obj:
+            raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Post %s.', event)
+        self.__queue.put(self.__post(event, src_obj, dst_obj, args, kwargs, None))
+
+    def post_many(self, events, *args, group=None, **kwargs):
+        """
+        Queue a batch of events like queue_many(), but without futures.
+        If a FutureGroup is specified, each event is counted in the group when
+        it is processed, and the group must already include the events.  The
+        group is not passed to the event handlers.
+        """
+        posted = []
+        for event, src_obj, dst_obj in events:
+            if not dst_obj:
+                raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+
+            self.log.debug('Post %s.', event)
+            posted.append(self.__post(event, src_obj, dst_obj, args, kwargs, group))
+
+        try:
+            self.__queue.put_many(posted)
+        except Exception:
+            # None of the events were queued, so do not leave the group waiting for them.
+            for item in posted:
+                item.cancel()
+            raise
+
     def schedule(self, seconds, event, src_obj, dst_obj, *args, **kwargs):
         """
         Schedule a timer that will queue an event after the specified number of seconds.
@@ -35,9 +108,45 @@ class Context:
         if not dst_obj:
             raise Exception('Cannot schedule event, ' + str(event()) + ', without a destination.')
 
-        self.log.debug('Schedule ' + str(event()) + '.')
-        return ScheduledFuture(seconds, self.__queue.put, Dispatcher.send, event, src_obj, dst_obj, *args, **kwargs)
+        self.log.debug('Schedule %s.', event)
+        return self.__prepare(ScheduledFuture(seconds, self.__put_scheduled, Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs), event)
+
+    def __put_scheduled(self, future):
+        """
+        Queue a scheduled future.  This runs on the scheduler thread that all
+        timers share, so it must not wait for a full queue or raise; if the
+        queue's policy rejects the future, the future raises queue.Full.
+        """
+        try:
+            self.__queue.put(future, block=False)
+        except queue.Full as e:
+            self.log.warning('Cannot queue a scheduled event, the queue is full.')
+            future.function = Context.__raise
+            future.args = (e,)
+            future.kwargs = {}
+            future.process()
 
+    @staticmethod
+    def __raise(excpt):
+        raise excpt
+
+    def __prepare(self, future, event):
+        # Apply the context's result policy and the event's priority to a future.
+        if self.result_policy:
+            future.result_policy = self.result_policy
+
+        priority = getattr(event, 'priority', Event.PRIORITY_NORMAL)
+        if priority != Event.PRIORITY_NORMAL:
+            future.priority = priority
+
+        return future
+
+    @staticmethod
+    def __post(event, src_obj, dst_obj, args, kwargs, group):
+        posted = PostedEvent(Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs)
+        posted.priority = getattr(event, 'priority', Event.PRIORITY_NORMAL)
+        posted.group = group
+        return posted
 
     def start(self):
         """
@@ -58,7 +167,16 @@ class Context:
         # Wait for the thread to terminate.
         self.__thread.join(timeout)
 
-        return not self.__thread.isAlive()
+        return not self.__thread.is_alive()
+
+    def counters(self):
+        """
+        Return the number of events that the queue's policy has blocked,
+        failed, dropped, and coalesced, or an empty dict if the queue does
+        not count them.
+        """
+        counters = getattr(self.__queue, 'counters', None)
+        return counters() if counters else {}
 
     def run(self):
         """
@@ -79,16 +197,323 @@ class Context:
 
     def __process(self, block):
         """
-        Returns True if an item was processed.
+        Process the batch of items that are currently queued.
+        Returns True if the items were processed.
         Returns False if the termination event was processed.
         """
-        future = self.__queue.get(block)
-        if future:
-            self.log.info('Dequeue ' + str(future) + '.')
-            future.process()
-            return True
+        for future in self.__queue.get_many(block):
+            if future:
+                self.log.info('Dequeue %s.', future)
+                future.process()
+            else:
+                return False
+
+        return True
+
+    def __str__(self):
+        return 'name: %s, queue size: %s' % (self.name, str(self.__queue.qsize()))
+
+class AsyncContext:
+    """
+    A context that processes its queue as a task on an asyncio event loop
+    instead of on a dedicated thread.  Many contexts can share one loop.
+
+    Events can be queued from any thread.  The futures returned by queue() and
+    schedule() can be awaited by coroutines on the loop; calling them blocks,
+    so that must only be done from other threads.
+    """
+    log = logging.getLogger('AsyncContext')
+
+    def __init__(self, name, loop=None, result_policy=None):
+        """
+        If a loop is not specified, the running loop is used.
+        If a result policy is specified, it is used for the futures of this context.
+        """
+        super(AsyncContext, self).__init__()
+
+        self.name = name
+        self.result_policy = result_policy
+        self.loop = loop if loop else asyncio.get_running_loop()
+
+        self.__queue = asyncio.Queue()
+        self.__task = None
+
+    def queue(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Queue an event to be processed by dst_obj when the context's
+        run() or poll() function is called.
+        """
+        if not dst_obj:
+            raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Queue %s.', event)
+        future = AsyncFuture(self.loop, Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs)
+        if self.result_policy:
+            future.result_policy = self.result_policy
+        self.__put(future)
+
+        return future
+
+    def queue_many(self, events, *args, **kwargs):
+        """
+        Queue a batch of events.  If this is not the loop's thread, the batch
+        is handed to the loop in one call.
+        Each item of events is a tuple of (event, src_obj, dst_obj), and each
+        event is processed with args and kwargs.
+        Returns a list of the futures of the events.
+        """
+        futures = []
+        for event, src_obj, dst_obj in events:
+            if not dst_obj:
+                raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+
+            self.log.debug('Queue %s.', event)
+            future = AsyncFuture(self.loop, Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs)
+            if self.result_policy:
+                future.result_policy = self.result_policy
+            futures.append(future)
+
+        if AsyncFuture.in_loop(self.loop):
+            self.__put_many(futures)
         else:
-            return False
+            self.loop.call_soon_threadsafe(self.__put_many, futures)
+
+        return futures
+
+    def post(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Queue an event like queue(), but without a future, for events whose
+        result is not needed.
+        """
+        if not dst_obj:
+            raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Post %s.', event)
+        self.__put(PostedEvent(Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs))
+
+    def post_many(self, events, *args, group=None, **kwargs):
+        """
+        Queue a batch of events like queue_many(), but without futures.
+        If a FutureGroup is specified, each event is counted in the group when
+        it is processed, and the group must already include the events.
+        """
+        posted = []
+        for event, src_obj, dst_obj in events:
+            if not dst_obj:
+                raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+
+            self.log.debug('Post %s.', event)
+            item = PostedEvent(Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs)
+            item.group = group
+            posted.append(item)
+
+        if AsyncFuture.in_loop(self.loop):
+            self.__put_many(posted)
+        else:
+            self.loop.call_soon_threadsafe(self.__put_many, posted)
+
+    def schedule(self, seconds, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Schedule a loop timer that will queue an event after the specified number of seconds.
+        """
+        if not dst_obj:
+            raise Exception('Cannot schedule event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Schedule %s.', event)
+        future = AsyncScheduledFuture(self.loop, seconds, self.__put, Dispatcher.deliver, event, src_obj, dst_obj, *args, **kwargs)
+        if self.result_policy:
+            future.result_policy = self.result_policy
+
+        return future
+
+    def start(self):
+        """
+        Start the event processing task.
+        """
+        self.log.debug('Start.')
+        if AsyncFuture.in_loop(self.loop):
+            self.__task = self.loop.create_task(self.run())
+        else:
+            self.__task = asyncio.run_coroutine_threadsafe(self.run(), self.loop)
+
+    def stop(self):
+        """
+        Stop the event processing task by queuing the termination event.
+        Returns the task, which can be awaited on the loop to wait for the
+        queued events to be processed.
+        """
+        self.log.debug('Stop.')
+
+        # Add the termination event.
+        self.__put(None)
+
+        return self.__task
+
+    async def run(self):
+        """
+        Start the event processing loop.
+        The loop will continue until the termination event is processed.
+        """
+        while True:
+            future = await self.__queue.get()
+            if future:
+                self.log.info('Dequeue %s.', future)
+                future.process()
+            else:
+                break
+
+    def poll(self):
+        """
+        This function will process each event currently added in the queue.
+        It must be called on the loop's thread.
+        """
+        while not self.__queue.empty():
+            future = self.__queue.get_nowait()
+            if future:
+                self.log.info('Dequeue %s.', future)
+                future.process()
+
+    def __put(self, future):
+        if AsyncFuture.in_loop(self.loop):
+            self.__queue.put_nowait(future)
+        else:
+            self.loop.call_soon_threadsafe(self.__queue.put_nowait, future)
+
+    def __put_many(self, futures):
+        for future in futures:
+            self.__queue.put_nowait(future)
+
+    def __str__(self):
+        return 'name: %s, queue size: %s' % (self.name, str(self.__queue.qsize()))
+
+class PoolContext:
+    """
+    A context that spreads its objects across several worker contexts, each
+    with its own thread.
+
+    Every object is assigned to one worker by its hash, so all of the events
+    for an object are processed in order on the same thread.  When an object
+    is added to the Dispatcher with a PoolContext, it is registered with its
+    worker's context, so events between objects on different workers are
+    queued while events between objects on the same worker are processed
+    right away.  Objects added with a parent inherit the parent's worker.
+    """
+    log = logging.getLogger('PoolContext')
+
+    def __init__(self, name, workers, result_policy=None, event_queue_factory=None):
+        """
+        If an event queue factory is specified, it is called to create the
+        event queue of each worker context.
+        """
+        super(PoolContext, self).__init__()
+
+        if workers < 1:
+            raise ValueError('A pool context needs at least one worker.')
+
+        self.name = name
+        self.contexts = [Context('%s-%d' % (name, i), result_policy, event_queue_factory() if event_queue_factory else None) for i in range(workers)]
+
+    def context_for(self, obj):
+        """
+        Return the worker context that processes events for obj.
+        """
+        return self.contexts[hash(obj) % len(self.contexts)]
+
+    def queue(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Queue an event in the worker context of dst_obj.
+        """
+        if not dst_obj:
+            raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+
+        return self.context_for(dst_obj).queue(event, src_obj, dst_obj, *args, **kwargs)
+
+    def queue_many(self, events, *args, **kwargs):
+        """
+        Queue a batch of events, with one batch for each worker context.
+        Returns a list of the futures of the events, in the order of events.
+        """
+        events = list(events)
+
+        batches = {}
+        for index, (event, src_obj, dst_obj) in enumerate(events):
+            if not dst_obj:
+                raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+            batches.setdefault(self.context_for(dst_obj), []).append(index)
+
+        futures = [None] * len(events)
+        for context, indexes in batches.items():
+            for index, future in zip(indexes, context.queue_many([events[index] for index in indexes], *args, **kwargs)):
+                futures[index] = future
+
+        return futures
+
+    def post(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Post an event in the worker context of dst_obj.
+        """
+        if not dst_obj:
+            raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+
+        self.context_for(dst_obj).post(event, src_obj, dst_obj, *args, **kwargs)
+
+    def post_many(self, events, *args, group=None, **kwargs):
+        """
+        Post a batch of events, with one batch for each worker context.
+        """
+        batches = {}
+        for event, src_obj, dst_obj in events:
+            if not dst_obj:
+                raise Exception('Cannot post event, ' + str(event()) + ', without a destination.')
+            batches.setdefault(self.context_for(dst_obj), []).append((event, src_obj, dst_obj))
+
+        for context, batch in batches.items():
+            context.post_many(batch, *args, group=group, **kwargs)
+
+    def schedule(self, seconds, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Schedule an event in the worker context of dst_obj.
+        """
+        if not dst_obj:
+            raise Exception('Cannot schedule event, ' + str(event()) + ', without a destination.')
+
+        return self.context_for(dst_obj).schedule(seconds, event, src_obj, dst_obj, *args, **kwargs)
+
+    def start(self):
+        """
+        Start the worker threads.
+        """
+        self.log.debug('Start.')
+        for context in self.contexts:
+            context.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker threads.
+        Returns True if all of the workers have stopped.
+        """
+        self.log.debug('Stop.')
+        stopped = True
+        for context in self.contexts:
+            stopped = context.stop(timeout) and stopped
+        return stopped
+
+    def poll(self):
+        """
+        Process the events currently queued in each worker context.
+        """
+        for context in self.contexts:
+            context.poll()
+
+    def counters(self):
+        """
+        Return the sum of the counters of the worker contexts.
+        """
+        counters = {}
+        for context in self.contexts:
+            for name, count in context.counters().items():
+                counters[name] = counters.get(name, 0) + count
+        return counters
 
     def __str__(self):
-        return 'name: %s, queue size: %s' % (self.__thread.getName(), str(self.__queue.qsize()))
+        return 'name: %s, workers: [%s]' % (self.name, ', '.join([str(context) for context in self.contexts]))
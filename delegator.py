@@ -1,7 +1,18 @@
 #!/usr/bin/env python3
 import logging
+import types
+import weakref
 
-class Delegator:
+class DelegatorType(type):
+    """
+    A metaclass that discards the compiled handler tables whenever one of the
+    Delegator's naming conventions is reconfigured.
+    """
+    def __setattr__(cls, name, value):
+        super(DelegatorType, cls).__setattr__(name, value)
+        cls.invalidate()
+
+class Delegator(metaclass=DelegatorType):
     """
     An object that processes events by finding and calling an appropriate event handler.
 
@@ -13,6 +24,19 @@ class Delegator:
     EVENT_HANDLER_FORMAT = 'on{0}'
     DEFAULT_EVENT_HANDLER_FORMAT = 'onDefault'
 
+    """
+    States can be nested by joining their names with the separator, as in
+    'Connected/Authenticating'.  The state handlers of a nested state are
+    resolved from the innermost state to the outermost one, and the state's
+    name in a handler name is its path joined with underscores, as in
+    inConnected_Authenticating_onToken.  Events in STATE_LOCAL_EVENTS are
+    only handled by the handlers of the innermost state, since they are sent
+    for each of the states that are entered or left.
+    Set the separator to None to disable nested states.
+    """
+    STATE_SEPARATOR = '/'
+    STATE_LOCAL_EVENTS = ('Enter', 'Leave')
+
     """
     Pre-defined function names that are used to refine an event or state name.
     """
@@ -22,6 +46,27 @@ class Delegator:
     #
     log = logging.getLogger('Delegator')
 
+    """
+    Compiled handler tables, which are keyed by class and do not keep their
+    classes alive.  Each holds the unbound identify_event and identify_state
+    functions of the class, a dict of handlers keyed by (state, event), the
+    size of the class's dict, the dicts of its bases and their sizes, and the
+    pins of the identifiers.  A handler entry holds the unbound handler, or
+    None if the class does not handle the event in that state, the handler
+    names that were probed to find it, and the pins of the identifiers and
+    the handler.  A pin is the (dict, name, value) of a class attribute that
+    the entry was compiled from, where dict is the dict of the base that
+    defines it, or None for the class itself.  The class's own dict is not
+    kept, since it refers to the class.
+    A table is compiled again when an attribute is added to or removed from
+    the class or one of its bases, which changes the sizes, or when one of
+    the pinned attributes of an entry is replaced.  A class's handlers are
+    cleared when they reach MAX_COMPILED_HANDLERS entries, so states and
+    events that are built dynamically do not grow them forever.
+    """
+    MAX_COMPILED_HANDLERS = 4096
+    _classes = weakref.WeakKeyDictionary()
+
     @staticmethod
     def event_handler(func):
         """
@@ -36,23 +81,23 @@ class Delegator:
         Will be changed to:
             def greenButtonPushed(self, *args, **kwargs):
                 print 'Green button pushed.'
-                Delegator.log.debug('Process event, ' + 'greenButtonPushed.')
+                Delegator.log.debug('Process event, %s.', 'greenButtonPushed')
                 function = Delegator.get_handler(self, 'greenButtonPushed')
                 if function:
-                    Delegator.log.info('Dispatching event, greenButtonPushed, to function, ' + str(function.__name__) + '.')
+                    Delegator.log.info('Dispatching event, %s, to function, %s.', 'greenButtonPushed', function.__name__)
                     return function(*args, **kwargs)
                 else:
                     Delegator.log.debug('Unhandled event, greenButtonPushed.')
         """
         def process(self, *args, **kwargs):
             func(self, *args, **kwargs)
-            Delegator.log.debug('Process event, ' + func.__name__ + '.')
+            Delegator.log.debug('Process event, %s.', func.__name__)
             function = Delegator.get_handler(self, func.__name__)
             if function:
-                Delegator.log.info('Dispatching event, ' + func.__name__ + ', to function, ' + str(function.__name__) + '.')
+                Delegator.log.info('Dispatching event, %s, to function, %s.', func.__name__, function.__name__)
                 return function(*args, **kwargs)
             else:
-                Delegator.log.debug('Unhandled event, ' + func.__name__ + '.')
+                Delegator.log.debug('Unhandled event, %s.', func.__name__)
         return process
 
     @staticmethod
@@ -61,17 +106,106 @@ class Delegator:
 
     @staticmethod
     def get_handler(obj, event):
+        """
+        Return the best-fitting event handler bound to obj, or None.
+        Handlers are resolved once per (class, state, event) and cached until
+        the class changes.  An object that sets a handler, or
+        identify_event() or identify_state(), as an instance attribute is
+        probed like resolve_handler() does.
+        An event with a stale() method that returns True is not handled.
+        """
+        cls = obj.__class__
+        original = event
+        namespace = cls.__dict__
+        compiled = Delegator._classes.get(cls)
+        if compiled is None or len(namespace) != compiled[3] or (compiled[4] and tuple(map(len, compiled[4])) != compiled[5]):
+            # An attribute was added to or removed from the class or a base.
+            compiled = Delegator.__compile_class(cls)
+        identify_event, identify_state, handlers = compiled[0], compiled[1], compiled[2]
+
+        if identify_event is None:
+            # The class resolves attributes dynamically, so it cannot be compiled.
+            return Delegator.resolve_handler(obj, event)
+
+        instance = getattr(obj, '__dict__', None)
+        if instance and (Delegator.FUNCTION_ID_EVENT in instance or Delegator.FUNCTION_ID_STATE in instance):
+            return Delegator.resolve_handler(obj, event)
+
+        if identify_event:
+            event = identify_event(obj, event)
+        if not event:
+            Delegator.log.info('Ignoring event, %s.', event)
+            return None
+
+        if hasattr(event, '__call__'):
+            stale = getattr(event, 'stale', None)
+            if stale is not None and stale():
+                # The event withdrew itself, for example a stale state timeout.
+                return None
+            event = event()
+
+        state = identify_state(obj, event) if identify_state else None
+
+        try:
+            function, names, pins = handlers[(state, event)]
+        except (KeyError, TypeError):
+            function, names, pins = Delegator.__compile_handler(cls, event, state)
+        else:
+            for mapping, name, value in pins:
+                if (namespace if mapping is None else mapping).get(name) is not value:
+                    # An identifier or handler of the class was replaced.
+                    Delegator._classes.pop(cls, None)
+                    return Delegator.get_handler(obj, original)
+
+        if instance and not names.isdisjoint(instance):
+            # The handler is shadowed by an instance attribute.
+            return Delegator.__find_handler(obj, event, state)
+
+        if function is None:
+            return None
+
+        return function.__get__(obj, cls)
+
+    @staticmethod
+    def find_class_handler(cls, event, state=None):
+        """
+        Return the best-fitting unbound event handler of a class for an event
+        id in a state, or None.  The handler is resolved with the same naming
+        conventions as get_handler(), and is cached in the compiled handler
+        tables.  Bind it to an instance with __get__().
+        """
+        try:
+            compiled = Delegator._classes[cls]
+            function, _, pins = compiled[2][(state, event)]
+            if not Delegator.__changed(cls, compiled) and Delegator.__pinned(cls, pins):
+                return function
+        except (KeyError, TypeError):
+            pass
+        return Delegator.__compile_handler(cls, event, state)[0]
+
+    @staticmethod
+    def resolve_handler(obj, event):
+        """
+        Find the best-fitting event handler by probing obj for each of the
+        handler names.  This is the uncompiled equivalent of get_handler().
+        """
         event = Delegator.__identify_event(obj, event)
         if not event:
-            Delegator.log.info('Ignoring event, ' + str(event) + '.')
+            Delegator.log.info('Ignoring event, %s.', event)
             return None
 
         if hasattr(event, '__call__'):
+            stale = getattr(event, 'stale', None)
+            if stale is not None and stale():
+                return None
             event = event()
 
+        return Delegator.__find_handler(obj, event, Delegator.__identify_state(obj, event))
+
+    @staticmethod
+    def __find_handler(obj, event, state):
         function = None
 
-        state = Delegator.__identify_state(obj, event)
         if state is not None:
             function = Delegator.find_state_handler(obj, event, state)
 
@@ -80,6 +214,20 @@ class Delegator:
 
         return function
 
+    @staticmethod
+    def invalidate(cls=None):
+        """
+        Discard the compiled handler tables for a class and its subclasses, or
+        for all classes if cls is not specified.  The tables are compiled
+        again when a class changes, so this only releases them.
+        """
+        if cls is None:
+            Delegator._classes.clear()
+        else:
+            for key in list(Delegator._classes):
+                if issubclass(key, cls):
+                    Delegator._classes.pop(key, None)
+
     @staticmethod
     def find_state_handler(obj, event, state, allow_defaults=True):
         """
@@ -89,18 +237,37 @@ class Delegator:
 
         function = None
 
-        # Look for state event-handlers.
-        if Delegator.STATE_HANDLER_FORMAT:
-            Delegator.log.debug('State processing of ' + str(event) + ' in ' + str(state) + '.')
-            function = Delegator.find_exact_handler(obj, Delegator.STATE_HANDLER_FORMAT.format(event, state))
+        for state in Delegator.state_names(event, state):
+            # Look for state event-handlers.
+            if Delegator.STATE_HANDLER_FORMAT:
+                Delegator.log.debug('State processing of %s in %s.', event, state)
+                function = Delegator.find_exact_handler(obj, Delegator.STATE_HANDLER_FORMAT.format(event, state))
 
-        # Look for the default state event-handler.
-        if not function and Delegator.DEFAULT_STATE_HANDLER_FORMAT and allow_defaults:
-            Delegator.log.debug('Default state processing of ' + str(event) + ' in ' + str(state) + '.')
-            function = Delegator.find_exact_handler(obj, Delegator.DEFAULT_STATE_HANDLER_FORMAT.format(event, state))
+            # Look for the default state event-handler.
+            if not function and Delegator.DEFAULT_STATE_HANDLER_FORMAT and allow_defaults:
+                Delegator.log.debug('Default state processing of %s in %s.', event, state)
+                function = Delegator.find_exact_handler(obj, Delegator.DEFAULT_STATE_HANDLER_FORMAT.format(event, state))
+
+            if function:
+                break
 
         return function
 
+    @staticmethod
+    def state_names(event, state):
+        """
+        Return the names that are used in state handler names for an event in
+        a state, from the innermost state to the outermost one.
+        """
+        separator = Delegator.STATE_SEPARATOR
+        if not separator or not isinstance(state, str) or separator not in state:
+            return [state]
+
+        path = state.split(separator)
+        if event in Delegator.STATE_LOCAL_EVENTS:
+            return ['_'.join(path)]
+        return ['_'.join(path[:depth]) for depth in range(len(path), 0, -1)]
+
     @staticmethod
     def find_event_handler(obj, event, allow_defaults=True):
         """
@@ -112,12 +279,12 @@ class Delegator:
 
         # Look for event handers.
         if Delegator.EVENT_HANDLER_FORMAT:
-            Delegator.log.debug('Find handler for event, ' + str(event) + '.')
+            Delegator.log.debug('Find handler for event, %s.', event)
             function = Delegator.find_exact_handler(obj, Delegator.EVENT_HANDLER_FORMAT.format(event))
 
         # Look for the default event-handler.
         if not function and Delegator.DEFAULT_EVENT_HANDLER_FORMAT and allow_defaults:
-            Delegator.log.debug('Find default handler for event, ' + str(event) + '.')
+            Delegator.log.debug('Find default handler for event, %s.', event)
             function = Delegator.find_exact_handler(obj, Delegator.DEFAULT_EVENT_HANDLER_FORMAT.format(event))
 
         return function
@@ -128,12 +295,12 @@ class Delegator:
         Attempt to find an exact event-handler.
         If an event-handler is available, return it; otherwise return None.
         """
-        Delegator.log.debug('Look for function, ' + str(function_name) + '.')
+        Delegator.log.debug('Look for function, %s.', function_name)
 
         if hasattr(obj, function_name):
             return getattr(obj, function_name)
         else:
-            Delegator.log.debug('Failed to find function, ' + str(function_name) + '.')
+            Delegator.log.debug('Failed to find function, %s.', function_name)
             return None
 
     @staticmethod
@@ -155,3 +322,111 @@ class Delegator:
                 return function(event)
 
         return None
+
+    @staticmethod
+    def __changed(cls, compiled):
+        # Return True if an attribute was added to or removed from the class
+        # or one of its bases since it was compiled.
+        return len(cls.__dict__) != compiled[3] or tuple(map(len, compiled[4])) != compiled[5]
+
+    @staticmethod
+    def __pinned(cls, pins):
+        # Return True if none of the pinned class attributes were replaced.
+        namespace = cls.__dict__
+        for mapping, name, value in pins:
+            if (namespace if mapping is None else mapping).get(name) is not value:
+                return False
+        return True
+
+    @staticmethod
+    def __compile_class(cls):
+        # Object's attributes cannot be changed, so it is not checked.
+        dicts = tuple(base.__dict__ for base in cls.__mro__[1:] if base is not object)
+        layout = (len(cls.__dict__), dicts, tuple(map(len, dicts)))
+        pins = []
+
+        # Classes that implement __getattr__ can create handlers on demand, so
+        # mark them with an identify_event of None to use resolve_handler().
+        if hasattr(cls, '__getattr__'):
+            compiled = (None, None, {}) + layout + ((),)
+        else:
+            compiled = (Delegator.__compile_identifier(cls, Delegator.FUNCTION_ID_EVENT, pins),
+                        Delegator.__compile_identifier(cls, Delegator.FUNCTION_ID_STATE, pins),
+                        {}) + layout + (tuple(pins),)
+
+        Delegator._classes[cls] = compiled
+        return compiled
+
+    @staticmethod
+    def __compile_identifier(cls, name, pins):
+        # Return a function that is called as function(obj, event), or False.
+        function = Delegator.__find_class_function(cls, name, pins)
+        if not function:
+            return False
+        if isinstance(function, types.FunctionType):
+            return function
+        return lambda obj, event: function.__get__(obj, cls)(event)
+
+    @staticmethod
+    def __compile_handler(cls, event, state):
+        # Resolve the handler names in the same order as resolve_handler().
+        # The handlers of nested states are compiled into the same entry, so
+        # they cost the same as the handlers of a flat state once compiled.
+        names = []
+        if state is not None:
+            for name in Delegator.state_names(event, state):
+                if Delegator.STATE_HANDLER_FORMAT:
+                    names.append(Delegator.STATE_HANDLER_FORMAT.format(event, name))
+                if Delegator.DEFAULT_STATE_HANDLER_FORMAT:
+                    names.append(Delegator.DEFAULT_STATE_HANDLER_FORMAT.format(event, name))
+        if Delegator.EVENT_HANDLER_FORMAT:
+            names.append(Delegator.EVENT_HANDLER_FORMAT.format(event))
+        if Delegator.DEFAULT_EVENT_HANDLER_FORMAT:
+            names.append(Delegator.DEFAULT_EVENT_HANDLER_FORMAT.format(event))
+
+        compiled = Delegator._classes.get(cls)
+        if compiled is None or Delegator.__changed(cls, compiled):
+            compiled = Delegator.__compile_class(cls)
+
+        # Keep the names up to the handler that is found, since an instance
+        # attribute with one of them would shadow it.  The entry is pinned to
+        # the identifiers too, since they identified its state and event.
+        function = None
+        pins = list(compiled[6])
+        for index, name in enumerate(names):
+            function = Delegator.__find_class_function(cls, name, pins)
+            if function:
+                names = names[:index + 1]
+                break
+
+        Delegator.log.debug('Compiled handler for event, %s, in %s, to %s.', event, state, function)
+        entry = (function, frozenset(names), tuple(pins))
+        handlers = compiled[2]
+        if len(handlers) >= Delegator.MAX_COMPILED_HANDLERS:
+            handlers.clear()
+        try:
+            handlers[(state, event)] = entry
+        except TypeError:
+            # The state or event cannot be used as a key, so it is not cached.
+            pass
+        return entry
+
+    @staticmethod
+    def __find_class_function(cls, name, pins):
+        """
+        Return the raw class attribute for name so that it can be bound to an
+        instance with __get__(), or None if the class does not define it.
+        The attribute is pinned if the class defines it.
+        """
+        for base in cls.__mro__:
+            if name in base.__dict__:
+                function = base.__dict__[name]
+                pins.append((None if base is cls else base.__dict__, name, function))
+                if not function:
+                    return None
+                if not hasattr(function, '__get__'):
+                    # Plain callables are returned as-is, like getattr() does.
+                    function = staticmethod(function)
+                return function
+
+        return None
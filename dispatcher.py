@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
-import inspect
+import contextvars
 import logging
+import sys
+import threading
+import weakref
 from typing import Dict, Generic, TypeVar
 from delegator import Delegator
 from event import Event
+from future import FutureGroup
 from future import FutureMimic
 
 NodeType = TypeVar('NodeType')
@@ -16,6 +20,23 @@ class Singleton(type):
             cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
 
+class DispatcherMethod:
+    """
+    A method that is bound to the dispatcher instance it is called on, or to
+    the default dispatcher when it is called on the class, so that
+    Dispatcher.send(...) and dispatcher.send(...) both work.
+    """
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            obj = Singleton._instances.get(cls)
+            if obj is None:
+                obj = cls()
+        return self.function.__get__(obj, cls)
+
 class Dispatcher(metaclass=Singleton):
 
     """
@@ -24,41 +45,144 @@ class Dispatcher(metaclass=Singleton):
     find and dispatch events and manage the object's context.  Nodes are also
     organized in a parent-child relationship so that objects can send events to
     their parents.
+
+    Nodes are keyed by the id of their object and only hold weak references to
+    their object and its parent, so an object that is never removed does not
+    leak.  When the object dies, its node and its listener edges are removed.
+    Objects that do not support weak references are held until they are
+    removed.
+
+    A listener is notified of all of a source's events, or subscribes to the
+    ids of the events it handles.  Subscriptions are indexed by event id, so
+    notify() only touches the listeners that are interested in the event.
+
+    The registry can be changed from any thread.  Changes are serialized by
+    striped locks, so unrelated changes do not contend, and notify() iterates
+    a copy of the listeners that is taken under the lock.
+
+    Dispatcher() returns the default dispatcher, which is also used when the
+    methods are called on the class, as in Dispatcher.send(...).  Independent
+    dispatchers, each with their own registry, are made with create(), and
+    their methods are called on the instance.
     """
     class Node(Generic[NodeType]):
         """
         An reference to an object that processes events by finding and calling
         an appropriate event handler.
         """
-        def __init__(self, obj, parent, context):
+        __slots__ = ('ref', 'parent_ref', 'context', 'listeners', 'topics', 'sources', 'removed')
+
+        def __init__(self, obj, parent, context, callback=None):
             super(Dispatcher.Node, self).__init__()
-            self.log = logging.getLogger(self.__class__.__name__)
 
-            self.obj = obj
-            self.parent = parent
+            self.ref = Dispatcher.reference(obj, callback)
+            self.parent_ref = Dispatcher.reference(parent) if parent is not None else None
             self.context = context
-            self.listeners = set()
+
+            # The nodes that are notified of all of this node's events, and the
+            # nodes that this node is a listener of.  They are sets, or an
+            # empty tuple until the first edge is added.
+            self.listeners = ()
+            self.sources = ()
+
+            # The nodes that are notified of this node's events by event id,
+            # or None until the first subscription is added.
+            self.topics = None
+
+            # Whether the node has been removed from the registry, after which
+            # no edges are added to it.
+            self.removed = False
+
+        @property
+        def obj(self):
+            return self.ref()
+
+        @property
+        def parent(self):
+            return self.parent_ref() if self.parent_ref else None
 
         def __str__(self):
             return 'obj: %s, parent: %s, context: %s, listeners: %s' % (str(self.obj), str(self.parent), str(self.context), str(len(self.listeners)))
 
+    class StrongReference:
+        """
+        A reference to an object that does not support weak references.
+        It is called like a weak reference to get the object.
+        """
+        __slots__ = ('obj', 'key')
+
+        def __init__(self, obj, key):
+            self.obj = obj
+            self.key = key
+
+        def __call__(self):
+            return self.obj
+
+    """
+    The object whose event handler is currently running in this thread or task.
+    It is used to identify the source of an event when it cannot be found from
+    the caller's frame.
+    """
+    sender = contextvars.ContextVar('sender', default=None)
+
+    """
+    The locks that serialize changes to the registry and to the listener edges.
+    Each object or node uses one of them, chosen by its id.  They are reentrant
+    because weak reference callbacks can run while a lock is held.
+    """
+    locks = [threading.RLock() for i in range(64)]
+
+    log = logging.getLogger('Dispatcher')
+
     def __init__(self) -> None:
         super(Dispatcher, self).__init__()
-        self.log = logging.getLogger(self.__class__.__name__)
 
         self.nodes: NodeDictType={}
 
+        # The callback of the nodes' weak references, which is only bound once.
+        self.__callback = self.__collect
+
+    @classmethod
+    def create(cls):
+        """
+        Create a dispatcher that is independent of the default dispatcher.
+        """
+        self = cls.__new__(cls)
+        self.__init__()
+        return self
+
     @staticmethod
-    def get_caller():
+    def reference(obj, callback=None):
+        """
+        Return a weak reference to obj, keyed by the id of obj, that calls
+        callback when obj dies.  If obj does not support weak references,
+        return a StrongReference.
+        """
         try:
-            return inspect.stack()[2][0].f_locals['self']
-        except KeyError:
-            pass
-
-        return None
+            return weakref.KeyedRef(obj, callback, id(obj))
+        except TypeError:
+            return Dispatcher.StrongReference(obj, id(obj))
 
     @staticmethod
-    def add(obj, parent_obj=None, context: object=None):
+    def get_caller(depth=2):
+        """
+        Return the object that called into the Dispatcher.
+        The caller is the 'self' of the frame that is depth frames above this
+        one.  If that frame is not a method, then the object whose event handler
+        is currently running is returned instead.
+        """
+        try:
+            caller = sys._getframe(depth).f_locals.get('self')
+        except ValueError:
+            caller = None
+
+        if caller is None:
+            caller = Dispatcher.sender.get()
+
+        return caller
+
+    @DispatcherMethod
+    def add(self, obj, parent_obj=None, context: object=None):
         """
         Add an object to the dispatcher.
         """
@@ -66,8 +190,6 @@ class Dispatcher(metaclass=Singleton):
         if not obj:
             raise Exception('A node cannot be added without an object.')
 
-        self = Dispatcher()
-
         # If a context is not specified, get the parent's context.
         if not context:
             if parent_obj:
@@ -78,30 +200,186 @@ class Dispatcher(metaclass=Singleton):
         if not context:
             raise Exception('A node cannot be added without a context.  Failed to find the context for the object, ' + str(obj) + '.')
 
-        node: Dispatcher.Node = self.Node(obj, parent_obj, context)
-        self.nodes[obj] = node
+        # Pooled contexts assign each object to one of their workers.
+        context_for = getattr(context, 'context_for', None)
+        if context_for:
+            context = context_for(obj)
 
-    @staticmethod
-    def remove(obj):
-        # If an object is not specified, raise an exception.
-        self = Dispatcher()
+        node: Dispatcher.Node = self.Node(obj, parent_obj, context, self.__callback)
+        with Dispatcher.lock(id(obj)):
+            old_node = self.nodes.get(id(obj))
+            self.nodes[id(obj)] = node
+
+        if old_node is not None:
+            self.__detach(old_node)
 
+    @DispatcherMethod
+    def remove(self, obj):
+        """
+        Remove an object from the dispatcher, along with its listener edges.
+        Objects that support weak references are also removed when they die.
+        """
+        # If an object is not specified, raise an exception.
         if not obj:
             raise Exception('A node cannot be added without an object.')
 
-        #FIXME: This obj could still be added as a listener to other objects.
-        del self.nodes[obj]
+        with Dispatcher.lock(id(obj)):
+            node = self.nodes.pop(id(obj))
+        self.__detach(node)
+
+    @staticmethod
+    def lock(key):
+        """
+        Return the lock for an id.
+        """
+        return Dispatcher.locks[(key >> 4) & 63]
+
+    def __collect(self, ref):
+        """
+        Remove the node of an object that has died.
+        """
+        with Dispatcher.lock(ref.key):
+            node = self.nodes.get(ref.key)
+            if node is None or node.ref is not ref:
+                return
+            del self.nodes[ref.key]
+        self.__detach(node)
+
+    def __detach(self, node):
+        """
+        Remove a node's listener edges in both directions.
+        """
+        with Dispatcher.lock(id(node)):
+            node.removed = True
+            sources = node.sources
+            listeners = set(node.listeners)
+            if node.topics:
+                listeners.update(*node.topics.values())
+            node.sources = ()
+            node.listeners = ()
+            node.topics = None
+
+        for src_node in sources:
+            Dispatcher.__unsubscribe(src_node, node, None)
+        for dst_node in listeners:
+            Dispatcher.__unlink(dst_node, 'sources', node)
+
+    @staticmethod
+    def __link(node, name, other):
+        """
+        Add other to the edges of node with the attribute name.
+        Returns False if node has been removed.
+        """
+        with Dispatcher.locks[(id(node) >> 4) & 63]:
+            if node.removed:
+                return False
+            edges = getattr(node, name)
+            if edges:
+                edges.add(other)
+            else:
+                setattr(node, name, {other})
+            return True
 
     @staticmethod
-    def send(event, src_obj, dst_obj, *args, **kwargs):
+    def __unlink(node, name, other):
+        """
+        Remove other from the edges of node with the attribute name.
+        """
+        with Dispatcher.locks[(id(node) >> 4) & 63]:
+            edges = getattr(node, name)
+            if edges:
+                edges.discard(other)
+
+    @staticmethod
+    def __subscribe(src_node, dst_node, ids):
+        """
+        Add dst_node to the listeners of src_node, or to its subscribers of
+        each of the event ids if ids is not None.
+        Returns False if either node has been removed.
+        """
+        with Dispatcher.locks[(id(src_node) >> 4) & 63]:
+            if src_node.removed or dst_node.removed:
+                return False
+            if ids is None:
+                if src_node.listeners:
+                    src_node.listeners.add(dst_node)
+                else:
+                    src_node.listeners = {dst_node}
+            else:
+                if src_node.topics is None:
+                    src_node.topics = {}
+                for event_id in ids:
+                    subscribers = src_node.topics.get(event_id)
+                    if subscribers:
+                        subscribers.add(dst_node)
+                    else:
+                        src_node.topics[event_id] = {dst_node}
+            return True
+
+    @staticmethod
+    def __unsubscribe(src_node, dst_node, ids):
+        """
+        Remove dst_node from the subscribers of src_node for each of the event
+        ids, or from all of its listeners and subscribers if ids is None.
+        Returns True if dst_node is still a listener of src_node.
+        """
+        with Dispatcher.locks[(id(src_node) >> 4) & 63]:
+            if ids is None and src_node.listeners:
+                src_node.listeners.discard(dst_node)
+
+            topics = src_node.topics
+            if not topics:
+                return dst_node in src_node.listeners
+
+            for event_id in (list(topics) if ids is None else ids):
+                subscribers = topics.get(event_id)
+                if subscribers:
+                    subscribers.discard(dst_node)
+                    if not subscribers:
+                        del topics[event_id]
+
+            if dst_node in src_node.listeners:
+                return True
+            return any(dst_node in subscribers for subscribers in topics.values())
+
+    @staticmethod
+    def __event_ids(events):
+        """
+        Return the ids of a list of events, or None if events is None.
+        """
+        if events is None:
+            return None
+        return [event() if hasattr(event, '__call__') else event for event in events]
+
+    @DispatcherMethod
+    def send(self, event, src_obj, dst_obj, *args, **kwargs):
         """
         Send an event to a dst_obj object.
         If the dst_obj object is in the same context, the event will be processed right away.
         Otherwise, the event will be queued and processed later.
         """
-        self = Dispatcher()
+        self.log.debug('Send event, %s.', event)
 
-        self.log.debug('Send event, ' + str(event()) + '.')
+        if not event:
+            raise Exception('Must specify an event.')
+
+        if src_obj is None:
+            src_obj = Dispatcher.get_caller()
+
+        src_node = self.get_node(src_obj)
+        dst_node = self.get_node(dst_obj)
+
+        return self.send_internal(event, src_node, dst_node, False, *args, **kwargs)
+
+    @DispatcherMethod
+    def post(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Send an event to a dst_obj object when the result is not needed.
+        If the dst_obj object is in the same context, the event will be processed right away.
+        Otherwise, the event will be queued without a future.
+        Returns None.
+        """
+        self.log.debug('Post event, %s.', event)
 
         if not event:
             raise Exception('Must specify an event.')
@@ -112,17 +390,23 @@ class Dispatcher(metaclass=Singleton):
         src_node = self.get_node(src_obj)
         dst_node = self.get_node(dst_obj)
 
-        return self.send_internal(event, src_node, dst_node, queued=False, *args, **kwargs)
+        if src_node.context != dst_node.context:
+            if not dst_node.context:
+                raise TypeError('This destination node does not have a context.')
+
+            dst_node.context.post(event, src_node.obj, dst_node.obj, *args, **kwargs)
+        else:
+            self._delegate(event, dst_node.obj, *args, **kwargs)
 
-    @staticmethod
-    def queue(event, src_obj, dst_obj, *args, **kwargs):
+    @DispatcherMethod
+    def queue(self, event, src_obj, dst_obj, *args, **kwargs):
         """
         Send an event to a dst_obj object.
         The event will always be queued and processed later.
+        If the destination's context has a bounded queue that is full, the
+        queue's policy may block, raise queue.Full, or return a cancelled future.
         """
-        self = Dispatcher()
-
-        self.log.debug('Queue event, ' + str(event()) + '.')
+        self.log.debug('Queue event, %s.', event)
 
         if not event:
             raise Exception('Must specify an event.')
@@ -133,18 +417,16 @@ class Dispatcher(metaclass=Singleton):
         src_node = self.get_node(src_obj)
         dst_node = self.get_node(dst_obj)
 
-        return self.send_internal(event, src_node, dst_node, queued=True, *args, **kwargs)
+        return self.send_internal(event, src_node, dst_node, True, *args, **kwargs)
 
-    @staticmethod
-    def schedule(seconds, event, src_obj, dst_obj, *args, **kwargs):
+    @DispatcherMethod
+    def schedule(self, seconds, event, src_obj, dst_obj, *args, **kwargs):
         """
         Schedule an event to be sent to a dst_obj.
         The event will always be queued.
         Returns a Timer object for the event.  The Timer object can be used to cancel the event.
         """
-        self = Dispatcher()
-
-        self.log.debug('Schedule event, ' + str(event()) + ', for ' + str(seconds) + ' seconds.')
+        self.log.debug('Schedule event, %s, for %s seconds.', event, seconds)
 
         if not event:
             raise Exception('Must specify an event.')
@@ -160,32 +442,52 @@ class Dispatcher(metaclass=Singleton):
 
         return dst_node.context.schedule(seconds, event, src_node.obj, dst_node.obj, *args, **kwargs)
 
-    @staticmethod
-    def add_listener(src_obj, dst_obj):
-        self = Dispatcher()
-
+    @DispatcherMethod
+    def add_listener(self, src_obj, dst_obj, events=None):
+        """
+        Add dst_obj as a listener of the events that src_obj notifies.
+        If events is None, dst_obj is notified of all of the events; otherwise,
+        it is only notified of events with the same ids as the listed events.
+        Ids are matched before the listener's identify_event() is applied.
+        """
         src_node = self.get_node(src_obj)
         dst_node = self.get_node(dst_obj)
 
-        #FIXME: Need to use a WeakSet or similar.
-        src_node.listeners.add(dst_node)
+        # Either object can be removed concurrently, so each edge is only added
+        # while its node is still registered.  The listener's edge is added
+        # first, so that a removal of the listener that happens in between
+        # finds it and removes the subscription.
+        if Dispatcher.__link(dst_node, 'sources', src_node):
+            if Dispatcher.__subscribe(src_node, dst_node, Dispatcher.__event_ids(events)):
+                return
+            Dispatcher.__unlink(dst_node, 'sources', src_node)
 
-    @staticmethod
-    def remove_listener(src_obj, dst_obj):
-        self = Dispatcher()
+        raise Exception('Cannot add a listener, the source, ' + str(src_obj) + ', or the listener, ' + str(dst_obj) + ', has been removed.')
 
+    @DispatcherMethod
+    def remove_listener(self, src_obj, dst_obj, events=None):
+        """
+        Remove dst_obj as a listener of src_obj.
+        If events is None, all of its subscriptions are removed; otherwise,
+        only its subscriptions to the listed events are removed.
+        """
         src_node = self.get_node(src_obj)
         dst_node = self.get_node(dst_obj)
 
-        src_node.listeners.discard(dst_node)
+        if not Dispatcher.__unsubscribe(src_node, dst_node, Dispatcher.__event_ids(events)):
+            Dispatcher.__unlink(dst_node, 'sources', src_node)
 
-    @staticmethod
-    def notify(event, src_obj=None, *args, **kwargs):
+    @DispatcherMethod
+    def notify(self, event, src_obj=None, *args, **kwargs):
         """
-        Send an event to the parent.
+        Send an event to the listeners of all events, and to the listeners that
+        subscribed to the id of the event.
+        The events for each of the listeners' contexts are queued as a batch,
+        so the policy of a bounded queue is applied to each event in the batch.
+        The results are not needed, so the events are posted without futures.
+        Returns a FutureGroup that can be called to wait for all of the events
+        to be processed.
         """
-        self = Dispatcher()
-
         if not event:
             raise Exception('Must specify an event.')
 
@@ -194,22 +496,61 @@ class Dispatcher(metaclass=Singleton):
 
         src_node = self.get_node(src_obj)
 
-        for dst_node in src_node.listeners:
-            self.send_internal(event, src_node, dst_node, queued=True, *args, **kwargs)
+        with Dispatcher.lock(id(src_node)):
+            listeners = tuple(src_node.listeners)
+            if src_node.topics:
+                subscribers = src_node.topics.get(event() if hasattr(event, '__call__') else event)
+                if subscribers:
+                    # A listener of all events that also subscribed is only notified once.
+                    wildcard = src_node.listeners
+                    listeners += tuple(node for node in subscribers if node not in wildcard)
+
+        # Queue one batch of events for each of the listeners' contexts.
+        src_obj = src_node.obj
+        batches = {}
+        for dst_node in listeners:
+            if not dst_node.context:
+                raise TypeError('This destination node does not have a context.')
+
+            # Skip a listener that died after the listeners were copied.
+            dst_obj = dst_node.obj
+            if dst_obj is not None:
+                batches.setdefault(dst_node.context, []).append((event, src_obj, dst_obj))
 
-    def _delegate(self, event, obj, *args, **kwargs):
+        group = FutureGroup()
+        for context, events in batches.items():
+            group.add(len(events))
+            context.post_many(events, *args, group=group, **kwargs)
+
+        return group
+
+    @staticmethod
+    def deliver(event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Process an event that was queued for dst_obj.
+        Contexts call this from their own thread, so the event is always
+        dispatched to dst_obj right away.
+        """
+        return Dispatcher._delegate(event, dst_obj, *args, **kwargs)
+
+    @staticmethod
+    def _delegate(event, obj, *args, **kwargs):
         """
         Process a single event by dispatching the event to the best-fitting event-handler.
         If an event-handler is not available, return None otherwise return the result of the processing.
         """
-        self.log.debug('Process event, ' + str(event()) + '.')
+        Dispatcher.log.debug('Process event, %s.', event)
 
         function = Delegator.get_handler(obj, event)
         if function:
-            self.log.info('Dispatching event, ' + str(event()) + ', to function, ' + str(function.__name__) + '.')
-            return function(event, *args, **kwargs)
+            Dispatcher.log.info('Dispatching event, %s, to function, %s.', event, function.__name__)
+            token = Dispatcher.sender.set(obj)
+            try:
+                return function(event, *args, **kwargs)
+            finally:
+                Dispatcher.sender.reset(token)
         else:
-            self.log.debug('Unhandled event, ' + str(event()) + '.')
+            Dispatcher.log.debug('Unhandled event, %s.', event)
             return None
 
     def send_internal(self, event, src_node, dst_node, queued, *args, **kwargs):
@@ -234,7 +575,7 @@ class Dispatcher(metaclass=Singleton):
         if not obj:
             raise Exception('Must specify an object.')
 
-        node = self.nodes[obj]
+        node = self.nodes[id(obj)]
         if not node:
             raise Exception('Cannot find the node for object, ' + str(obj) + '.')
 
@@ -257,11 +598,11 @@ class Dispatcher(metaclass=Singleton):
         Will be changed to:
             def greenButtonPushed(self, *args, **kwargs):
                 print 'Green button pushed.'
-                Dispatcher().send('greenButtonPushed', self, self, *args, **kwargs)
+                Dispatcher.send('greenButtonPushed', self, self, *args, **kwargs)
         """
 
         def process(self, *args, **kwargs):
-            self.log.debug('Call process ' + str(func.__name__) + '.')
+            Dispatcher.log.debug('Call process %s.', func.__name__)
             func(self, *args, **kwargs)
-            return Dispatcher().send(Event(func.__name__), self, self, *args, **kwargs)
+            return Dispatcher.send(Event(func.__name__), self, self, *args, **kwargs)
         return process
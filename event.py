@@ -1,15 +1,133 @@
 #!/usr/bin/env python3
+import threading
+import weakref
+
+class EventId(str):
+    """
+    An interned event id.
+    It is equal to the event's name, so it can be used wherever the name is,
+    and it also has a small integer code that is unique to the name within the
+    process, so tables of events can be indexed by the code.
+
+    Ids are created with Event.intern().  There is one EventId for each name,
+    so ids are compared by identity before their characters are compared, and
+    their hashes are cached, which makes them as cheap to use as keys as the
+    codes are.
+
+    The registry only holds ids weakly.  When nothing refers to an id any
+    more, for example one that was built for a single dynamic event, it is
+    discarded and its code is reused by a later id, so a code must only be
+    kept along with its id.
+    """
+
+    def __reduce__(self):
+        # Codes are only unique within a process, so intern the name again
+        # when the id is unpickled.
+        return (Event.intern, (str(self),))
+
 class Event:
     """
     A simple, example event that can be used with Dispatcher.
     This class can also be used as a base class for other events.
+
+    The event's name is interned when the event is created, so events that
+    are class attributes are interned when their class is defined.
+
+    The name and priority are slots, but events still have a __dict__ for
+    other attributes, which is only allocated when one is set.
+    """
+    __slots__ = ('name', 'priority', '__dict__')
+
+    """
+    Event priorities.  Contexts with a PriorityEventQueue process events with
+    a lower value first.  Other contexts ignore the priority.
     """
-    def __init__(self, name: str) -> None:
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_LOW = 2
+
+    """
+    The registry of interned event ids.  ids and codes hold weak references
+    to the ids by name and by code, and free holds the codes of ids that
+    were discarded.  The lock is reentrant because the references' callbacks
+    can run while it is held.
+    """
+    ids = {}
+    codes = []
+    free = []
+    lock = threading.RLock()
+
+    def __init__(self, name: str, priority: int=PRIORITY_NORMAL) -> None:
         super(Event, self).__init__()
-        self.name = name
+        self.name = Event.intern(name)
+        self.priority = priority
 
     def __call__(self) -> str:
         return self.name
 
+    @property
+    def code(self) -> int:
+        """
+        The code of the event's id, or None if the id is not a string.
+        """
+        return getattr(self.name, 'code', None)
+
+    @staticmethod
+    def intern(name):
+        """
+        Return the EventId for a name, and register it the first time.
+        Names that are not strings are returned as they are.
+        """
+        if name.__class__ is EventId:
+            return name
+
+        try:
+            event_id = Event.ids[name]()
+        except KeyError:
+            event_id = None
+        except TypeError:
+            return name
+        if event_id is not None:
+            return event_id
+
+        if not isinstance(name, str):
+            return name
+
+        with Event.lock:
+            ref = Event.ids.get(name)
+            event_id = ref() if ref is not None else None
+            if event_id is None:
+                # Key the registry by a plain string, which does not keep the id alive.
+                name = str.__str__(name)
+                event_id = EventId(name)
+                code = Event.free.pop() if Event.free else len(Event.codes)
+                event_id.code = code
+                ref = weakref.KeyedRef(event_id, Event.__release, (name, code))
+                if code == len(Event.codes):
+                    Event.codes.append(ref)
+                else:
+                    Event.codes[code] = ref
+                Event.ids[name] = ref
+        return event_id
+
+    @staticmethod
+    def __release(ref):
+        # Remove an id that has been discarded, and free its code.
+        name, code = ref.key
+        with Event.lock:
+            if Event.ids.get(name) is ref:
+                del Event.ids[name]
+            if Event.codes[code] is ref:
+                Event.codes[code] = None
+                Event.free.append(code)
+
+    @staticmethod
+    def id_of(code: int) -> EventId:
+        """
+        Return the EventId with a code, or None if no id has the code.
+        """
+        ref = Event.codes[code] if 0 <= code < len(Event.codes) else None
+        return ref() if ref is not None else None
+
     def __str__(self):
         return str(self.name)
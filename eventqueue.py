@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+import collections
+import heapq
+import itertools
+import queue
+import threading
+import time
+from event import Event
+
+class EventQueue(queue.Queue):
+    """
+    The queue of a Context.
+    It extends queue.Queue so that batches of items can be added and removed
+    while holding the queue's lock once.
+
+    The None item is the termination event of a Context, so get_many() does
+    not remove any items that were queued after it.
+
+    A queue with a maxsize is bounded, and its policy decides what happens to
+    an item that is added while the queue is full.  The termination event is
+    always added.  Items that are dropped are cancelled, so their callers are
+    not blocked forever.
+
+    A queue with a coalesce mode does not add an event when an event with the
+    same key is already pending, see coalesce_key().  The futures of both
+    events are completed by processing the pending event once.
+    """
+
+    """
+    Policies for adding an item to a full queue.
+        Block: wait until the consumer removes an item.
+        Fail: raise queue.Full.
+        DropOldest: drop the next item that would be removed, and add the item.
+            A PriorityEventQueue drops the item that it would remove last,
+            which is the one with the lowest priority.
+        DropNewest: drop the item.
+        Coalesce: if an event for the same destination with the same id is
+            pending, the item is completed with its result instead of being
+            added; otherwise, wait as with Block.
+    """
+    POLICY_BLOCK = 'Block'
+    POLICY_FAIL = 'Fail'
+    POLICY_DROP_OLDEST = 'DropOldest'
+    POLICY_DROP_NEWEST = 'DropNewest'
+    POLICY_COALESCE = 'Coalesce'
+
+    """
+    Modes for coalescing an event with a pending event.
+        Merge: process the pending event.
+        Replace: process the pending event with the event and arguments of the
+            new event, at the position of the pending event.
+    """
+    COALESCE_MERGE = 'Merge'
+    COALESCE_REPLACE = 'Replace'
+
+    """
+    The maximum number of items that get_many() returns, or None for no limit.
+    """
+    batch_size = None
+
+    def __init__(self, maxsize=0, policy=POLICY_BLOCK, coalesce=None, coalesce_args=False):
+        """
+        If coalesce is a coalescing mode, duplicate events are always
+        coalesced; otherwise, they are only coalesced by the Coalesce policy
+        when the queue is full.  If coalesce_args is True, events are only
+        duplicates if their arguments are equal too.
+        """
+        super(EventQueue, self).__init__(maxsize)
+
+        if policy not in (self.POLICY_BLOCK, self.POLICY_FAIL, self.POLICY_DROP_OLDEST, self.POLICY_DROP_NEWEST, self.POLICY_COALESCE):
+            raise ValueError('Unknown queue policy, ' + str(policy) + '.')
+        if coalesce not in (None, self.COALESCE_MERGE, self.COALESCE_REPLACE):
+            raise ValueError('Unknown coalesce mode, ' + str(coalesce) + '.')
+        self.policy = policy
+        self.coalesce = coalesce
+        self.coalesce_args = coalesce_args
+
+        # The number of items that were added after waiting, rejected, or
+        # dropped because the queue was full, and that were coalesced.
+        self.blocked = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+        # The pending items by their coalescing key, and the key that each
+        # pending item was stored with, by the item's id.  The key is kept
+        # because an event's key can change while it is queued.
+        self.__pending = {} if coalesce or policy == self.POLICY_COALESCE else None
+        self.__keys = {}
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Add an item to the queue.
+        If the queue is full, the item is handled by the queue's policy.  With
+        the Block and Coalesce policies, block and timeout are used as they are
+        by queue.Queue.put().
+        """
+        with self.not_full:
+            if self.__admit(item, block, timeout):
+                self.__put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+
+    def put_many(self, items):
+        """
+        Add a list of items to the queue.
+        If the queue is full, each item is handled by the queue's policy.  With
+        the Fail policy, none of the items are added unless all of them fit.
+        """
+        if not items:
+            return
+
+        with self.not_full:
+            if self.maxsize > 0 and self.policy == self.POLICY_FAIL and self._qsize() + len(items) > self.maxsize:
+                self.failed += len(items)
+                raise queue.Full('Cannot queue ' + str(len(items)) + ' items, the queue is full.')
+
+            count = 0
+            for item in items:
+                if self.__admit(item, True, None):
+                    self.__put(item)
+                    count += 1
+            self.unfinished_tasks += count
+            self.not_empty.notify()
+
+    def get_many(self, block=True):
+        """
+        Remove and return a list of all of the queued items, up to and
+        including the first None item.
+        If the queue is empty, block until an item is added, or return an
+        empty list if block is False.
+        """
+        with self.not_empty:
+            if not self._qsize():
+                if not block:
+                    return []
+                while not self._qsize():
+                    self.not_empty.wait()
+
+            items = []
+            while self._qsize() and len(items) != self.batch_size:
+                item = self.__get()
+                items.append(item)
+                if item is None:
+                    break
+
+            self.not_full.notify(len(items))
+            return items
+
+    def counters(self):
+        """
+        Return the number of items that were blocked, failed, or dropped
+        because the queue was full, and the number that were coalesced.
+        """
+        with self.mutex:
+            return {'blocked': self.blocked, 'failed': self.failed, 'dropped': self.dropped, 'coalesced': self.coalesced}
+
+    def coalesce_key(self, item):
+        """
+        Return the key that identifies duplicate items, or None if the item
+        cannot be coalesced.  Futures of queued events are identified by their
+        destination and the id of their event, and by their arguments if
+        coalesce_args is True.  Events with unhashable arguments are not
+        coalesced.
+        """
+        args = getattr(item, 'args', None)
+        if not args or len(args) < 3 or not callable(args[0]):
+            return None
+
+        if not self.coalesce_args:
+            return (id(args[2]), args[0]())
+
+        key = (id(args[2]), args[0](), args[3:], tuple(sorted(item.kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def __admit(self, item, block, timeout):
+        """
+        Apply the policy to an item that is being added.
+        Returns True if the item should be added to the queue.
+        Must be called while holding the mutex.
+        """
+        if item is None:
+            return True
+
+        if self.coalesce and self.__merge(item, self.coalesce):
+            return False
+
+        if self.maxsize <= 0 or self._qsize() < self.maxsize:
+            return True
+
+        if self.policy == self.POLICY_COALESCE and not self.coalesce and self.__merge(item, self.COALESCE_MERGE):
+            return False
+
+        if self.policy == self.POLICY_BLOCK or self.policy == self.POLICY_COALESCE:
+            self.blocked += 1
+            if not block:
+                raise queue.Full('Cannot queue ' + str(item) + ', the queue is full.')
+
+            # Wake the consumer in case put_many() has added items it has not seen.
+            self.not_empty.notify()
+            if timeout is None:
+                while self._qsize() >= self.maxsize:
+                    self.not_full.wait()
+            else:
+                endtime = time.monotonic() + timeout
+                while self._qsize() >= self.maxsize:
+                    remaining = endtime - time.monotonic()
+                    if remaining <= 0.0:
+                        raise queue.Full('Cannot queue ' + str(item) + ', the queue is full.')
+                    self.not_full.wait(remaining)
+            return True
+
+        if self.policy == self.POLICY_FAIL:
+            self.failed += 1
+            raise queue.Full('Cannot queue ' + str(item) + ', the queue is full.')
+
+        self.dropped += 1
+        if self.policy == self.POLICY_DROP_OLDEST and self._peek() is not None:
+            dropped, add = self.__forget(self._drop()), True
+            self.unfinished_tasks -= 1
+        else:
+            # Drop the newest item, which is also done when the termination
+            # event is next, since nothing behind it would be processed.
+            dropped, add = item, False
+
+        cancel = getattr(dropped, 'cancel', None)
+        if cancel:
+            cancel()
+        return add
+
+    def __merge(self, item, mode):
+        """
+        Merge an item into the pending item with the same key.
+        Returns True if there was a pending item.
+        """
+        key = self.coalesce_key(item)
+        pending = self.__pending.get(key) if key is not None else None
+        if pending is None:
+            return False
+
+        done = getattr(pending, 'done', None)
+        if done is not None and done():
+            # The pending item was cancelled by its caller, so queue the item
+            # in its place.
+            del self.__pending[key]
+            return False
+
+        if mode == self.COALESCE_REPLACE:
+            pending.args = item.args
+            pending.kwargs = item.kwargs
+
+        self.coalesced += 1
+        pending.merge(item)
+        return True
+
+    def __put(self, item):
+        if self.__pending is not None:
+            key = self.coalesce_key(item)
+            if key is not None:
+                self.__pending[key] = item
+                self.__keys[id(item)] = key
+        self._put(item)
+
+    def __get(self):
+        return self.__forget(self._get())
+
+    def __forget(self, item):
+        # Remove an item that has left the queue from the pending items.
+        if self.__pending:
+            key = self.__keys.pop(id(item), None)
+            if key is not None and self.__pending.get(key) is item:
+                del self.__pending[key]
+        return item
+
+    def _peek(self):
+        # Return the item that the DropOldest policy drops, without removing it.
+        return self.queue[0]
+
+    def _drop(self):
+        # Remove and return the item that the DropOldest policy drops.
+        return self._get()
+
+class PriorityEventQueue(EventQueue):
+    """
+    An EventQueue that returns items in order of their priority, and in the
+    order they were added for items with the same priority.
+
+    Waiting items age so that a flood of high-priority items cannot starve
+    lower-priority items: an item is ordered as if it was added aging seconds
+    later for each level of priority below Event.PRIORITY_HIGH.  For example,
+    with the default aging, a low-priority item waits at most 0.2 seconds
+    longer than a high-priority item that was added at the same time.
+
+    get_many() returns small batches so that items with a higher priority that
+    are added while a batch is processed do not wait for a long batch.
+
+    The termination event is returned after all of the items that were queued
+    before it, like with an EventQueue.
+    """
+
+    def __init__(self, aging=0.1, batch_size=16, maxsize=0, policy=EventQueue.POLICY_BLOCK, coalesce=None, coalesce_args=False):
+        self.aging = aging
+        self.batch_size = batch_size
+        super(PriorityEventQueue, self).__init__(maxsize, policy, coalesce, coalesce_args)
+
+    def _init(self, maxsize):
+        self.queue = []
+        self.sequence = itertools.count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        if item is None:
+            # The termination event is ordered after every pending item,
+            # whatever their priority, so they are processed before it.
+            key = max([entry[0] for entry in self.queue], default=time.monotonic())
+        else:
+            key = time.monotonic() + getattr(item, 'priority', Event.PRIORITY_NORMAL) * self.aging
+        heapq.heappush(self.queue, (key, next(self.sequence), item))
+
+    def _get(self):
+        return heapq.heappop(self.queue)[2]
+
+    def _peek(self):
+        entry = self.__last()
+        return entry[2] if entry else None
+
+    def _drop(self):
+        entry = self.__last()
+        self.queue.remove(entry)
+        heapq.heapify(self.queue)
+        return entry[2]
+
+    def __last(self):
+        # The entry of the item that would be removed last, not counting the
+        # termination event.
+        return max([entry for entry in self.queue if entry[2] is not None], default=None)
+
+class DequeQueue:
+    """
+    A low-contention queue for a Context with many producers and one consumer.
+
+    Items are appended to a collections.deque, which is thread-safe, so
+    producers do not take a lock.  The consumer only waits on an Event when the
+    queue is empty, and producers only set it while the consumer is waiting.
+
+    It has the same put(), put_many(), and get_many() methods as EventQueue,
+    but only one thread may get items from it at a time, and it is unbounded
+    and does not coalesce items.
+    """
+
+    def __init__(self):
+        super(DequeQueue, self).__init__()
+
+        self.__items = collections.deque()
+        self.__waiting = False
+        self.__wakeup = threading.Event()
+
+    def put(self, item, block=True, timeout=None): #pylint: disable=unused-argument
+        """
+        Add an item to the queue.
+        The queue is never full, so block and timeout are not used.
+        """
+        self.__items.append(item)
+        if self.__waiting:
+            self.__wakeup.set()
+
+    def put_many(self, items):
+        """
+        Add a list of items to the queue.
+        """
+        self.__items.extend(items)
+        if self.__waiting:
+            self.__wakeup.set()
+
+    def get_many(self, block=True):
+        """
+        Remove and return a list of all of the queued items, up to and
+        including the first None item.
+        If the queue is empty, block until an item is added, or return an
+        empty list if block is False.
+        """
+        items = self.__items
+        if not items:
+            if not block:
+                return []
+            while not items:
+                # Check the queue again after announcing that the consumer is
+                # waiting, in case an item was added in between.
+                self.__wakeup.clear()
+                self.__waiting = True
+                if not items:
+                    self.__wakeup.wait()
+                self.__waiting = False
+
+        batch = []
+        popleft = items.popleft
+        while items:
+            item = popleft()
+            batch.append(item)
+            if item is None:
+                break
+
+        return batch
+
+    def empty(self):
+        return not self.__items
+
+    def qsize(self):
+        return len(self.__items)
@@ -1,38 +1,81 @@
 #!/usr/bin/env python3
+import asyncio
 import copy
 import logging
 import sys
 import threading
+import types
+from event import Event
+from scheduler import Scheduler
 
 class Future:
     """
     A future that is used when queuing events in a Context.
     The future can be used to determine the result of the event processing.
 
+    Futures are kept small, since many of them can be pending: they have
+    slots instead of a __dict__, they share a set of striped locks, and they
+    only allocate a threading.Event when a caller has to wait for the result.
+
     This implementation is based on:
         http://aspn.activestate.com/ASPN/Cookbook/Python/Recipe/84317
         Based on implementation by David Perry and modifications by Bjorn Pettersen and Graham Horler.
     """
+    __slots__ = ('function', 'args', 'kwargs', 'result_policy', 'priority',
+                 '__state', '__result', '__excpt', '__converted', '__merged', '__waiter')
 
     STATE_ACTIVE = 'Active'
+    STATE_RUNNING = 'Running'
     STATE_COMPLETED = 'Completed'
     STATE_CANCELLED = 'Cancelled'
     STATE_EXCEPTION = 'Exception'
 
+    """
+    Policies for how the result is returned to the callers of the future.
+        Reference: return the result itself.
+        CopyOnce: deep copy the result on the first read and return that copy on every read.
+        Frozen: return an immutable version of the result, see freeze().
+        DeepCopy: return a new deep copy of the result on every read.
+    """
+    RESULT_REFERENCE = 'Reference'
+    RESULT_COPY_ONCE = 'CopyOnce'
+    RESULT_FROZEN = 'Frozen'
+    RESULT_DEEPCOPY = 'DeepCopy'
+
+    """
+    The result policy of new futures.  It can be changed for all futures, or
+    result_policy can be set on a single future before it is read.
+    """
+    default_result_policy = RESULT_REFERENCE
+
+    """
+    The locks that protect the state of futures.  Each future uses one of them,
+    chosen by its id, so futures do not need a lock of their own.
+    """
+    locks = [threading.Lock() for i in range(64)]
+
+    log = logging.getLogger('Future')
+
     def __init__(self, function, *args, **kwargs):
         super(Future, self).__init__()
-        self.log = logging.getLogger(self.__class__.__name__)
 
         self.function = function
         self.args = args
         self.kwargs = kwargs
 
+        self.result_policy = self.default_result_policy
+
+        # The priority of the event, which is used by a PriorityEventQueue.
+        self.priority = Event.PRIORITY_NORMAL
+
         self.__state = self.STATE_ACTIVE
         self.__result = None
         self.__excpt = None
+        self.__converted = False
+        self.__merged = None
 
-        # Notify using this Condition when the result is ready.
-        self._condition = threading.Condition()
+        # The Event that waiting callers block on, which is created by the first one.
+        self.__waiter = None
 
     def __call__(self):
         """
@@ -42,24 +85,67 @@ class Future:
         event, throw it here.
         """
 
-        self.log.debug('__call__')
-
-        self._condition.acquire()
-        while self.__state == self.STATE_ACTIVE:
-            # Block until the future is complete.
-            self._condition.wait()
-        self._condition.release()
+        if not self.done():
+            lock = self.__lock()
+            with lock:
+                waiter = None
+                if not self.done():
+                    if self.__waiter is None:
+                        self.__waiter = threading.Event()
+                    waiter = self.__waiter
+            if waiter:
+                # Block until the future is complete.
+                waiter.wait()
+
+        # Convert the result once for the policies that keep the converted result.
+        if not self.__converted and self.__state == self.STATE_COMPLETED:
+            if self.result_policy == self.RESULT_COPY_ONCE:
+                result = copy.deepcopy(self.__result)
+            elif self.result_policy == self.RESULT_FROZEN:
+                result = self.freeze(self.__result)
+            else:
+                result = None
+
+            if result is not None:
+                # Keep the first conversion if other callers converted it too.
+                with self.__lock():
+                    if not self.__converted:
+                        self.__result = result
+                        self.__converted = True
 
         # An exception was thrown in the thread, re-raise it here.
         if self.__excpt:
-            raise self.__excpt
+            raise self.__excpt[1]
 
         if self.__state == self.STATE_CANCELLED:
             return None
 
-        # Copy the __result to prevent accidental tampering with it.
-        # Use deepcopy to get the entire result.
-        return copy.deepcopy(self.__result)
+        if self.result_policy == self.RESULT_DEEPCOPY:
+            # Copy the __result to prevent accidental tampering with it.
+            # Use deepcopy to get the entire result.
+            return copy.deepcopy(self.__result)
+
+        return self.__result
+
+    @staticmethod
+    def freeze(value):
+        """
+        Return an immutable version of value.  Lists and tuples become tuples,
+        sets become frozensets, bytearrays become bytes, and dicts become
+        read-only mappings.  Their contents are frozen too.  Other objects,
+        including subclasses of these types, are returned as they are.
+        """
+        value_type = type(value)
+        if value_type is list or value_type is tuple:
+            return tuple([Future.freeze(item) for item in value])
+        elif value_type is dict:
+            return types.MappingProxyType({key: Future.freeze(item) for key, item in value.items()})
+        elif value_type is set or value_type is frozenset:
+            return frozenset([Future.freeze(item) for item in value])
+        elif value_type is bytearray:
+            return bytes(value)
+
+        return value
 
     def cancel(self):
         """
@@ -67,20 +153,25 @@ class Future:
         This future will return a result of None to the blocked thread.
         """
 
-        self.log.debug('cancel')
-
         # Assume the future cannot be cancelled.
         cancelled = False
 
-        self._condition.acquire()
+        with self.__lock():
+            # The future can be cancelled if it is only in the active state.
+            if self.__state == self.STATE_ACTIVE:
+                self.__state = self.STATE_CANCELLED
+                cancelled = True
 
-        # The future can be cancelled if it is only in the active state.
-        if self.__state == self.STATE_ACTIVE:
-            self.__state = self.STATE_CANCELLED
-            self._condition.notify()
-            cancelled = True
+                merged = self.__merged
+                self.__merged = None
+                waiter = self.__waiter
 
-        self._condition.release()
+        if cancelled:
+            if waiter:
+                waiter.set()
+            if merged:
+                for future in merged:
+                    future.cancel()
 
         # Return if it was successfully cancelled.
         return cancelled
@@ -90,21 +181,76 @@ class Future:
         Process an event and save the result.
         """
 
-        self.log.debug('process')
-
-        self._condition.acquire()
-
-        if self.__state == self.STATE_ACTIVE:
-            try:
-                self.__result = self.function(*self.args, **self.kwargs)
-                self.__state = self.STATE_COMPLETED
-            except Exception as e:
-                self.log.error('process has thrown an exception, ' + str(e) + '.')
-                self.__result = self.STATE_EXCEPTION
-                self.__excpt = sys.exc_info()
-
-        self._condition.notify()
-        self._condition.release()
+        with self.__lock():
+            if self.__state != self.STATE_ACTIVE:
+                return
+            self.__state = self.STATE_RUNNING
+
+        # The lock is shared with other futures, so it is not held while the
+        # function runs.  The running state keeps the future from being
+        # cancelled or processed again.
+        try:
+            result = self.function(*self.args, **self.kwargs)
+            state = self.STATE_COMPLETED
+            excpt = None
+        except Exception as e:
+            self.log.error('process has thrown an exception, %s.', e)
+            result = self.STATE_EXCEPTION
+            state = self.STATE_EXCEPTION
+            excpt = sys.exc_info()
+
+        with self.__lock():
+            self.__result = result
+            self.__excpt = excpt
+            self.__state = state
+
+            merged = self.__merged
+            self.__merged = None
+            waiter = self.__waiter
+
+        if waiter:
+            waiter.set()
+        if merged:
+            for future in merged:
+                self.__complete(future)
+
+    def merge(self, future):
+        """
+        Complete future with the result of this future instead of processing
+        it separately.  If this future is cancelled, future is cancelled too.
+        This is used to process duplicate events once.
+        """
+        with self.__lock():
+            if not self.done():
+                if self.__merged is None:
+                    self.__merged = []
+                self.__merged.append(future)
+                future = None
+
+        if future:
+            # This future is already done.
+            if self.__state == self.STATE_CANCELLED:
+                future.cancel()
+            else:
+                self.__complete(future)
+
+    def __complete(self, future):
+        # Process future by reading the result of this future, so it gets the
+        # result, or the exception, under its own result policy.
+        future.function = self
+        future.args = ()
+        future.kwargs = {}
+        future.process()
+
+    def __lock(self):
+        return Future.locks[(id(self) >> 4) & 63]
+
+    def done(self):
+        """
+        Return True if the future has completed, been cancelled, or thrown an exception.
+        """
+        state = self.__state
+        return state != self.STATE_ACTIVE and state != self.STATE_RUNNING
 
     def __str__(self):
         return 'state: %s, result: %s, exception: %s' % (str(self.__state), str(self.__result), str(self.__excpt))
@@ -127,21 +273,132 @@ class ScheduledFuture(Future):
     As with a normal future, ScheduledFuture.process() will call function.
     """
 
+    __slots__ = ('schedule_function', 'timer')
+
+    log = logging.getLogger('ScheduledFuture')
+
+    """
+    All scheduled futures share one timer thread.
+    """
+    scheduler = Scheduler('ScheduledFuture')
+
     def __init__(self, seconds, schedule_function, function, *args, **kwargs):
         super(ScheduledFuture, self).__init__(function, *args, **kwargs)
-        self.log = logging.getLogger(self.__class__.__name__)
 
         self.schedule_function = schedule_function
 
-        self.timer = threading.Timer(seconds, self.__timeout)
-        self.timer.start()
+        self.timer = self.scheduler.schedule(seconds, self.__timeout)
 
     def __timeout(self):
         """
         The timeout handler that queues the event for processing.
         """
 
-        self.log.debug('__timeout')
+        self.timer = None
+        self.schedule_function(self)
+
+    def cancel(self):
+        """
+        If the timer is still running, cancel the timer and do not queue the
+        event for processing.
+        Then cancel the base Future object.
+        """
+
+        if self.timer:
+            # If a valid timer exists, then cancel it.
+            self.timer.cancel()
+            self.timer = None
+
+        return super(ScheduledFuture, self).cancel()
+
+class AsyncFuture(Future):
+    """
+    A future that is processed on an asyncio event loop.
+    Coroutines can await the future instead of blocking on it; the result of
+    the await is the same as the result of calling the future.
+    """
+
+    __slots__ = ('loop', '__waiter')
+
+    log = logging.getLogger('AsyncFuture')
+
+    def __init__(self, loop, function, *args, **kwargs):
+        super(AsyncFuture, self).__init__(function, *args, **kwargs)
+
+        self.loop = loop
+
+        # The asyncio future that is created when this future is first awaited.
+        self.__waiter = None
+
+    def __await__(self):
+        if not self.done():
+            # All awaiters share one asyncio future, and each one shields it
+            # so that cancelling one awaiter does not cancel the others.
+            if self.__waiter is None:
+                self.__waiter = self.loop.create_future()
+            yield from asyncio.shield(self.__waiter)
+        return self()
+
+    def cancel(self):
+        cancelled = super(AsyncFuture, self).cancel()
+        if cancelled:
+            self.call_soon(self.__wake)
+        return cancelled
+
+    def process(self):
+        super(AsyncFuture, self).process()
+        self.call_soon(self.__wake)
+
+    def call_soon(self, function, *args):
+        """
+        Call function on the event loop: now if this is the loop's thread,
+        otherwise as soon as the loop gets to it.
+        """
+        if self.in_loop(self.loop):
+            function(*args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    @staticmethod
+    def in_loop(loop):
+        """
+        Return True if loop is running in the current thread.
+        """
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def __wake(self):
+        if self.__waiter and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+class AsyncScheduledFuture(AsyncFuture):
+    """
+    A ScheduledFuture that uses the event loop's timers instead of a
+    Scheduler thread.
+    """
+
+    __slots__ = ('schedule_function', 'timer')
+
+    log = logging.getLogger('AsyncScheduledFuture')
+
+    def __init__(self, loop, seconds, schedule_function, function, *args, **kwargs):
+        super(AsyncScheduledFuture, self).__init__(loop, function, *args, **kwargs)
+
+        self.schedule_function = schedule_function
+
+        self.timer = None
+        self.call_soon(self.__start, seconds)
+
+    def __start(self, seconds):
+        if not self.done():
+            self.timer = self.loop.call_later(seconds, self.__timeout)
+
+    def __timeout(self):
+        """
+        The timeout handler that queues the event for processing.
+        """
 
         self.timer = None
         self.schedule_function(self)
@@ -153,20 +410,175 @@ class ScheduledFuture(Future):
         Then cancel the base Future object.
         """
 
-        self.log.debug('cancel')
+        self.call_soon(self.__stop)
 
+        return super(AsyncScheduledFuture, self).cancel()
+
+    def __stop(self):
         if self.timer:
             # If a valid timer exists, then cancel it.
             self.timer.cancel()
             self.timer = None
 
-        return super(ScheduledFuture, self).cancel()
+class PostedEvent:
+    """
+    An event that is queued in a Context without a future, because no one
+    waits for its result.  It is processed like a Future, but the result is
+    discarded and exceptions are only logged.
+
+    If the event belongs to a FutureGroup, the group is told when the event
+    has been processed or cancelled.  If a coalescing queue merges other
+    items into the event, they are completed with its result.
+    """
+    __slots__ = ('function', 'args', 'kwargs', 'priority', 'merged', 'group')
+
+    log = logging.getLogger('PostedEvent')
+
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = Event.PRIORITY_NORMAL
+        self.merged = None
+        self.group = None
+
+    def process(self):
+        """
+        Process the event.
+        """
+        result = None
+        excpt = None
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.log.error('process has thrown an exception, %s.', e)
+            excpt = e
+
+        merged = self.merged
+        self.merged = None
+        if merged:
+            for item in merged:
+                item.function = PostedEvent.__replay
+                item.args = (result, excpt)
+                item.kwargs = {}
+                item.process()
+
+        if self.group is not None:
+            self.group.finish(excpt)
+
+    @staticmethod
+    def __replay(result, excpt):
+        if excpt is not None:
+            raise excpt
+        return result
+
+    def merge(self, item):
+        """
+        Process item with this event.  Posted events that do not belong to a
+        group need nothing else, but other items are kept so that they get
+        the result.
+        """
+        if isinstance(item, PostedEvent) and item.group is None:
+            return
+
+        if self.merged is None:
+            self.merged = []
+        self.merged.append(item)
+
+    def cancel(self):
+        """
+        Cancel the event and the items that were merged into it, when the
+        event is dropped from a queue.
+        """
+        merged = self.merged
+        self.merged = None
+        if merged:
+            for item in merged:
+                item.cancel()
+
+        if self.group is not None:
+            self.group.finish(cancelled=True)
+        return True
+
+    def __str__(self):
+        return 'posted: %s' % (str(self.args[0]) if self.args else '')
+
+class FutureGroup:
+    """
+    A handle to wait for a group of events to be processed, such as the
+    events that Dispatcher.notify() posts to the listeners.
+
+    The group only counts the events.  Like a Future, it uses a striped lock
+    and only allocates a threading.Event when a caller has to wait.
+    """
+    __slots__ = ('__pending', '__waiter', 'exceptions', 'cancelled')
+
+    def __init__(self, count=0):
+        super(FutureGroup, self).__init__()
+
+        self.__pending = count
+        self.__waiter = None
+
+        # The exceptions that the handlers raised, and the number of events
+        # that were cancelled.
+        self.exceptions = []
+        self.cancelled = 0
+
+    def __call__(self, timeout=None):
+        """
+        Block until all of the events are processed or cancelled, or until
+        timeout seconds have passed.
+        Returns True if all of the events are processed or cancelled.
+        """
+        with self.__lock():
+            if not self.__pending:
+                return True
+            if self.__waiter is None:
+                self.__waiter = threading.Event()
+            waiter = self.__waiter
+
+        return waiter.wait(timeout)
+
+    def add(self, count=1):
+        """
+        Add events to the group.  They must be added before they can be processed.
+        """
+        with self.__lock():
+            self.__pending += count
+
+    def finish(self, excpt=None, cancelled=False):
+        """
+        Count an event as processed, or cancelled.
+        """
+        with self.__lock():
+            if excpt is not None:
+                self.exceptions.append(excpt)
+            if cancelled:
+                self.cancelled += 1
+            self.__pending -= 1
+            waiter = self.__waiter if not self.__pending else None
+
+        if waiter:
+            waiter.set()
+
+    def done(self):
+        """
+        Return True if all of the events are processed or cancelled.
+        """
+        return not self.__pending
+
+    def __lock(self):
+        return Future.locks[(id(self) >> 4) & 63]
+
+    def __str__(self):
+        return 'pending: %s, exceptions: %s, cancelled: %s' % (str(self.__pending), str(len(self.exceptions)), str(self.cancelled))
 
 class FutureMimic:
     """
     The FutureMimic class is necessary to mimic the Future object.
     This allows applications to treat futures and non-futures
         the exact same way.
+    It can also be awaited like an AsyncFuture.
     """
 
     def __init__(self, result):
@@ -175,5 +587,10 @@ class FutureMimic:
     def __call__(self):
         return self.result
 
+    def __await__(self):
+        # The result is already available, so awaiting it does not suspend.
+        yield from ()
+        return self.result
+
     def __str__(self):
         return str(self.result)
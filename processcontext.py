@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+import itertools
+import logging
+import multiprocessing
+import threading
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from future import Future
+from future import PostedEvent
+from future import ScheduledFuture
+
+class RemoteObject:
+    """
+    A proxy for an object that lives in a ProcessContext's worker process.
+    The proxy is registered with the Dispatcher in place of the object, so
+    events sent to the proxy are forwarded to the object.
+    """
+    def __init__(self, context, key, name):
+        super(RemoteObject, self).__init__()
+
+        self.context = context
+        self.key = key
+        self.name = name
+
+    def onDefault(self, event, *args, **kwargs):
+        """
+        Events that are sent to the proxy from its own context are not queued
+        by the Dispatcher, so forward them and wait for the result.
+        """
+        return self.context.queue(event, None, self, *args, **kwargs)()
+
+    def __str__(self):
+        return 'name: %s, key: %s, context: %s' % (self.name, str(self.key), self.context.name)
+
+class RemoteHost:
+    """
+    Runs the commands that a ProcessContext sends to its worker process.
+    The commands are queued as events for the host in the worker's Context,
+    so they run on the context's thread in the order they were sent, along
+    with the events that the objects queue and schedule for each other.
+    """
+    def __init__(self, context):
+        super(RemoteHost, self).__init__()
+
+        self.context = context
+        self.objs = {}
+
+    def onAdd(self, event, key, factory, args, kwargs):
+        obj = factory(*args, **kwargs)
+        Dispatcher.add(obj, context=self.context)
+        self.objs[key] = obj
+
+    def onRemove(self, event, key):
+        Dispatcher.remove(self.objs.pop(key))
+
+    def onSend(self, event, key, remote_event, args, kwargs):
+        return Dispatcher.deliver(remote_event, None, self.objs[key], *args, **kwargs)
+
+class RemoteReply:
+    """
+    Sends the result of a command back to the parent process.  It is merged
+    into the future of the command, so it is completed with the result as
+    soon as the worker's context has processed the command.
+    """
+    def __init__(self, connection, lock, sequence):
+        super(RemoteReply, self).__init__()
+
+        self.connection = connection
+        self.lock = lock
+        self.sequence = sequence
+
+        # The function that returns the result, which is set by the future.
+        self.function = None
+        self.args = ()
+        self.kwargs = {}
+
+    def process(self):
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.send(False, e)
+        else:
+            self.send(True, result)
+
+    def cancel(self):
+        self.send(True, None)
+        return True
+
+    def send(self, ok, value):
+        with self.lock:
+            try:
+                self.connection.send((self.sequence, ok, value))
+            except Exception as e:
+                # The result could not be pickled.
+                self.connection.send((self.sequence, False, Exception('Failed to send the result, ' + str(e) + '.')))
+
+class ProcessContext:
+    """
+    A context that hosts its objects in a worker process, so that CPU-bound
+    objects are not limited by the parent process's GIL.
+
+    Objects are created in the worker with add(), which returns a RemoteObject
+    proxy.  Events queued for a proxy are pickled, sent to the worker over a
+    pipe, and delivered to the object there.  The result, or the exception the
+    handler raised, is sent back and completes the caller's Future.
+
+    Objects in the worker can send events to each other, but not to objects in
+    other processes.  Events, arguments, and results must be picklable.
+    """
+    log = logging.getLogger('ProcessContext')
+
+    COMMAND_ADD = 'Add'
+    COMMAND_REMOVE = 'Remove'
+    COMMAND_SEND = 'Send'
+
+    def __init__(self, name, start_method='spawn', dispatcher=None):
+        """
+        The proxies are added to dispatcher, or to the default dispatcher if it
+        is not specified.
+        The worker is spawned by default, since a forked worker inherits the
+        locks of the parent's threads in whatever state they were in.  The
+        factories and classes of its objects must then be importable.
+        """
+        super(ProcessContext, self).__init__()
+
+        self.name = name
+        self.dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+
+        mp_context = multiprocessing.get_context(start_method)
+        self.__connection, connection = mp_context.Pipe()
+        self.__process = mp_context.Process(target=ProcessContext.serve, args=(connection, name), name=name, daemon=True)
+        self.__reader = threading.Thread(None, self.__receive, name + '-reader', daemon=True)
+
+        # Pending futures by sequence number.
+        self.__futures = {}
+        self.__sequence = itertools.count()
+        self.__keys = itertools.count()
+
+        # Serialize writes to the pipe.
+        self.__lock = threading.Lock()
+
+    def add(self, factory, *args, **kwargs):
+        """
+        Create an object in the worker process by calling factory(*args, **kwargs)
+        there, and add a proxy for it to the dispatcher.
+        Returns the proxy.
+        """
+        key = next(self.__keys)
+        future = Future(None)
+        self.__submit(future, (self.COMMAND_ADD, key, factory, args, kwargs))
+        future()
+
+        obj = RemoteObject(self, key, getattr(factory, '__name__', str(factory)))
+        self.dispatcher.add(obj, context=self)
+        return obj
+
+    def remove(self, obj):
+        """
+        Remove a proxy from the dispatcher and its object from the worker process.
+        """
+        self.dispatcher.remove(obj)
+        self.__submit(Future(None), (self.COMMAND_REMOVE, obj.key))
+
+    def queue(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Send an event to the worker process to be processed by dst_obj.
+        """
+        if not dst_obj:
+            raise Exception('Cannot queue event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Queue %s.', event)
+        future = Future(None, event, src_obj, dst_obj, *args, **kwargs)
+        self.__forward(future)
+
+        return future
+
+    def queue_many(self, events, *args, **kwargs):
+        """
+        Send a batch of events to the worker process.
+        Returns a list of the futures of the events.
+        """
+        return [self.queue(event, src_obj, dst_obj, *args, **kwargs) for event, src_obj, dst_obj in events]
+
+    def post(self, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Send an event to the worker process without returning its future.
+        The worker replies to every event, so this is the same as queue().
+        """
+        self.queue(event, src_obj, dst_obj, *args, **kwargs)
+
+    def post_many(self, events, *args, group=None, **kwargs):
+        """
+        Send a batch of events to the worker process without returning their futures.
+        If a FutureGroup is specified, each event is counted in the group when
+        its result is received.
+        """
+        futures = self.queue_many(events, *args, **kwargs)
+        if group is not None:
+            for future in futures:
+                posted = PostedEvent(None)
+                posted.group = group
+                future.merge(posted)
+
+    def schedule(self, seconds, event, src_obj, dst_obj, *args, **kwargs):
+        """
+        Schedule a timer that will send an event to the worker process after
+        the specified number of seconds.
+        """
+        if not dst_obj:
+            raise Exception('Cannot schedule event, ' + str(event()) + ', without a destination.')
+
+        self.log.debug('Schedule %s.', event)
+        return ScheduledFuture(seconds, self.__forward, None, event, src_obj, dst_obj, *args, **kwargs)
+
+    def start(self):
+        """
+        Start the worker process.
+        """
+        self.log.debug('Start.')
+        self.__process.start()
+        self.__reader.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker process after it processes the events sent to it.
+        """
+        self.log.debug('Stop.')
+
+        with self.__lock:
+            self.__connection.send(None)
+
+        self.__process.join(timeout)
+
+        return not self.__process.is_alive()
+
+    def __forward(self, future):
+        # Forward an event future; its arguments are (event, src_obj, dst_obj, *args).
+        event, src_obj, dst_obj = future.args[:3]
+        self.__submit(future, (self.COMMAND_SEND, dst_obj.key, event, future.args[3:], future.kwargs))
+
+    def __submit(self, future, message):
+        if future.done():
+            # The future was cancelled before it was sent.
+            return
+
+        sequence = next(self.__sequence)
+        self.__futures[sequence] = future
+        with self.__lock:
+            self.__connection.send((sequence,) + message)
+
+    def __receive(self):
+        """
+        Complete futures with the results sent back by the worker process.
+        """
+        while True:
+            try:
+                sequence, ok, value = self.__connection.recv()
+            except (EOFError, OSError):
+                break
+
+            future = self.__futures.pop(sequence)
+            future.function = ProcessContext.__result
+            future.args = (ok, value)
+            future.kwargs = {}
+            future.process()
+
+        # The worker has exited, so cancel anything that is still waiting.
+        for sequence in list(self.__futures):
+            self.__futures.pop(sequence).cancel()
+
+    @staticmethod
+    def __result(ok, value):
+        if not ok:
+            raise value
+        return value
+
+    @staticmethod
+    def serve(connection, name):
+        """
+        The worker process's loop.  Commands are run by a RemoteHost on the
+        thread of a Context in this process, which the objects are registered
+        with too, so events that they queue and schedule for each other are
+        processed while the parent is idle.
+        """
+        context = Context(name)
+        host = RemoteHost(context)
+        events = {command: Event(command) for command in (ProcessContext.COMMAND_ADD, ProcessContext.COMMAND_REMOVE, ProcessContext.COMMAND_SEND)}
+        lock = threading.Lock()
+        context.start()
+
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+
+            sequence, command = message[:2]
+            reply = RemoteReply(connection, lock, sequence)
+            event = events.get(command)
+            if event is None:
+                reply.send(False, ValueError('Unknown command, ' + str(command) + '.'))
+                continue
+
+            context.queue(event, None, host, *message[2:]).merge(reply)
+
+        context.stop()
+
+    def __str__(self):
+        return 'name: %s, pid: %s, pending: %s' % (self.name, str(self.__process.pid), str(len(self.__futures)))
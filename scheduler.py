@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+class Timer:
+    """
+    A handle to a callback that is scheduled with a Scheduler.
+    The handle can be used to cancel the callback.
+    """
+    __slots__ = ('scheduler', 'callback', 'args')
+
+    def __init__(self, scheduler, callback, args):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        """
+        Cancel the callback if it has not run yet.
+        Returns True if the callback was cancelled.
+        """
+        return self.scheduler.cancel(self)
+
+    def pending(self):
+        return self.callback is not None
+
+class Scheduler:
+    """
+    Runs scheduled callbacks on a single thread.
+
+    Timers are kept in a heap ordered by their deadline.  Cancelling a timer
+    only clears its callback; the heap entry is discarded when it reaches the
+    top of the heap, or when cancelled entries make up most of the heap.
+
+    Callbacks run on the scheduler's thread, so they should only hand work off
+    to another thread, for example by queuing it in a Context.
+    """
+    log = logging.getLogger('Scheduler')
+
+    """
+    Rebuild the heap once it holds at least this many cancelled entries and
+    they outnumber the pending entries.
+    """
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, name='Scheduler'):
+        super(Scheduler, self).__init__()
+
+        self.name = name
+        self.__sequence = itertools.count()
+        self.__reset()
+
+        # A child process that is forked does not have the scheduler's
+        # thread, so it starts over without the parent's timers.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.__reset)
+
+    def __reset(self):
+        self.__heap = []
+        self.__cancelled = 0
+        self.__condition = threading.Condition(threading.Lock())
+        self.__thread = None
+
+    def schedule(self, seconds, callback, *args):
+        """
+        Run callback(*args) after the specified number of seconds.
+        Returns a Timer that can be used to cancel the callback.
+        """
+        timer = Timer(self, callback, args)
+        entry = (time.monotonic() + seconds, next(self.__sequence), timer)
+
+        with self.__condition:
+            if not self.__thread:
+                self.__thread = threading.Thread(None, self.run, self.name, daemon=True)
+                self.__thread.start()
+
+            heapq.heappush(self.__heap, entry)
+
+            # Wake the thread if this timer is now the next one to expire.
+            if self.__heap[0] is entry:
+                self.__condition.notify()
+
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a timer in constant time.
+        Returns True if the timer was pending.
+        """
+        with self.__condition:
+            if timer.callback is None:
+                return False
+
+            timer.callback = None
+            timer.args = None
+            self.__cancelled += 1
+
+            if self.__cancelled >= self.COMPACT_THRESHOLD and self.__cancelled * 2 > len(self.__heap):
+                self.__heap = [entry for entry in self.__heap if entry[2].callback is not None]
+                heapq.heapify(self.__heap)
+                self.__cancelled = 0
+
+            return True
+
+    def run(self):
+        """
+        Run callbacks as their timers expire.
+        """
+        while True:
+            for callback, args in self.__expire():
+                try:
+                    callback(*args)
+                except Exception as e:
+                    self.log.exception('Timer callback has thrown an exception, %s.', e)
+
+    def __expire(self):
+        """
+        Block until at least one timer expires, then remove and return the
+        callbacks of all expired timers.
+        """
+        expired = []
+
+        with self.__condition:
+            while not expired:
+                heap = self.__heap
+
+                # Discard cancelled timers so that they do not delay the wait.
+                while heap and heap[0][2].callback is None:
+                    heapq.heappop(heap)
+                    self.__cancelled -= 1
+
+                if not heap:
+                    self.__condition.wait()
+                    continue
+
+                now = time.monotonic()
+                while heap and heap[0][0] <= now:
+                    timer = heapq.heappop(heap)[2]
+                    if timer.callback is None:
+                        self.__cancelled -= 1
+                    else:
+                        expired.append((timer.callback, timer.args))
+                        timer.callback = None
+                        timer.args = None
+
+                if not expired and heap:
+                    self.__condition.wait(heap[0][0] - now)
+
+        return expired
+
+    def __len__(self):
+        with self.__condition:
+            return len(self.__heap) - self.__cancelled
+
+    def __str__(self):
+        return 'name: %s, timers: %s' % (self.name, str(len(self)))
@@ -1,39 +1,179 @@
 #!/usr/bin/env python3
 import logging
+import threading
+import time
 from typing import Dict
+from delegator import Delegator
 from dispatcher import Dispatcher
+from event import Event
+from future import ScheduledFuture
 
 class StateEvent:
     """
     An event that can also specify state transitions using the new_state and
     old_state member variables.
     """
-    def __init__(self, id: str, new_state: str, old_state: str=None) -> None:
+    __slots__ = ('id', 'new_state', 'old_state', 'priority', '__dict__')
+
+    def __init__(self, id: str, new_state: str, old_state: str=None, priority: int=Event.PRIORITY_NORMAL) -> None:
         super(StateEvent, self).__init__()
-        self.id = id
+        self.id = Event.intern(id)
         self.new_state = new_state
         self.old_state = old_state
+        self.priority = priority
 
     def __call__(self) -> str:
         return self.id
 
+    @property
+    def code(self) -> int:
+        """
+        The code of the event's id, or None if the id is not a string.
+        """
+        return getattr(self.id, 'code', None)
+
     def __str__(self):
         return 'id: %s, new_state: %s, old_state: %s' % (str(self.id), str(self.new_state), str(self.old_state))
 
+class StateTimeout(StateEvent):
+    """
+    The timeout event that a StateTimer posts when one of its generations
+    expires.  It is stale once the timer has been restarted or stopped, so a
+    timeout that races with a state change is ignored by the Delegator.  Its
+    id does not change, so a coalescing queue still recognizes it.
+    """
+    __slots__ = ('timer', 'generation')
+
+    def __init__(self, timer: 'StateTimer', generation: int, new_state: str) -> None:
+        super(StateTimeout, self).__init__(timer.state.EVENT_TIMEOUT, new_state=new_state, priority=Event.PRIORITY_HIGH)
+        self.timer = timer
+        self.generation = generation
+
+    def stale(self) -> bool:
+        """
+        Return True if the timer has been restarted or stopped since this
+        timeout expired.
+        """
+        return self.timer.generation != self.generation
+
+class StateTimer:
+    """
+    The restartable state timer of a State.
+
+    Restarting or stopping the timer only changes its deadline, so it takes
+    constant time and does not allocate.  The timer keeps one entry in the
+    scheduler: when the entry expires before the deadline because the timer
+    was restarted, it is scheduled again for the rest of the time.
+
+    Each restart or stop starts a new generation.  When the deadline passes,
+    a StateTimeout for the current generation is queued for the owner, so
+    only the timeout of the generation that is still current is processed.
+    The timeout is queued like a scheduled event, so if the owner's queue is
+    full, the queue's policy drops or rejects it without blocking the
+    scheduler.
+    """
+    __slots__ = ('state', 'new_state', 'generation', 'deadline', 'expires', 'timer', 'lock')
+
+    log = logging.getLogger('StateTimer')
+
+    def __init__(self, state) -> None:
+        super(StateTimer, self).__init__()
+        self.state = state
+        self.new_state = None
+        self.generation = 0
+
+        # The deadline of the current generation, or None if the timer is
+        # stopped, and the time that the scheduler entry expires.
+        self.deadline = None
+        self.expires = None
+        self.timer = None
+
+        # Serializes the timer's owner with the scheduler's thread.
+        self.lock = threading.Lock()
+
+    def restart(self, seconds, new_state) -> None:
+        """
+        Start a new generation that expires after the specified number of seconds.
+        """
+        with self.lock:
+            self.generation += 1
+            self.new_state = new_state
+            self.deadline = deadline = time.monotonic() + seconds
+
+            if self.timer is None or deadline < self.expires:
+                if self.timer is not None:
+                    self.timer.cancel()
+                self.expires = deadline
+                self.timer = ScheduledFuture.scheduler.schedule(seconds, self.__expire)
+
+    def stop(self) -> None:
+        """
+        Start a new generation that does not expire.
+        """
+        with self.lock:
+            self.generation += 1
+            self.deadline = None
+
+    def pending(self) -> bool:
+        return self.deadline is not None
+
+    def __expire(self):
+        """
+        The scheduler entry has expired, so queue the timeout event or schedule
+        the entry again.
+        """
+        with self.lock:
+            deadline = self.deadline
+            if deadline is None:
+                self.timer = None
+                return
+
+            now = time.monotonic()
+            if deadline > now:
+                self.expires = deadline
+                self.timer = ScheduledFuture.scheduler.schedule(deadline - now, self.__expire)
+                return
+
+            self.timer = None
+            self.deadline = None
+            event = StateTimeout(self, self.generation, self.new_state)
+
+        obj = self.state.obj
+        try:
+            self.state.dispatcher.schedule(0, event, obj, obj)
+        except Exception as e:
+            # For example, the owner was removed from the dispatcher.
+            self.log.error('Cannot queue the timeout event, %s.', e)
+
+    def __str__(self):
+        return 'state: %s, deadline: %s, generation: %s' % (str(self.new_state), str(self.deadline), str(self.generation))
+
 class State:
-    EVENT_ENTER = 'Enter'
-    EVENT_LEAVE = 'Leave'
-    EVENT_TIMEOUT = 'Timeout'
-    EVENT_STATE_CHANGE = 'StateChange'
+    log = logging.getLogger('State')
+
+    EVENT_ENTER = Event.intern('Enter')
+    EVENT_LEAVE = Event.intern('Leave')
+    EVENT_TIMEOUT = Event.intern('Timeout')
+    EVENT_STATE_CHANGE = Event.intern('StateChange')
 
     """
     A state-machine based on a single state variable.
     Enforces optional state timeouts.
     Can generate internal leave, enter, and timeout events.
+
+    States can be nested by joining their names with Delegator.STATE_SEPARATOR,
+    as in 'Connected/Authenticating'.  Events are handled by the handlers of
+    the innermost state that has one, and a state change leaves and enters
+    each of the nested states up to the states that the old and new states
+    have in common.  State timeouts apply to the exact state.
     """
-    def __init__(self, obj, initial_state: str, state_timeouts: Dict[str,int]=None) -> None:
+    def __init__(self, obj, initial_state: str, state_timeouts: Dict[str,int]=None, dispatcher: Dispatcher=None) -> None:
+        """
+        If a dispatcher is not specified, the default dispatcher is used.
+        """
         super(State, self).__init__()
-        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.dispatcher: Dispatcher = dispatcher if dispatcher is not None else Dispatcher()
 
         if not obj:
             raise TypeError('This state does not have an owner object.')
@@ -45,7 +185,7 @@ class State:
 
         self.current_state: str = None
         self.state_timeouts: Dict[str,int] = state_timeouts if state_timeouts else {}
-        self.state_timer = None
+        self.state_timer: StateTimer = None
         self.reset_state()
 
     def reset_state(self) -> None:
@@ -55,7 +195,7 @@ class State:
         if not self.initial_state:
             raise TypeError('This state does not have an initial state.')
 
-        self.log.info('Resetting state to ' + str(self.initial_state) + '.')
+        self.log.info('Resetting state to %s.', self.initial_state)
         self.current_state = self.initial_state
         self.stop_state_timer()
 
@@ -66,10 +206,24 @@ class State:
 
         return str(self.current_state)
 
+    def in_state(self, state: str) -> bool:
+        """
+        Return True if the current state is state or is nested in it.
+        """
+        current_state = self.current_state
+        if current_state == state:
+            return True
+        separator = Delegator.STATE_SEPARATOR
+        return bool(separator) and isinstance(current_state, str) and current_state.startswith(state + separator)
+
     def change_state(self, new_state: str, notify: bool=False) -> None:
         """
         Transition to the new state and optionally notify listeners.
         The state transition will also generate and process internal leave and enter events.
+        For nested states, a leave event is processed in each of the states
+        that are left, from the innermost one, and an enter event in each of
+        the states that are entered, from the outermost one.
+        If a leave handler raises, the old state is kept.
         """
 
         if self.current_state is None:
@@ -82,49 +236,88 @@ class State:
             # Stop state timer.
             self.stop_state_timer()
 
-            # Leave pseudo-event.
-            Dispatcher().send(StateEvent(self.EVENT_LEAVE, new_state=new_state, old_state=old_state), self.obj, self.obj)
+            left, entered = State.path_change(old_state, new_state)
+            changed = False
+            try:
+                # Leave pseudo-events.
+                for state in left:
+                    self.current_state = state
+                    self.dispatcher.send(StateEvent(self.EVENT_LEAVE, new_state=new_state, old_state=old_state), self.obj, self.obj)
 
-            # Change state.
-            self.log.info('Changing state from %s to %s.' % (str(old_state), str(new_state)))
-            self.current_state = new_state
+                # Change state.
+                self.log.info('Changing state from %s to %s.', old_state, new_state)
+                changed = True
 
-            # Enter pseudo-event.
-            Dispatcher().send(StateEvent(self.EVENT_ENTER, new_state=new_state, old_state=old_state), self.obj, self.obj)
+                # Enter pseudo-events.
+                for state in entered:
+                    self.current_state = state
+                    self.dispatcher.send(StateEvent(self.EVENT_ENTER, new_state=new_state, old_state=old_state), self.obj, self.obj)
+            finally:
+                if changed:
+                    self.current_state = new_state
+                else:
+                    # A leave handler failed, so stay in the old state.
+                    self.current_state = old_state
+                    self.start_state_timer()
 
             # Notify listeners.
             if notify:
                 self.log.info('Notify listeners of the state change.')
-                Dispatcher().notify(StateEvent(self.EVENT_STATE_CHANGE, new_state=new_state, old_state=old_state), self.obj)
+                self.dispatcher.notify(StateEvent(self.EVENT_STATE_CHANGE, new_state=new_state, old_state=old_state), self.obj)
 
             # Start state timer.
             self.start_state_timer()
 
+    @staticmethod
+    def path_change(old_state, new_state):
+        """
+        Return the states that are left, from the innermost one, and the
+        states that are entered, from the outermost one, by a change from
+        old_state to new_state.  The common outer states are neither left nor
+        entered.
+        """
+        separator = Delegator.STATE_SEPARATOR
+        if not separator or not isinstance(old_state, str) or not isinstance(new_state, str):
+            return [old_state], [new_state]
+
+        old_path = old_state.split(separator)
+        new_path = new_state.split(separator)
+        common = 0
+        for old, new in zip(old_path, new_path):
+            if old != new:
+                break
+            common += 1
+
+        left = [separator.join(old_path[:depth]) for depth in range(len(old_path), common, -1)]
+        entered = [separator.join(new_path[:depth]) for depth in range(common + 1, len(new_path) + 1)]
+        return left, entered
+
     def start_state_timer(self) -> None:
         """
         If the current state is configured with a state timeout, then start the state timer.
+        The timer is restarted if it is running.
         """
 
         state_timeout = self.state_timeouts.get(self.current_state, None)
 
         if state_timeout:
-            self.log.info('Start state timer with a timeout of ' + str(state_timeout) + '.')
-
-            if self.state_timer:
-                self.stop_state_timer()
+            self.log.info('Start state timer with a timeout of %s.', state_timeout)
 
-            self.state_timer = Dispatcher().schedule(state_timeout, StateEvent(self.EVENT_TIMEOUT, new_state=self.current_state), self.obj, self.obj)
+            if self.state_timer is None:
+                self.state_timer = StateTimer(self)
+            self.state_timer.restart(state_timeout, self.current_state)
 
     def stop_state_timer(self) -> None:
         """
         Stop the state timer if it is running.
+        A timeout event that was already posted is ignored.
         """
 
         if self.state_timer:
-            self.log.info('Stop state timer.')
+            if self.state_timer.pending():
+                self.log.info('Stop state timer.')
 
-            self.state_timer.cancel()
-            self.state_timer = None
+            self.state_timer.stop()
 
     def __str__(self):
         return 'state: %s, timer: %s, timeouts: %s' % (str(self.current_state), str(self.state_timer), str(self.state_timeouts))
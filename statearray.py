@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+import array
+import logging
+import time
+from dispatcher import Dispatcher
+from statetable import StateTable
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class StateArray:
+    """
+    The states of many identical state-machines that share a compiled
+    StateTable, stored in a column of state numbers instead of in a TableState
+    for each instance.  Instances are identified by their index in the column.
+
+    process() applies an event to a batch of instances at once.  Transitions
+    without side effects only update the column, and the owner's handlers,
+    guards, and actions are only called, one instance at a time, for the
+    transitions that have them.  They are called like those of a TableState,
+    with the index of the instance after the event, for example
+    inStarted_onEnter(self, event, index).  Listeners of the owner are
+    notified of state changes with the index as an argument.
+
+    State timeouts are tracked in a column of deadlines, and expire() processes
+    the timeout events of the instances whose deadlines have passed, so the
+    owner calls it periodically, for example from a scheduled event.
+
+    The columns are NumPy arrays if NumPy is installed, and batches are looked
+    up with vectorized operations.  Otherwise, they are arrays from the array
+    module, and each instance is looked up in turn.
+    """
+    log = logging.getLogger('StateArray')
+
+    def __init__(self, table: StateTable, size: int, obj=None, dispatcher: Dispatcher=None, use_numpy: bool=None) -> None:
+        """
+        If use_numpy is not specified, NumPy is used if it is installed.
+        If a dispatcher is not specified, the default dispatcher is used.
+        """
+        super(StateArray, self).__init__()
+
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError('Cannot use NumPy, it is not installed.')
+        self.use_numpy = use_numpy
+
+        self.dispatcher: Dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        self.obj = obj
+        self.table = table.compile()
+        self.size = size
+        self.handlers = table.handlers(obj.__class__ if obj is not None else object)
+
+        # The timeout of each state, which is infinite for states without one.
+        timeouts = [timeout if timeout else float('inf') for timeout in table.timeouts]
+        self.timed = any(table.timeouts)
+
+        # Whether the transition in each slot of the table calls a handler,
+        # guard, or action, or notifies the listeners.
+        enter, leave, guards, actions = self.handlers
+        effects = []
+        for slot, new_state in enumerate(table.targets):
+            state = slot // table.event_count
+            effects.append(new_state >= 0 and bool(
+                guards[slot] or actions[slot] or
+                (new_state != state and (leave[state] or enter[new_state] or table.changes[slot][2]))))
+
+        initial_state = table.state_index[table.initial_state]
+        if use_numpy:
+            self.states = numpy.full(size, initial_state, dtype=numpy.int32)
+            self.deadlines = numpy.full(size, float('inf'))
+            self.__targets = numpy.array(table.targets, dtype=numpy.int32)
+            self.__timeouts = numpy.array(timeouts)
+            self.__effects = numpy.array(effects, dtype=bool)
+        else:
+            self.states = array.array('i', [initial_state]) * size
+            self.deadlines = array.array('d', [float('inf')]) * size
+            self.__targets = table.targets
+            self.__timeouts = timeouts
+            self.__effects = effects
+
+    def state_of(self, index: int) -> str:
+        """
+        Return the name of the current state of an instance.
+        """
+        return self.table.states[self.states[index]]
+
+    def count(self, state: str) -> int:
+        """
+        Return the number of instances in a state.
+        """
+        code = self.table.state_index[state]
+        if self.use_numpy:
+            return int(numpy.count_nonzero(self.states == code))
+        return self.states.count(code)
+
+    def reset(self, indices=None) -> None:
+        """
+        Set the state of the instances, or of all instances if indices is not
+        specified, to the initial state and clear their deadlines.
+        """
+        initial_state = self.table.state_index[self.table.initial_state]
+        if indices is None:
+            indices = range(self.size)
+
+        if self.use_numpy:
+            indices = numpy.asarray(indices, dtype=numpy.intp)
+            self.states[indices] = initial_state
+            self.deadlines[indices] = float('inf')
+        else:
+            for index in indices:
+                self.states[index] = initial_state
+                self.deadlines[index] = float('inf')
+
+    def process(self, event, indices=None, *args, **kwargs) -> int:
+        """
+        Take the transition of each instance's current state on event, for the
+        instances with the indices, or for all instances if indices is not
+        specified.  The indices must not repeat.
+        Returns the number of transitions that were taken.
+        """
+        table = self.table
+        code = table.event_index.get(event() if hasattr(event, '__call__') else event)
+        if code is None:
+            return 0
+
+        if self.use_numpy:
+            return self.__process_columns(code, event, indices, args, kwargs)
+
+        if indices is None:
+            indices = range(self.size)
+
+        states = self.states
+        deadlines = self.deadlines
+        targets = self.__targets
+        effects = self.__effects
+        timeouts = self.__timeouts
+        count = table.event_count
+        now = time.monotonic() if self.timed else 0.0
+
+        taken = 0
+        for index in indices:
+            state = states[index]
+            slot = state * count + code
+            new_state = targets[slot]
+            if new_state < 0:
+                continue
+            if effects[slot]:
+                taken += self.__step(index, state, new_state, slot, event, args, kwargs)
+            else:
+                states[index] = new_state
+                if new_state != state and self.timed:
+                    deadlines[index] = now + timeouts[new_state]
+                taken += 1
+
+        return taken
+
+    def expire(self, now: float=None) -> int:
+        """
+        Process the timeout events of the instances whose deadlines have
+        passed, and clear their deadlines.  The time defaults to
+        time.monotonic().
+        Returns the number of instances that timed out.
+        """
+        if not self.timed:
+            return 0
+        if now is None:
+            now = time.monotonic()
+
+        # Group the instances by their state, which decides their timeout event.
+        if self.use_numpy:
+            expired = numpy.flatnonzero(self.deadlines <= now)
+            if not len(expired):
+                return 0
+            self.deadlines[expired] = float('inf')
+            states = self.states[expired]
+            groups = [(int(state), expired[states == state]) for state in numpy.unique(states)]
+            expired = len(expired)
+        else:
+            groups = {}
+            deadlines = self.deadlines
+            for index in range(self.size):
+                if deadlines[index] <= now:
+                    deadlines[index] = float('inf')
+                    groups.setdefault(self.states[index], []).append(index)
+            expired = sum(len(indices) for indices in groups.values())
+            groups = groups.items()
+
+        for state, indices in groups:
+            self.process(self.table.timeout_events[state], indices)
+
+        return expired
+
+    def next_deadline(self) -> float:
+        """
+        Return the earliest deadline of the instances, or None if no instance
+        has one.
+        """
+        if not self.timed:
+            return None
+        deadline = float(self.deadlines.min()) if self.use_numpy else min(self.deadlines, default=float('inf'))
+        return deadline if deadline != float('inf') else None
+
+    def __process_columns(self, code, event, indices, args, kwargs):
+        """
+        Take the transitions of a batch of instances with NumPy.
+        """
+        indices = numpy.arange(self.size) if indices is None else numpy.asarray(indices, dtype=numpy.intp)
+        states = self.states[indices]
+        slots = states * self.table.event_count + code
+        new_states = self.__targets[slots]
+
+        taken = new_states >= 0
+        if not taken.all():
+            indices, states, new_states, slots = indices[taken], states[taken], new_states[taken], slots[taken]
+
+        effects = self.__effects[slots]
+        if not effects.any():
+            self.__assign(indices, states, new_states)
+            return len(indices)
+
+        simple = ~effects
+        self.__assign(indices[simple], states[simple], new_states[simple])
+        count = int(simple.sum())
+        for index, state, new_state, slot in zip(indices[effects].tolist(), states[effects].tolist(), new_states[effects].tolist(), slots[effects].tolist()):
+            count += self.__step(index, state, new_state, slot, event, args, kwargs)
+        return count
+
+    def __assign(self, indices, states, new_states):
+        self.states[indices] = new_states
+        if self.timed:
+            changed = new_states != states
+            self.deadlines[indices[changed]] = time.monotonic() + self.__timeouts[new_states[changed]]
+
+    def __step(self, index, state, new_state, slot, event, args, kwargs):
+        """
+        Take a transition with side effects for one instance.
+        Returns 1 if it was taken, or 0 if its guard did not allow it.
+        """
+        enter, leave, guards, actions = self.handlers
+        obj = self.obj
+
+        guard = guards[slot]
+        if guard is not None and not guard(obj, event, index, *args, **kwargs):
+            return 0
+
+        action = actions[slot]
+        if new_state == state:
+            if action is not None:
+                action(obj, event, index, *args, **kwargs)
+            return 1
+
+        leave_event, enter_event, change_event = self.table.changes[slot]
+
+        function = leave[state]
+        if function is not None:
+            function(obj, leave_event, index)
+
+        if action is not None:
+            action(obj, event, index, *args, **kwargs)
+
+        self.states[index] = new_state
+        if self.timed:
+            self.deadlines[index] = time.monotonic() + self.__timeouts[new_state]
+
+        function = enter[new_state]
+        if function is not None:
+            function(obj, enter_event, index)
+
+        if change_event is not None:
+            self.dispatcher.notify(change_event, obj, index)
+
+        return 1
+
+    def __str__(self):
+        return 'size: %s, states: %s' % (str(self.size), ', '.join('%s: %d' % (state, self.count(state)) for state in self.table.states))
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+import array
+import inspect
+import logging
+import types
+from typing import Dict
+from delegator import Delegator
+from dispatcher import Dispatcher
+from event import Event
+from state import State
+from state import StateEvent
+from state import StateTimer
+
+class StateTable:
+    """
+    A declarative transition table that is compiled once and shared by all of
+    the TableStates that use it.
+
+    States and event ids are numbered when the table is compiled, and the new
+    state of each transition is stored in an array that is indexed by
+    state * len(events) + event, so looking up a transition does not format
+    handler names or probe attributes.  The leave, enter, and state change
+    events of each transition are also created when the table is compiled.
+
+    A transition can have a guard, which must return a true value for the
+    transition to be taken, and an action, which is called after the old state
+    is left and before the new state is entered.  Guards and actions are
+    functions that are called as function(obj, event, *args, **kwargs), or the
+    names of methods of the owner object.  A transition to the same state only
+    calls its action.
+
+    The enter and leave handlers of each state, for example inStarted_onEnter(),
+    are found with the Delegator's naming conventions the first time the table
+    is used by an owner of a class.  Call invalidate() after changing the
+    handlers of a class that has already used the table.
+    """
+    log = logging.getLogger('StateTable')
+
+    def __init__(self, states, initial_state: str, state_timeouts: Dict[str,int]=None) -> None:
+        super(StateTable, self).__init__()
+
+        self.states = list(states)
+        self.initial_state = initial_state
+        self.state_timeouts = dict(state_timeouts) if state_timeouts else {}
+
+        # The declared transitions, as (state, event, new_state, guard, action, notify).
+        self.transitions = []
+
+        # The compiled table.
+        self.compiled = False
+        self.state_index = None
+        self.event_index = None
+        self.event_count = 0
+        self.targets = None
+        self.guards = None
+        self.actions = None
+        self.changes = None
+        self.timeouts = None
+        self.timeout_events = None
+        self.timeout_code = None
+
+        # The enter and leave handlers, guards, and actions by owner class.
+        self.__classes = {}
+
+        # The leave, enter, and state change events of calls to change_state()
+        # by (old state, new state).
+        self.__changes = {}
+
+    def add(self, state: str, event, new_state: str, guard=None, action=None, notify: bool=False) -> 'StateTable':
+        """
+        Add a transition from state to new_state when event is processed.
+        If notify is True, the listeners of the owner are notified of the
+        state change.
+        Returns the table, so that calls can be chained.
+        """
+        if self.compiled:
+            raise Exception('Cannot add a transition to a compiled state table.')
+
+        if hasattr(event, '__call__'):
+            event = event()
+        self.transitions.append((state, event, new_state, guard, action, notify))
+        return self
+
+    def compile(self) -> 'StateTable':
+        """
+        Validate the table and compile it into arrays.
+        Tables are compiled once, and then cannot be changed.
+        Returns the table.
+        """
+        if self.compiled:
+            return self
+
+        if not self.states:
+            raise ValueError('A state table must have at least one state.')
+
+        state_index = {}
+        for state in self.states:
+            if state in state_index:
+                raise ValueError('Duplicate state, ' + str(state) + '.')
+            state_index[state] = len(state_index)
+
+        if self.initial_state not in state_index:
+            raise ValueError('Unknown initial state, ' + str(self.initial_state) + '.')
+
+        for state, timeout in self.state_timeouts.items():
+            if state not in state_index:
+                raise ValueError('Unknown state, ' + str(state) + ', with a timeout.')
+            if timeout is not None and timeout <= 0:
+                raise ValueError('Invalid timeout, ' + str(timeout) + ', for state, ' + str(state) + '.')
+
+        event_index = {}
+        for state, event, new_state, guard, action, notify in self.transitions:
+            for name in (state, new_state):
+                if name not in state_index:
+                    raise ValueError('Unknown state, ' + str(name) + ', in the transition on event, ' + str(event) + '.')
+            if event not in event_index:
+                event_index[event] = len(event_index)
+
+        size = len(state_index) * len(event_index)
+        targets = array.array('i', [-1]) * size
+        guards = [None] * size
+        actions = [None] * size
+        changes = [None] * size
+        for state, event, new_state, guard, action, notify in self.transitions:
+            slot = state_index[state] * len(event_index) + event_index[event]
+            if targets[slot] >= 0:
+                raise ValueError('Duplicate transition from state, ' + str(state) + ', on event, ' + str(event) + '.')
+            targets[slot] = state_index[new_state]
+            guards[slot] = guard
+            actions[slot] = action
+            changes[slot] = self.__events(state, new_state, notify)
+
+        self.state_index = state_index
+        self.event_index = event_index
+        self.event_count = len(event_index)
+        self.targets = targets
+        self.guards = guards
+        self.actions = actions
+        self.changes = changes
+        self.timeouts = [self.state_timeouts.get(state) for state in self.states]
+        self.timeout_events = [StateEvent(State.EVENT_TIMEOUT, new_state=state, priority=Event.PRIORITY_HIGH) for state in self.states]
+        self.timeout_code = event_index.get(State.EVENT_TIMEOUT)
+        self.compiled = True
+
+        self.log.debug('Compiled %s states and %s events.', len(state_index), len(event_index))
+        return self
+
+    def handlers(self, cls):
+        """
+        Return the compiled enter handlers, leave handlers, guards, and actions
+        of an owner class.  Each is a list of functions that are called as
+        function(obj, event, *args, **kwargs), or None.
+        """
+        try:
+            return self.__classes[cls]
+        except KeyError:
+            pass
+
+        self.compile()
+        enter = [StateTable.__handler(cls, State.EVENT_ENTER, state) for state in self.states]
+        leave = [StateTable.__handler(cls, State.EVENT_LEAVE, state) for state in self.states]
+        guards = [StateTable.__method(cls, guard) for guard in self.guards]
+        actions = [StateTable.__method(cls, action) for action in self.actions]
+
+        handlers = (enter, leave, guards, actions)
+        self.__classes[cls] = handlers
+        return handlers
+
+    def change_events(self, old_state: str, new_state: str):
+        """
+        Return the leave, enter, and state change events of a change from
+        old_state to new_state.  They are created once for each pair of states.
+        """
+        key = (old_state, new_state)
+        events = self.__changes.get(key)
+        if events is None:
+            events = self.__events(old_state, new_state, True)
+            self.__changes[key] = events
+        return events
+
+    def invalidate(self, cls=None) -> None:
+        """
+        Discard the compiled handlers of an owner class, or of all classes if
+        cls is not specified.
+        """
+        if cls is None:
+            self.__classes.clear()
+        else:
+            self.__classes.pop(cls, None)
+
+    @staticmethod
+    def __events(old_state, new_state, notify):
+        return (StateEvent(State.EVENT_LEAVE, new_state=new_state, old_state=old_state),
+                StateEvent(State.EVENT_ENTER, new_state=new_state, old_state=old_state),
+                StateEvent(State.EVENT_STATE_CHANGE, new_state=new_state, old_state=old_state) if notify else None)
+
+    @staticmethod
+    def __handler(cls, event, state):
+        return StateTable.__callable(cls, Delegator.find_class_handler(cls, event, state))
+
+    @staticmethod
+    def __method(cls, function):
+        if function is None or not isinstance(function, str):
+            return function
+
+        try:
+            method = inspect.getattr_static(cls, function)
+        except AttributeError:
+            raise ValueError('The class, ' + cls.__name__ + ', does not have a method, ' + function + '.')
+        return StateTable.__callable(cls, method)
+
+    @staticmethod
+    def __callable(cls, function):
+        # Return a function that is called as function(obj, event, *args, **kwargs).
+        if function is None or isinstance(function, types.FunctionType):
+            return function
+        return lambda obj, *args, **kwargs: function.__get__(obj, cls)(*args, **kwargs)
+
+class TableState:
+    """
+    A state-machine that takes the transitions of a compiled StateTable.
+    The owner passes events to process(), for example from its onDefault()
+    handler, and the table decides which transition is taken.  The enter and
+    leave handlers of the owner are called directly, rather than through the
+    Dispatcher, and are passed the events that the table created.
+
+    Like State, it enforces the table's state timeouts with a StateTimer that
+    posts a timeout event to the owner, and it can be used as the owner's
+    identify_state().
+    """
+    log = logging.getLogger('TableState')
+
+    EVENT_TIMEOUT = State.EVENT_TIMEOUT
+
+    def __init__(self, obj, table: StateTable, dispatcher: Dispatcher=None) -> None:
+        """
+        If a dispatcher is not specified, the default dispatcher is used.
+        """
+        super(TableState, self).__init__()
+
+        self.dispatcher: Dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+
+        if not obj:
+            raise TypeError('This state does not have an owner object.')
+        self.obj = obj
+
+        self.table = table.compile()
+        self.handlers = table.handlers(obj.__class__)
+
+        self.state: int = None
+        self.state_timer: StateTimer = None
+        self.reset_state()
+
+    @property
+    def current_state(self) -> str:
+        return self.table.states[self.state]
+
+    @property
+    def initial_state(self) -> str:
+        return self.table.initial_state
+
+    def reset_state(self) -> None:
+        """
+        Set the current state to the initial state.
+        """
+        self.log.info('Resetting state to %s.', self.table.initial_state)
+        self.state = self.table.state_index[self.table.initial_state]
+        self.stop_state_timer()
+
+    def identify_state(self, event) -> str: #pylint: disable=unused-argument
+        """
+        Return the current state as the state variable.
+        """
+        return self.table.states[self.state]
+
+    def process(self, event, *args, **kwargs) -> bool:
+        """
+        Take the transition of the current state on event, if it has one and
+        its guard allows it.  A timeout event for a state that was already left
+        is ignored.
+        Returns True if a transition was taken.
+        """
+        table = self.table
+        stale = getattr(event, 'stale', None)
+        if stale is not None and stale():
+            self.log.debug('Ignoring a stale timeout.')
+            return False
+
+        code = table.event_index.get(event() if hasattr(event, '__call__') else event)
+        if code is None:
+            return False
+
+        state = self.state
+        slot = state * table.event_count + code
+        new_state = table.targets[slot]
+        if new_state < 0:
+            return False
+
+        if code == table.timeout_code and getattr(event, 'new_state', None) not in (None, table.states[state]):
+            self.log.debug('Ignoring a stale timeout for state, %s.', event.new_state)
+            return False
+
+        enter, leave, guards, actions = self.handlers
+        guard = guards[slot]
+        if guard is not None and not guard(self.obj, event, *args, **kwargs):
+            return False
+
+        action = actions[slot]
+        if new_state == state:
+            if action is not None:
+                action(self.obj, event, *args, **kwargs)
+            return True
+
+        self.__change(state, new_state, table.changes[slot], action, event, args, kwargs)
+        return True
+
+    def change_state(self, new_state: str, notify: bool=False) -> None:
+        """
+        Transition to the new state and optionally notify listeners.
+        The state transition will also call the leave and enter handlers.
+        """
+        state = self.state
+        index = self.table.state_index.get(new_state)
+        if index is None:
+            raise ValueError('Unknown state, ' + str(new_state) + '.')
+
+        if index != state:
+            leave_event, enter_event, change_event = self.table.change_events(self.table.states[state], new_state)
+            self.__change(state, index, (leave_event, enter_event, change_event if notify else None), None, None, (), {})
+
+    def __change(self, state, new_state, changes, action, event, args, kwargs):
+        leave_event, enter_event, change_event = changes
+        enter, leave = self.handlers[0], self.handlers[1]
+        obj = self.obj
+
+        self.stop_state_timer()
+
+        function = leave[state]
+        if function is not None:
+            function(obj, leave_event)
+
+        if action is not None:
+            action(obj, event, *args, **kwargs)
+
+        self.log.debug('Changing state from %s to %s.', leave_event.old_state, leave_event.new_state)
+        self.state = new_state
+
+        function = enter[new_state]
+        if function is not None:
+            function(obj, enter_event)
+
+        if change_event is not None:
+            self.dispatcher.notify(change_event, obj)
+
+        if self.table.timeouts[new_state]:
+            self.start_state_timer()
+
+    def start_state_timer(self) -> None:
+        """
+        If the current state is configured with a state timeout, then start the state timer.
+        """
+        state_timeout = self.table.timeouts[self.state]
+
+        if state_timeout:
+            self.log.info('Start state timer with a timeout of %s.', state_timeout)
+
+            if self.state_timer is None:
+                self.state_timer = StateTimer(self)
+            self.state_timer.restart(state_timeout, self.table.states[self.state])
+
+    def stop_state_timer(self) -> None:
+        """
+        Stop the state timer if it is running.
+        A timeout event that was already posted is ignored.
+        """
+        if self.state_timer:
+            if self.state_timer.pending():
+                self.log.info('Stop state timer.')
+
+            self.state_timer.stop()
+
+    def __str__(self):
+        return 'state: %s, timer: %s, timeouts: %s' % (str(self.current_state), str(self.state_timer), str(self.table.state_timeouts))
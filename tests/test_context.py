@@ -1,8 +1,19 @@
 #! /usr/bin/python
+import asyncio
 import copy
+import pytest
+import queue
+import threading
 import time
 from event import Event
+from context import AsyncContext
 from context import Context
+from context import PoolContext
+from dispatcher import Dispatcher
+from eventqueue import DequeQueue
+from eventqueue import EventQueue
+from eventqueue import PriorityEventQueue
+from state import StateEvent
 
 class SampleObj():
     def __init__(self, events):
@@ -45,3 +56,255 @@ class TestContextPolled:
         time.sleep(0.1)
 
         c.poll()
+
+class TestContextAsync:
+    class SampleObj:
+        def onEcho(self, event, value):
+            return value
+
+        def onTimeout(self, event):
+            return 'Timeout'
+
+    @staticmethod
+    async def wait(future):
+        return await future
+
+    def test(self):
+        async def main():
+            c0 = AsyncContext('context0')
+            c1 = AsyncContext('context1')
+            c0.start()
+            c1.start()
+
+            o0 = self.SampleObj()
+            Dispatcher.add(obj=o0, context=c0)
+            o1 = self.SampleObj()
+            Dispatcher.add(obj=o1, context=c1)
+
+            # Events between contexts are queued and their futures can be awaited.
+            assert await Dispatcher.queue(Event('Echo'), o0, o1, 'value0') == 'value0'
+            assert await Dispatcher.send(Event('Echo'), o0, o1, 'value1') == 'value1'
+
+            # Events within a context are sent directly and can be awaited too.
+            o2 = self.SampleObj()
+            Dispatcher.add(obj=o2, context=c0)
+            assert await Dispatcher.send(Event('Echo'), o0, o2, 'value4') == 'value4'
+            Dispatcher.remove(o2)
+
+            # A future can be awaited by several coroutines at once.
+            future = Dispatcher.schedule(0.05, Event('Echo'), o0, o1, 'value3')
+            cancelled = asyncio.ensure_future(self.wait(future))
+            waiters = [asyncio.ensure_future(self.wait(future)) for i in range(2)]
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            assert await asyncio.gather(*waiters) == ['value3', 'value3']
+
+            # Events can be queued from other threads.
+            future = await asyncio.get_running_loop().run_in_executor(None, c1.queue, Event('Echo'), o0, o1, 'value2')
+            assert await future == 'value2'
+
+            # Timers use the loop.
+            assert await Dispatcher.schedule(0.01, Event('Timeout'), o0, o1) == 'Timeout'
+            future = Dispatcher.schedule(60, Event('Timeout'), o0, o1)
+            assert future.cancel()
+            assert await future is None
+
+            Dispatcher.remove(o0)
+            Dispatcher.remove(o1)
+
+            await c0.stop()
+            await c1.stop()
+
+        asyncio.run(main())
+
+class TestContextPool:
+    class SampleObj:
+        def __init__(self):
+            self.values = []
+
+        def onAppend(self, event, value):
+            self.values.append(value)
+            return threading.current_thread().name
+
+    def test(self):
+        c = PoolContext('pool', 4)
+        c.start()
+
+        src = self.SampleObj()
+        Dispatcher.add(obj=src, context=c)
+        objs = [self.SampleObj() for i in range(16)]
+        for o in objs:
+            Dispatcher.add(obj=o, context=c)
+            assert Dispatcher().get_node(o).context is c.context_for(o)
+
+        futures = [Dispatcher.queue(Event('Append'), src, o, i) for i in range(100) for o in objs]
+
+        # Each object's events are processed in order on its worker's thread.
+        for future, o in zip(futures, objs * 100):
+            assert future() == c.context_for(o).name
+        for o in objs:
+            assert o.values == list(range(100))
+
+        for o in objs + [src]:
+            Dispatcher.remove(o)
+
+        assert c.stop()
+
+class TestContextBatch:
+    class SampleObj:
+        def __init__(self):
+            self.values = []
+
+        def onAppend(self, event, value):
+            self.values.append(value)
+            return len(self.values)
+
+    def test(self):
+        c = Context('context0')
+
+        objs = [self.SampleObj() for i in range(3)]
+        futures = c.queue_many([(Event('Append'), None, o) for o in objs * 2], 'value')
+        assert len(futures) == 6
+
+        c.poll()
+        assert [future() for future in futures] == [1, 1, 1, 2, 2, 2]
+        for o in objs:
+            assert o.values == ['value', 'value']
+
+        # Listeners in the same context are notified with one batch.
+        src = self.SampleObj()
+        Dispatcher.add(obj=src, context=c)
+        for o in objs:
+            Dispatcher.add(obj=o, context=c)
+            Dispatcher.add_listener(src, o)
+
+        Dispatcher.notify(Event('Append'), src, 'notified')
+        c.poll()
+        for o in objs:
+            assert o.values == ['value', 'value', 'notified']
+
+        for o in objs + [src]:
+            Dispatcher.remove(o)
+
+class TestContextDequeQueue:
+    def test(self):
+        events = [Event('event0'), Event('event1'), Event('event2')]
+
+        o = SampleObj(events)
+
+        c = Context('context0', event_queue=DequeQueue())
+        c.start()
+
+        futures = [c.queue(event, o, o) for event in events]
+        for future in futures:
+            future()
+
+        assert c.stop()
+
+class TestContextPriorityStop:
+    class SampleObj:
+        def onWork(self, event):
+            return event()
+
+    def test(self):
+        c = Context('context0', event_queue=PriorityEventQueue())
+        o = self.SampleObj()
+
+        # Low-priority events that are queued before stop() are processed.
+        futures = c.queue_many([(Event('Work', Event.PRIORITY_LOW), o, o) for i in range(1000)])
+        c.start()
+        assert c.stop(5)
+        assert all(future.done() for future in futures)
+        assert futures[-1]() == 'Work'
+
+class TestContextScheduleFull:
+    class SampleObj:
+        def onTick(self, event):
+            return event()
+
+    def test(self):
+        o = self.SampleObj()
+
+        # A scheduled event that does not fit in a full queue fails instead
+        # of blocking or raising on the scheduler thread.
+        for policy in (EventQueue.POLICY_BLOCK, EventQueue.POLICY_FAIL, EventQueue.POLICY_COALESCE):
+            c = Context('context0', event_queue=EventQueue(1, policy))
+            c.queue(Event('Fill'), o, o)
+            future = c.schedule(0.01, Event('Tick'), o, o)
+            time.sleep(0.1)
+            assert future.done()
+            with pytest.raises(queue.Full):
+                future()
+
+        # Timers of other contexts still fire.
+        c = Context('context1')
+        future = c.schedule(0.01, Event('Tick'), o, o)
+        time.sleep(0.1)
+        c.poll()
+        assert future() == 'Tick'
+
+class TestContextCoalesce:
+    class SampleObj:
+        def __init__(self):
+            self.states = []
+
+        def onStateChange(self, event):
+            self.states.append(event.new_state)
+
+    def test(self):
+        c = Context('context0', event_queue=EventQueue(coalesce=EventQueue.COALESCE_REPLACE))
+        o0 = self.SampleObj()
+        o1 = self.SampleObj()
+        Dispatcher.add(obj=o0, context=c)
+        Dispatcher.add(obj=o1, context=c)
+        Dispatcher.add_listener(o0, o1)
+
+        # A burst of notifications is processed once, with the newest event.
+        for i in range(10):
+            Dispatcher.notify(StateEvent('StateChange', new_state=str(i)), o0)
+        c.poll()
+        assert o1.states == ['9']
+        assert c.counters()['coalesced'] == 9
+
+        Dispatcher.remove(o0)
+        Dispatcher.remove(o1)
+
+class TestContextPost:
+    class SampleObj:
+        def __init__(self):
+            self.values = []
+
+        def onEcho(self, event, value):
+            self.values.append(value)
+            return value
+
+        def onFail(self, event):
+            raise Exception('Fail')
+
+    def test(self):
+        c0 = Context('context0')
+        c1 = Context('context1', event_queue=EventQueue(coalesce=EventQueue.COALESCE_MERGE))
+        o0 = self.SampleObj()
+        o1 = self.SampleObj()
+        Dispatcher.add(obj=o0, context=c0)
+        Dispatcher.add(obj=o1, context=c1)
+
+        # Events in the same context are processed right away, without a result.
+        assert Dispatcher.post(Event('Echo'), o1, o1, 'value0') is None
+        assert o1.values == ['value0']
+
+        # Events for other contexts are queued, and exceptions are only logged.
+        Dispatcher.post(Event('Echo'), o0, o1, 'value1')
+        Dispatcher.post(Event('Fail'), o0, o1)
+        c1.poll()
+        assert o1.values == ['value0', 'value1']
+
+        # A future that is coalesced with a posted event gets its result.
+        Dispatcher.post(Event('Echo'), o0, o1, 'value2')
+        future = Dispatcher.queue(Event('Echo'), o0, o1, 'value3')
+        c1.poll()
+        assert future() == 'value2'
+        assert o1.values == ['value0', 'value1', 'value2']
+
+        Dispatcher.remove(o0)
+        Dispatcher.remove(o1)
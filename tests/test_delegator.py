@@ -1,6 +1,8 @@
 #! /usr/bin/python
+import gc
 import logging
 import sys
+from unittest import mock
 from delegator import Delegator
 
 class TestDelegator1:
@@ -194,3 +196,88 @@ class TestDelegator1:
         o.Query(12)
         assert str(o.state) == self.SampleObj.STATE_STOPPED
         assert str(o.lastHandler) == 'inStopped_onDefault'
+
+class TestDelegatorCompiled:
+    class SampleObj:
+        def __init__(self):
+            self.state = 'Idle'
+
+        def identify_state(self, event):
+            return self.state
+
+        def inIdle_onStart(self):
+            return 'inIdle_onStart'
+
+        def onStart(self):
+            return 'onStart'
+
+        def handleStart(self):
+            return 'handleStart'
+
+    def test(self):
+        o = self.SampleObj()
+
+        # Handlers are bound to the object.
+        assert Delegator.get_handler(o, 'Start')() == 'inIdle_onStart'
+        assert Delegator.get_handler(o, 'Stop') is None
+        o.state = 'Busy'
+        assert Delegator.get_handler(o, 'Start')() == 'onStart'
+
+        # Reconfiguring a naming convention discards the compiled handlers.
+        try:
+            Delegator.EVENT_HANDLER_FORMAT = 'handle{0}'
+            assert Delegator.get_handler(o, 'Start')() == 'handleStart'
+        finally:
+            Delegator.EVENT_HANDLER_FORMAT = 'on{0}'
+        assert Delegator.get_handler(o, 'Start')() == 'onStart'
+
+        # Changing the class after it has dispatched changes its handlers.
+        self.SampleObj.onStop = lambda self: 'onStop'
+        try:
+            assert Delegator.get_handler(o, 'Stop')() == 'onStop'
+        finally:
+            del self.SampleObj.onStop
+        assert Delegator.get_handler(o, 'Stop') is None
+        with mock.patch.object(self.SampleObj, 'onStart', lambda self: 'patched onStart'):
+            assert Delegator.get_handler(o, 'Start')() == 'patched onStart'
+        assert Delegator.get_handler(o, 'Start')() == 'onStart'
+        self.SampleObj.inBusy_onStart = lambda self: 'inBusy_onStart'
+        try:
+            assert Delegator.get_handler(o, 'Start')() == 'inBusy_onStart'
+        finally:
+            del self.SampleObj.inBusy_onStart
+        with mock.patch.object(self.SampleObj, 'identify_state', lambda self, event: 'Idle'):
+            assert Delegator.get_handler(o, 'Start')() == 'inIdle_onStart'
+        assert Delegator.get_handler(o, 'Start')() == 'onStart'
+
+        # So does changing a base class.
+        derived = type('Derived', (self.SampleObj,), {})()
+        derived.state = 'Busy'
+        assert Delegator.get_handler(derived, 'Start')() == 'onStart'
+        with mock.patch.object(self.SampleObj, 'onStart', lambda self: 'patched onStart'):
+            assert Delegator.get_handler(derived, 'Start')() == 'patched onStart'
+        assert Delegator.get_handler(derived, 'Start')() == 'onStart'
+        assert Delegator.find_class_handler(type(derived), 'Start', 'Busy') is self.SampleObj.__dict__['onStart']
+
+        # The compiled handlers match the uncompiled handlers.
+        o.state = 'Idle'
+        assert Delegator.get_handler(o, 'Start') == Delegator.resolve_handler(o, 'Start')
+
+        # Handlers set on the instance shadow the class's handlers, like getattr() does.
+        o.inIdle_onStart = lambda: 'instance inIdle_onStart'
+        o.onStop = lambda: 'instance onStop'
+        assert Delegator.get_handler(o, 'Start')() == 'instance inIdle_onStart'
+        assert Delegator.get_handler(o, 'Stop')() == 'instance onStop'
+        assert Delegator.get_handler(self.SampleObj(), 'Start')() == 'inIdle_onStart'
+        o.identify_state = lambda event: 'Busy'
+        del o.inIdle_onStart
+        assert Delegator.get_handler(o, 'Start')() == 'onStart'
+
+        # The compiled handlers do not keep their classes alive.
+        cls = type('Temporary', (), {'onStart': lambda self: 'onStart'})
+        assert Delegator.get_handler(cls(), 'Start')() == 'onStart'
+        count = len(Delegator._classes)
+        del cls
+        gc.collect()
+        assert len(Delegator._classes) == count - 1
+
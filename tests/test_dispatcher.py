@@ -1,9 +1,12 @@
 #! /usr/bin/python
 import logging
+import pytest
 import sys
 from event import Event
 from dispatcher import Dispatcher
 from context import Context
+from eventqueue import EventQueue
+from state import State
 
 class TestDispatcher:
     class SampleObj:
@@ -53,3 +56,269 @@ class TestDispatcher:
         #assert str(o1.lastHandler) == 'on4'
 
         c.stop()
+
+def caller_from_function():
+    # There is no 'self' in this frame, so the caller is the running handler's object.
+    return Dispatcher.get_caller(depth=1)
+
+class TestDispatcherCaller:
+    class SampleObj:
+        def __init__(self, peer=None):
+            self.peer = peer
+
+        def sendToPeer(self):
+            return Dispatcher.send(Event('Ping'), None, self.peer)
+
+        def onForward(self, event, *args, **kwargs):
+            return caller_from_function()
+
+        def onPing(self, event, *args, **kwargs):
+            return 'Pong'
+
+    def test(self):
+        c = Context('Caller')
+
+        o0 = self.SampleObj()
+        Dispatcher.add(obj=o0, parent_obj=None, context=c)
+        o1 = self.SampleObj(peer=o0)
+        Dispatcher.add(obj=o1, parent_obj=None, context=c)
+
+        # The caller is found from the calling method's frame.
+        assert Dispatcher.get_caller(depth=1) is self
+        assert o1.sendToPeer()() == 'Pong'
+
+        # The caller is found from the running event handler.
+        assert Dispatcher.send(Event('Forward'), o0, o1)() is o1
+        assert Dispatcher.sender.get() is None
+
+        Dispatcher.remove(o0)
+        Dispatcher.remove(o1)
+
+class TestDispatcherWeak:
+    class SampleObj:
+        def onDefault(self, event, *args, **kwargs):
+            pass
+
+    class SlotObj:
+        __slots__ = ('name',)
+
+    def test(self):
+        c = Context('context0')
+        nodes = len(Dispatcher().nodes)
+
+        source = self.SampleObj()
+        Dispatcher.add(obj=source, context=c)
+
+        for i in range(1000):
+            o = self.SampleObj()
+            Dispatcher.add(obj=o, parent_obj=source, context=c)
+            Dispatcher.add_listener(source, o)
+            Dispatcher.add_listener(o, source)
+            Dispatcher.notify(Event('Tick'), source)
+            c.poll()
+        del o
+
+        # Objects that died were removed along with their listener edges.
+        source_node = Dispatcher().get_node(source)
+        assert len(Dispatcher().nodes) == nodes + 1
+        assert not source_node.listeners and not source_node.sources
+
+        # Removing an object removes its edges too.
+        o = self.SampleObj()
+        Dispatcher.add(obj=o, context=c)
+        Dispatcher.add_listener(o, source)
+        Dispatcher.remove(o)
+        assert not source_node.sources
+
+        # Objects without weak references are kept until they are removed.
+        o = self.SlotObj()
+        Dispatcher.add(obj=o, context=c)
+        key = id(o)
+        del o
+        o = Dispatcher().nodes[key].obj
+        Dispatcher.remove(o)
+        Dispatcher.remove(source)
+        assert len(Dispatcher().nodes) == nodes
+
+class TestDispatcherInstances:
+    class SampleObj:
+        def __init__(self):
+            self.events = []
+
+        def onDefault(self, event, *args, **kwargs):
+            self.events.append(event())
+
+    def test(self):
+        c = Context('context0')
+        d0 = Dispatcher.create()
+        d1 = Dispatcher.create()
+        assert d0 is not d1 and d0 is not Dispatcher()
+
+        o0 = self.SampleObj()
+        o1 = self.SampleObj()
+        d0.add(o0, context=c)
+        d0.add(o1, context=c)
+        d1.add(o0, context=c)
+        d0.add_listener(o0, o1)
+
+        # Each dispatcher has its own registry and listeners.
+        assert id(o0) not in Dispatcher().nodes
+        assert len(d0.nodes) == 2 and len(d1.nodes) == 1
+        d1.notify(Event('Ignored'), o0)
+        d0.notify(Event('Notified'), o0)
+        c.poll()
+        assert o1.events == ['Notified']
+
+        # States send their events with their dispatcher.
+        state = State(o1, 'Initial', dispatcher=d0)
+        state.change_state('Next')
+        assert o1.events == ['Notified', State.EVENT_LEAVE, State.EVENT_ENTER]
+
+        # Methods called on the class use the default dispatcher.
+        Dispatcher.add(o0, context=c)
+        assert Dispatcher().get_node(o0) is not d0.get_node(o0)
+        Dispatcher.remove(o0)
+
+class TestDispatcherNotifyGroup:
+    class SampleObj:
+        def __init__(self):
+            self.events = 0
+
+        def onTick(self, event):
+            self.events += 1
+
+        def onFail(self, event):
+            raise Exception('Fail')
+
+    def test(self):
+        contexts = [Context('context%d' % i) for i in range(4)]
+        full = Context('full', event_queue=EventQueue(1, EventQueue.POLICY_DROP_NEWEST))
+        src = self.SampleObj()
+        Dispatcher.add(src, context=contexts[0])
+        objs = [self.SampleObj() for i in range(20)]
+        for i, o in enumerate(objs):
+            Dispatcher.add(o, context=contexts[i % len(contexts)])
+            Dispatcher.add_listener(src, o)
+        for c in contexts:
+            c.start()
+
+        # The group completes when every listener has processed the event.
+        group = Dispatcher.notify(Event('Tick'), src)
+        assert group(timeout=5)
+        assert group.done() and not group.exceptions
+        assert [o.events for o in objs] == [1] * len(objs)
+
+        # Exceptions are collected.
+        group = Dispatcher.notify(Event('Fail'), src)
+        assert group(timeout=5)
+        assert len(group.exceptions) == len(objs)
+
+        for c in contexts:
+            c.stop()
+
+        # Events that a bounded queue drops are counted as cancelled.
+        for o in objs:
+            Dispatcher.remove(o)
+        objs = [self.SampleObj() for i in range(3)]
+        for o in objs:
+            Dispatcher.add(o, context=full)
+            Dispatcher.add_listener(src, o)
+        group = Dispatcher.notify(Event('Tick'), src)
+        full.poll()
+        assert group(timeout=0)
+        assert group.cancelled == 2
+
+        # Without listeners, the group is already done.
+        assert Dispatcher.notify(Event('Tick'), objs[0])(timeout=0)
+
+        for o in objs + [src]:
+            Dispatcher.remove(o)
+
+class TestDispatcherTopics:
+    class SampleObj:
+        def __init__(self):
+            self.events = []
+
+        def onDefault(self, event):
+            self.events.append(event())
+
+    def test(self):
+        context = Context('topics')
+        src = self.SampleObj()
+        wildcard = self.SampleObj()
+        ticks = self.SampleObj()
+        both = self.SampleObj()
+        for o in (src, wildcard, ticks, both):
+            Dispatcher.add(o, context=context)
+
+        Dispatcher.add_listener(src, wildcard)
+        Dispatcher.add_listener(src, ticks, [Event('Tick')])
+        Dispatcher.add_listener(src, both, ['Tick', 'Tock'])
+        Dispatcher.add_listener(src, both)
+
+        # Subscribers are only notified of their events, and only once.
+        for name in ('Tick', 'Tock', 'Other'):
+            Dispatcher.notify(Event(name), src)
+        context.poll()
+        assert wildcard.events == ['Tick', 'Tock', 'Other']
+        assert ticks.events == ['Tick']
+        assert both.events == ['Tick', 'Tock', 'Other']
+
+        # Removing a subscription keeps the others.
+        Dispatcher.remove_listener(src, both, ['Tick'])
+        Dispatcher.remove_listener(src, ticks, ['Tock'])
+        Dispatcher.notify(Event('Tick'), src)
+        context.poll()
+        assert both.events == ['Tick', 'Tock', 'Other', 'Tick']
+        assert ticks.events == ['Tick', 'Tick']
+        assert Dispatcher().get_node(ticks).sources
+
+        # Removing the last subscription removes the edge, and removing the
+        # source removes its subscriptions.
+        Dispatcher.remove_listener(src, ticks, [Event('Tick')])
+        Dispatcher.notify(Event('Tick'), src)
+        context.poll()
+        assert ticks.events == ['Tick', 'Tick']
+        assert not Dispatcher().get_node(ticks).sources
+        Dispatcher.remove_listener(src, both)
+        Dispatcher.notify(Event('Tock'), src)
+        context.poll()
+        assert both.events == ['Tick', 'Tock', 'Other', 'Tick', 'Tick']
+        assert not Dispatcher().get_node(both).sources
+        Dispatcher.add_listener(src, ticks, ['Tick'])
+        Dispatcher.remove(src)
+        assert not Dispatcher().get_node(ticks).sources
+
+        for o in (wildcard, ticks, both):
+            Dispatcher.remove(o)
+
+class TestDispatcherRemoveRace:
+    class SampleObj:
+        pass
+
+    def test(self):
+        d = Dispatcher.create()
+        c = Context('context0')
+
+        # A listener is not linked to or from a node that was removed after
+        # add_listener() looked it up.
+        for removed in (0, 1):
+            objs = [self.SampleObj(), self.SampleObj()]
+            for o in objs:
+                d.add(o, context=c)
+            nodes = {id(o): d.get_node(o) for o in objs}
+            d.remove(objs[removed])
+
+            d.get_node = lambda obj: nodes[id(obj)]
+            try:
+                with pytest.raises(Exception):
+                    d.add_listener(objs[0], objs[1])
+                with pytest.raises(Exception):
+                    d.add_listener(objs[0], objs[1], [Event('Tick')])
+            finally:
+                del d.get_node
+
+            src_node, dst_node = nodes[id(objs[0])], nodes[id(objs[1])]
+            assert not src_node.listeners and not src_node.topics
+            assert not dst_node.sources
+
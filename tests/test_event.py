@@ -1 +1,61 @@
 #! /usr/bin/python
+import gc
+import pickle
+from delegator import Delegator
+from event import Event
+from event import EventId
+from state import State
+from state import StateEvent
+
+class TestEventId:
+    class SampleObj:
+        def onPushed(self, event):
+            return 'onPushed'
+
+        def on7(self, event):
+            return 'on7'
+
+    def test(self):
+        # Names are interned once, and keep working as strings.
+        event = Event('Pushed')
+        assert isinstance(event(), EventId)
+        assert event() is Event('Pushed')() is Event.intern(''.join(['Push', 'ed']))
+        assert event() == 'Pushed' and str(event) == 'Pushed'
+        assert event.code == event().code
+        assert Event.id_of(event.code) is event()
+        assert Event('Released').code != event.code
+
+        # State events and constants are interned.
+        assert StateEvent(State.EVENT_ENTER, 'Started').id is State.EVENT_ENTER
+        assert StateEvent('Timeout', 'Started').code == State.EVENT_TIMEOUT.code
+
+        # Ids that are no longer used are discarded, and their codes are reused.
+        code = Event('Dynamic0').code
+        gc.collect()
+        assert Event.id_of(code) is None
+        codes = len(Event.codes)
+        for i in range(1000):
+            assert Event('Dynamic%d' % i).code < codes + 1
+        assert len(Event.codes) <= codes + 1
+
+        # Ids that are not strings are not interned.
+        assert Event(7)() == 7 and Event(7).code is None
+
+        # Unpickled ids are interned again.
+        assert pickle.loads(pickle.dumps(event))() is event()
+
+        o = self.SampleObj()
+        assert Delegator.get_handler(o, event)(event) == 'onPushed'
+        assert Delegator.get_handler(o, 'Pushed')(event) == 'onPushed'
+        assert Delegator.get_handler(o, Event(7))(Event(7)) == 'on7'
+
+class TestEventAttributes:
+    def test(self):
+        # Events accept attributes other than their slots.
+        event = Event('Pushed')
+        event.button = 'green'
+        assert event.button == 'green'
+        event = StateEvent('Timeout', 'Started')
+        event.attempt = 2
+        assert event.attempt == 2
+
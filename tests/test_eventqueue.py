@@ -0,0 +1,195 @@
+#! /usr/bin/python
+import pytest
+import queue
+import threading
+import time
+from event import Event
+from eventqueue import DequeQueue
+from eventqueue import EventQueue
+from eventqueue import PriorityEventQueue
+from future import Future
+
+class TestEventQueue:
+    def test(self):
+        for q in [EventQueue(), DequeQueue(), PriorityEventQueue()]:
+            assert q.get_many(False) == []
+
+            q.put(0)
+            q.put_many([1, 2, None, 3])
+            assert q.qsize() == 5
+
+            # Items after the termination item stay queued.
+            assert q.get_many() == [0, 1, 2, None]
+            assert q.get_many() == [3]
+            assert q.empty()
+
+class TestDequeQueueThreaded:
+    def test(self):
+        q = DequeQueue()
+        producers = 4
+        count = 10000
+
+        def produce(producer):
+            for i in range(count):
+                q.put((producer, i))
+            q.put(None)
+
+        threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(producers)]
+        for thread in threads:
+            thread.start()
+
+        # Each producer's items arrive in order.
+        received = {producer: [] for producer in range(producers)}
+        stopped = 0
+        while stopped < producers:
+            for item in q.get_many():
+                if item is None:
+                    stopped += 1
+                else:
+                    received[item[0]].append(item[1])
+
+        for thread in threads:
+            thread.join()
+        for producer in range(producers):
+            assert received[producer] == list(range(count))
+
+class TestPriorityEventQueue:
+    class Item:
+        def __init__(self, name, priority):
+            self.name = name
+            self.priority = priority
+
+    def test(self):
+        q = PriorityEventQueue(aging=0.05, batch_size=2)
+
+        q.put(self.Item('low', Event.PRIORITY_LOW))
+        q.put_many([self.Item('normal0', Event.PRIORITY_NORMAL), self.Item('normal1', Event.PRIORITY_NORMAL)])
+        q.put(self.Item('high', Event.PRIORITY_HIGH))
+
+        # Items are returned by priority, in batches.
+        assert [item.name for item in q.get_many()] == ['high', 'normal0']
+        assert [item.name for item in q.get_many()] == ['normal1', 'low']
+
+        # An item that has waited long enough is returned before newer items with a higher priority.
+        q.put(self.Item('low', Event.PRIORITY_LOW))
+        time.sleep(0.15)
+        q.put(self.Item('high', Event.PRIORITY_HIGH))
+        assert [item.name for item in q.get_many()] == ['low', 'high']
+
+        # The termination item is returned after the items queued before it, whatever their priority.
+        q = PriorityEventQueue(batch_size=None)
+        q.put_many([self.Item('low%d' % i, Event.PRIORITY_LOW) for i in range(3)])
+        q.put(None)
+        q.put(self.Item('low3', Event.PRIORITY_LOW))
+        assert [item.name if item else item for item in q.get_many()] == ['low0', 'low1', 'low2', None]
+        assert [item.name for item in q.get_many()] == ['low3']
+
+class TestBoundedEventQueue:
+    class SampleObj:
+        pass
+
+    def test(self):
+        o = self.SampleObj()
+
+        def futures(count, name='Event'):
+            return [Future(lambda event, src_obj, dst_obj, value: value, Event(name), None, o, i) for i in range(count)]
+
+        # Block, with a timeout.
+        q = EventQueue(2)
+        q.put_many(futures(2))
+        with pytest.raises(queue.Full):
+            q.put(futures(1)[0], timeout=0.01)
+        assert q.counters()['blocked'] == 1
+
+        # Fail without adding any of a batch.
+        q = EventQueue(2, EventQueue.POLICY_FAIL)
+        q.put(futures(1)[0])
+        with pytest.raises(queue.Full):
+            q.put_many(futures(2))
+        assert q.qsize() == 1
+        assert q.counters()['failed'] == 2
+
+        # Drop the oldest items, which are cancelled.
+        q = EventQueue(2, EventQueue.POLICY_DROP_OLDEST)
+        items = futures(4)
+        q.put_many(items)
+        assert q.get_many() == items[2:]
+        assert items[0]() is None and items[1].done()
+        assert q.counters()['dropped'] == 2
+
+        # A priority queue drops the item with the lowest priority.
+        q = PriorityEventQueue(maxsize=2, policy=EventQueue.POLICY_DROP_OLDEST)
+        items = futures(3)
+        items[0].priority = Event.PRIORITY_HIGH
+        items[1].priority = Event.PRIORITY_LOW
+        items[2].priority = Event.PRIORITY_LOW
+        q.put_many(items)
+        assert q.get_many() == [items[0], items[2]]
+        assert items[1]() is None
+
+        # Drop the newest items, but never the termination event.
+        q = PriorityEventQueue(maxsize=2, policy=EventQueue.POLICY_DROP_NEWEST)
+        items = futures(3)
+        q.put_many(items)
+        q.put(None)
+        assert q.get_many() == items[:2] + [None]
+        assert items[2]() is None
+
+        # Coalesce duplicates, which get the result of the pending event.
+        q = EventQueue(2, EventQueue.POLICY_COALESCE)
+        items = futures(2, 'Refresh') + futures(1, 'Refresh')
+        q.put_many(items)
+        assert q.qsize() == 2
+        for future in q.get_many():
+            future.process()
+        assert items[1]() == 1 and items[2]() == 1
+        assert q.counters()['coalesced'] == 1
+
+class TestCoalescingEventQueue:
+    class SampleObj:
+        pass
+
+    def test(self):
+        o0 = self.SampleObj()
+        o1 = self.SampleObj()
+
+        def future(name, dst_obj, value):
+            return Future(lambda event, src_obj, dst_obj, value: value, Event(name), None, dst_obj, value)
+
+        # Merge duplicates for the same destination and event into the first one.
+        q = EventQueue(coalesce=EventQueue.COALESCE_MERGE)
+        items = [future('Refresh', o0, 0), future('Refresh', o0, 1), future('Refresh', o1, 2), future('Other', o0, 3)]
+        q.put_many(items)
+        assert q.get_many() == [items[0], items[2], items[3]]
+        for item in [items[0], items[2], items[3]]:
+            item.process()
+        assert [item() for item in items] == [0, 0, 2, 3]
+
+        # Events that were already removed are not coalesced.
+        q.put(items[1])
+        assert q.qsize() == 1
+
+        # Events are not merged into a pending event that was cancelled.
+        q = EventQueue(coalesce=EventQueue.COALESCE_MERGE)
+        items = [future('Refresh', o0, 0), future('Refresh', o0, 1), future('Refresh', o0, 2)]
+        q.put(items[0])
+        items[0].cancel()
+        q.put_many(items[1:])
+        assert q.get_many() == items[:2]
+        for item in q.get_many(False) + items[:2]:
+            item.process()
+        assert [item() for item in items] == [None, 1, 1]
+        assert q.counters()['coalesced'] == 1
+
+        # Replace the pending event's arguments with the newest ones.
+        q = PriorityEventQueue(coalesce=EventQueue.COALESCE_REPLACE)
+        items = [future('Refresh', o0, i) for i in range(3)]
+        q.put_many(items)
+        q.get_many()[0].process()
+        assert [item() for item in items] == [2, 2, 2]
+        assert q.counters()['coalesced'] == 2
+
+        # Only coalesce events with equal arguments.
+        q = EventQueue(coalesce=EventQueue.COALESCE_MERGE, coalesce_args=True)
+        q.put_many([future('Refresh', o0, 0), future('Refresh', o0, 1), future('Refresh', o0, 0), future('Refresh', o0, [0]), future('Refresh', o0, [0])])
+        assert q.qsize() == 4
@@ -1,4 +1,6 @@
 #! /usr/bin/python
+import threading
+import pytest
 from iron.future import Future
 from iron.future import ScheduledFuture
 
@@ -31,3 +33,159 @@ class TestScheduledFuture:
         f = ScheduledFuture(60, None, None)
         f.cancel()
         assert f() is None
+
+def sampleRecords(*args, **kwargs):
+    return {'records': [{'id': i} for i in range(3)], 'tags': {'a', 'b'}}
+
+class TestFutureResultPolicy:
+    def test(self):
+
+        # By default the result itself is returned.
+        f = Future(sampleRecords)
+        f.process()
+        assert f() is f()
+
+        # The result is copied once and the copy is returned on every read.
+        f = Future(sampleRecords)
+        f.result_policy = Future.RESULT_COPY_ONCE
+        f.process()
+        assert f() is f()
+        assert f() == sampleRecords()
+
+        # Every read returns a new copy.
+        f = Future(sampleRecords)
+        f.result_policy = Future.RESULT_DEEPCOPY
+        f.process()
+        assert f() is not f()
+        assert f() == sampleRecords()
+
+        # The result cannot be modified.
+        f = Future(sampleRecords)
+        f.result_policy = Future.RESULT_FROZEN
+        f.process()
+        result = f()
+        assert result['records'] == ({'id': 0}, {'id': 1}, {'id': 2})
+        assert result['tags'] == frozenset(['a', 'b'])
+        try:
+            result['records'][0]['id'] = 1
+            assert False
+        except TypeError:
+            pass
+
+class TestFutureCancelRun:
+    def test(self):
+
+        # A future that is running cannot be cancelled or processed again.
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def blocking():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'done'
+
+        f = Future(blocking)
+        thread = threading.Thread(target=f.process)
+        thread.start()
+        assert started.wait(5)
+        assert not f.cancel()
+        f.process()
+        assert not f.done()
+        release.set()
+        thread.join()
+        assert f() == 'done'
+        assert len(calls) == 1
+
+        # A future that is cancelled is never run.
+        f = Future(blocking)
+        assert f.cancel()
+        f.process()
+        assert f() is None
+        assert len(calls) == 1
+
+        # Either cancel() or process() wins a race, never both.
+        for i in range(200):
+            ran = []
+            f = Future(ran.append, i)
+            cancelled = []
+            threads = [threading.Thread(target=f.process), threading.Thread(target=lambda: cancelled.append(f.cancel()))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert f.done()
+            assert cancelled[0] != bool(ran)
+
+class TestFutureWaiters:
+    def test(self):
+
+        # Many callers can block on one future, and all of them get the result.
+        f = Future(sampleFunction, 1, 2)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(f())) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        f.process()
+        for thread in threads:
+            thread.join(5)
+        assert results == [3] * 8
+
+        # No waiter is allocated for a future that is already done.
+        f = Future(sampleFunction, 1, 2)
+        f.process()
+        assert f() == 3
+        assert f._Future__waiter is None
+
+        # A cancelled future wakes its waiters.
+        f = Future(None)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(f()))
+        thread.start()
+        f.cancel()
+        thread.join(5)
+        assert results == [None]
+
+def sampleFail(*args, **kwargs):
+    raise ValueError('Fail')
+
+class TestFutureMerge:
+    def test(self):
+
+        # Merged futures get the result of the future they were merged into.
+        f = Future(sampleFunction, 1, 2)
+        merged = [Future(None) for i in range(3)]
+        for future in merged:
+            f.merge(future)
+        f.process()
+        assert [future() for future in merged] == [3, 3, 3]
+
+        # And its exception.
+        f = Future(sampleFail)
+        merged = Future(None)
+        f.merge(merged)
+        f.process()
+        with pytest.raises(ValueError):
+            merged()
+
+        # They are cancelled with it.
+        f = Future(sampleFunction, 1, 2)
+        merged = Future(None)
+        f.merge(merged)
+        assert f.cancel()
+        assert merged.done() and merged() is None
+
+        # A future that is merged into a future that is done is completed right away.
+        f = Future(sampleFunction, 1, 2)
+        f.process()
+        merged = Future(None)
+        f.merge(merged)
+        assert merged() == 3
+
+        f = Future(None)
+        f.cancel()
+        merged = Future(None)
+        f.merge(merged)
+        assert merged.done() and merged() is None
+
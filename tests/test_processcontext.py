@@ -0,0 +1,71 @@
+#! /usr/bin/python
+import multiprocessing
+import os
+import tempfile
+import time
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from processcontext import ProcessContext
+
+class Counter:
+    def __init__(self, start):
+        self.count = start
+
+    def onAdd(self, event, value):
+        self.count += value
+        return self.count
+
+    def onPid(self, event):
+        return os.getpid()
+
+    def onFail(self, event):
+        raise ValueError('Fail')
+
+    def onArm(self, event, path):
+        Dispatcher.schedule(0.05, Event('Fire'), self, self, path)
+
+    def onFire(self, event, path):
+        with open(path, 'w') as f:
+            f.write(str(self.count))
+
+class TestProcessContext:
+    def test(self):
+        # Workers are spawned by default, and can be forked where fork is available.
+        self.check(ProcessContext('worker'))
+        if 'fork' in multiprocessing.get_all_start_methods():
+            self.check(ProcessContext('forked', start_method='fork'))
+
+    def check(self, c):
+        local = Context('local')
+        src = Counter(0)
+        Dispatcher.add(obj=src, context=local)
+
+        c.start()
+
+        o = c.add(Counter, 10)
+
+        # Events are processed by the object in the worker process.
+        assert Dispatcher.send(Event('Pid'), src, o)() != os.getpid()
+        futures = [Dispatcher.queue(Event('Add'), src, o, 1) for i in range(5)]
+        assert [future() for future in futures] == [11, 12, 13, 14, 15]
+        assert Dispatcher.schedule(0.01, Event('Add'), src, o, 5)() == 20
+
+        # Scheduled events fire in the worker without further messages.
+        path = os.path.join(tempfile.mkdtemp(), 'fired')
+        Dispatcher.send(Event('Arm'), src, o, path)()
+        time.sleep(0.5)
+        with open(path) as f:
+            assert f.read() == '20'
+
+        # Exceptions are raised in the caller.
+        try:
+            Dispatcher.send(Event('Fail'), src, o)()
+            assert False
+        except ValueError:
+            pass
+
+        c.remove(o)
+        Dispatcher.remove(src)
+
+        assert c.stop(5)
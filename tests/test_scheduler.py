@@ -0,0 +1,37 @@
+#! /usr/bin/python
+import threading
+from scheduler import Scheduler
+
+class TestScheduler:
+    def test(self):
+        s = Scheduler('TestScheduler')
+
+        fired = []
+        done = threading.Event()
+
+        def callback(name):
+            fired.append(name)
+            if name == 'last':
+                done.set()
+
+        # Timers fire in the order of their deadlines, not the order they were scheduled.
+        s.schedule(0.03, callback, 'last')
+        s.schedule(0.01, callback, 'first')
+        s.schedule(0.02, callback, 'second')
+
+        cancelled = s.schedule(0.015, callback, 'cancelled')
+        assert cancelled.cancel()
+        assert not cancelled.cancel()
+
+        assert done.wait(5)
+        assert fired == ['first', 'second', 'last']
+        assert len(s) == 0
+
+class TestSchedulerCompact:
+    def test(self):
+        s = Scheduler('TestSchedulerCompact')
+
+        timers = [s.schedule(60, print) for i in range(Scheduler.COMPACT_THRESHOLD * 2)]
+        for timer in timers:
+            timer.cancel()
+        assert len(s) == 0
@@ -1,8 +1,13 @@
 #! /usr/bin/python
 import logging
 import sys
+import time
 from context import Context
+from delegator import Delegator
 from dispatcher import Dispatcher
+from event import Event
+from eventqueue import EventQueue
+from future import ScheduledFuture
 from state import State
 
 class TestState:
@@ -133,3 +138,235 @@ class TestState:
         assert str(o.last_handler) == 'inStopped_onEnter'
 
         c.stop()
+
+class TestHierarchicalState:
+    class SampleObj:
+        STATE_IDLE = 'Idle'
+        STATE_AUTHENTICATING = 'Connected/Authenticating'
+        STATE_WAITING = 'Connected/Authenticating/WaitingForToken'
+        STATE_READY = 'Connected/Ready'
+
+        def __init__(self):
+            self.handlers = []
+            self.fail_leave = False
+            self.state = State(self, self.STATE_IDLE, {self.STATE_WAITING: 60})
+
+        def identify_state(self, event):
+            return self.state.identify_state(event)
+
+        def inIdle_onConnect(self, event):
+            self.state.change_state(self.STATE_WAITING)
+
+        def inIdle_onLeave(self, event):
+            self.handlers.append('inIdle_onLeave')
+
+        def inConnected_onEnter(self, event):
+            self.handlers.append('inConnected_onEnter')
+
+        def inConnected_onLeave(self, event):
+            self.handlers.append('inConnected_onLeave')
+
+        def inConnected_onDisconnect(self, event):
+            self.handlers.append('inConnected_onDisconnect')
+            self.state.change_state(self.STATE_IDLE)
+
+        def inConnected_Authenticating_onEnter(self, event):
+            self.handlers.append('inConnected_Authenticating_onEnter')
+
+        def inConnected_Authenticating_onLeave(self, event):
+            if self.fail_leave:
+                raise RuntimeError('Cannot leave the state.')
+            self.handlers.append('inConnected_Authenticating_onLeave')
+
+        def inConnected_Authenticating_WaitingForToken_onToken(self, event):
+            self.handlers.append('inConnected_Authenticating_WaitingForToken_onToken')
+            self.state.change_state(self.STATE_READY)
+
+        def inConnected_Authenticating_onDefault(self, event):
+            self.handlers.append('inConnected_Authenticating_onDefault')
+
+        def inConnected_Ready_onEnter(self, event):
+            self.handlers.append('inConnected_Ready_onEnter')
+
+    def test(self):
+        c = Context('Root')
+        o = self.SampleObj()
+        Dispatcher.add(o, context=c)
+
+        # Entering a nested state enters each of its outer states.
+        Dispatcher.send(Event('Connect'), o, o)
+        assert o.state.current_state == o.STATE_WAITING
+        assert o.state.in_state('Connected') and o.state.in_state(o.STATE_AUTHENTICATING)
+        assert not o.state.in_state('Connected/Auth')
+        assert o.handlers == ['inIdle_onLeave', 'inConnected_onEnter', 'inConnected_Authenticating_onEnter']
+
+        # Handlers are resolved from the innermost state.
+        del o.handlers[:]
+        Dispatcher.send(Event('Other'), o, o)
+        assert o.handlers == ['inConnected_Authenticating_onDefault']
+        assert Delegator.resolve_handler(o, Event('Other')).__name__ == 'inConnected_Authenticating_onDefault'
+
+        # A state change that fails while leaving stays in the old state.
+        o.fail_leave = True
+        try:
+            o.state.change_state(o.STATE_READY)
+            assert False
+        except RuntimeError:
+            pass
+        o.fail_leave = False
+        assert o.state.current_state == o.STATE_WAITING
+        assert o.state.state_timer.pending()
+
+        # Only the states below the common outer state are left and entered.
+        del o.handlers[:]
+        Dispatcher.send(Event('Token'), o, o)
+        assert o.state.current_state == o.STATE_READY
+        assert o.handlers == ['inConnected_Authenticating_WaitingForToken_onToken', 'inConnected_Authenticating_onLeave', 'inConnected_Ready_onEnter']
+
+        del o.handlers[:]
+        Dispatcher.send(Event('Disconnect'), o, o)
+        assert o.state.current_state == o.STATE_IDLE
+        assert o.handlers == ['inConnected_onDisconnect', 'inConnected_onLeave']
+
+        assert State.path_change('A/B/C', 'A/D') == (['A/B/C', 'A/B'], ['A/D'])
+        assert State.path_change('A', 'A/B') == ([], ['A/B'])
+
+        Dispatcher.remove(o)
+
+class TestStateTimer:
+    class SampleObj:
+        STATE_IDLE = 'Idle'
+        STATE_WAITING = 'Waiting'
+
+        def __init__(self):
+            self.timeouts = 0
+            self.state = State(self, self.STATE_IDLE, {self.STATE_WAITING : 0.05})
+
+        def identify_state(self, event):
+            return self.state.identify_state(event)
+
+        def inWaiting_onTimeout(self, event):
+            self.timeouts += 1
+            self.state.change_state(self.STATE_IDLE)
+
+    def test(self):
+        c = Context('Timer')
+        o = self.SampleObj()
+        Dispatcher.add(o, context=c)
+
+        # Restarting the timer reuses it and its scheduler entry.
+        o.state.change_state(o.STATE_WAITING)
+        timer = o.state.state_timer
+        timers = len(ScheduledFuture.scheduler)
+        for i in range(100):
+            o.state.change_state(o.STATE_IDLE)
+            o.state.change_state(o.STATE_WAITING)
+        assert o.state.state_timer is timer
+        assert len(ScheduledFuture.scheduler) == timers
+
+        time.sleep(0.2)
+        c.poll()
+        assert o.timeouts == 1
+        assert o.state.current_state == o.STATE_IDLE
+
+        # A timeout that was posted before the state changed is ignored.
+        o.state.change_state(o.STATE_WAITING)
+        time.sleep(0.2)
+        o.state.change_state(o.STATE_IDLE)
+        c.poll()
+        assert o.timeouts == 1
+
+        # A timeout that expires again while it is posted is processed once.
+        o.state.change_state(o.STATE_WAITING)
+        time.sleep(0.2)
+        o.state.change_state(o.STATE_IDLE)
+        o.state.change_state(o.STATE_WAITING)
+        time.sleep(0.2)
+        c.poll()
+        assert o.timeouts == 2
+        assert o.state.state_timer is timer
+
+        Dispatcher.remove(o)
+
+class TestStateTimerBoundedQueue:
+    class SampleObj:
+        STATE_IDLE = 'Idle'
+        STATE_WAITING = 'Waiting'
+
+        def __init__(self):
+            self.timeouts = 0
+            self.state = State(self, self.STATE_IDLE, {self.STATE_WAITING : 0.05})
+
+        def identify_state(self, event):
+            return self.state.identify_state(event)
+
+        def onFill(self, event):
+            pass
+
+        def inWaiting_onTimeout(self, event):
+            self.timeouts += 1
+            self.state.change_state(self.STATE_IDLE)
+
+    def test(self):
+        for policy in (EventQueue.POLICY_DROP_NEWEST, EventQueue.POLICY_FAIL):
+            c = Context('Timer', event_queue=EventQueue(1, policy))
+            o = self.SampleObj()
+            Dispatcher.add(o, context=c)
+
+            # A timeout that does not fit in the full queue is dropped, and
+            # neither the scheduler nor the queue are left blocked.
+            Dispatcher.queue(Event('Fill'), o, o)
+            o.state.change_state(o.STATE_WAITING)
+            time.sleep(0.2)
+            c.poll()
+            assert o.timeouts == 0
+            assert c.counters()['dropped'] + c.counters()['failed'] == 1
+
+            # The timer still works once the queue has room.
+            o.state.change_state(o.STATE_IDLE)
+            o.state.change_state(o.STATE_WAITING)
+            time.sleep(0.2)
+            c.poll()
+            assert o.timeouts == 1
+            assert o.state.current_state == o.STATE_IDLE
+
+            Dispatcher.remove(o)
+
+class TestStateTimerCoalesce:
+    class SampleObj:
+        STATE_IDLE = 'Idle'
+        STATE_WAITING = 'Waiting'
+
+        def __init__(self):
+            self.timeouts = 0
+            self.state = State(self, self.STATE_IDLE, {self.STATE_WAITING : 0.05})
+
+        def identify_state(self, event):
+            return self.state.identify_state(event)
+
+        def inWaiting_onTimeout(self, event):
+            self.timeouts += 1
+            self.state.change_state(self.STATE_IDLE)
+
+    def test(self):
+        c = Context('Timer', event_queue=EventQueue(coalesce=EventQueue.COALESCE_MERGE))
+        o = self.SampleObj()
+        Dispatcher.add(o, context=c)
+
+        # A timeout that goes stale while it is queued does not swallow the
+        # timeouts that are queued after it.
+        for i in range(3):
+            o.state.change_state(o.STATE_WAITING)
+            time.sleep(0.2)
+            o.state.change_state(o.STATE_IDLE)
+            c.poll()
+        assert o.timeouts == 0
+
+        o.state.change_state(o.STATE_WAITING)
+        time.sleep(0.2)
+        c.poll()
+        assert o.timeouts == 1
+        assert c.counters()['coalesced'] == 0
+
+        Dispatcher.remove(o)
+
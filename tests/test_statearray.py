@@ -0,0 +1,55 @@
+#! /usr/bin/python
+from statearray import StateArray
+from statearray import numpy
+from statetable import StateTable
+
+class TestStateArray:
+    class SampleObj:
+        table = StateTable(['Idle', 'Connecting', 'Connected'], 'Idle', {'Connecting' : 5})
+        table.add('Idle', 'Connect', 'Connecting')
+        table.add('Connecting', 'Ack', 'Connected', action='acked')
+        table.add('Connecting', 'Timeout', 'Idle')
+        table.add('Connected', 'Close', 'Idle', guard=lambda obj, event, index: index % 2 == 0)
+
+        def __init__(self):
+            self.acked_indices = []
+            self.entered = []
+
+        def acked(self, event, index):
+            self.acked_indices.append(index)
+
+        def inConnected_onEnter(self, event, index):
+            self.entered.append((index, event.old_state))
+
+    def test(self):
+        for use_numpy in [False] + ([True] if numpy is not None else []):
+            o = self.SampleObj()
+            states = StateArray(o.table, 10, o, use_numpy=use_numpy)
+            assert states.count('Idle') == 10
+            assert states.next_deadline() is None
+
+            # Transitions without side effects only update the column.
+            assert states.process('Connect', range(6)) == 6
+            assert states.count('Connecting') == 6
+            assert states.next_deadline() is not None
+            assert states.process('Unknown') == 0
+
+            # Handlers and actions are only called for transitions that have them.
+            assert states.process('Ack', [0, 1, 2, 3, 7]) == 4
+            assert sorted(o.acked_indices) == [0, 1, 2, 3]
+            assert sorted(o.entered) == [(0, 'Connecting'), (1, 'Connecting'), (2, 'Connecting'), (3, 'Connecting')]
+            assert states.state_of(3) == 'Connected' and states.state_of(7) == 'Idle'
+
+            # Guards decide for each instance.
+            assert states.process('Close') == 2
+            assert states.count('Connected') == 2
+            assert states.state_of(1) == 'Connected'
+
+            # Only the instances whose deadlines passed time out.
+            assert states.expire() == 0
+            assert states.expire(states.next_deadline() + 1) == 2
+            assert states.count('Idle') == 8
+            assert states.next_deadline() is None
+
+            states.reset()
+            assert states.count('Idle') == 10
@@ -0,0 +1,101 @@
+#! /usr/bin/python
+import pytest
+from context import Context
+from dispatcher import Dispatcher
+from event import Event
+from state import State
+from statetable import StateTable
+from statetable import TableState
+
+class TestStateTable:
+    class SampleObj:
+        STATE_STOPPED = 'Stopped'
+        STATE_STARTED = 'Started'
+        STATE_PAUSED = 'Paused'
+
+        table = StateTable([STATE_STOPPED, STATE_STARTED, STATE_PAUSED], STATE_STOPPED, {STATE_PAUSED : 30})
+        table.add(STATE_STOPPED, 'Start', STATE_STARTED, action='started')
+        table.add(STATE_STARTED, 'Pause', STATE_PAUSED, guard=lambda obj, event: obj.pausable)
+        table.add(STATE_STARTED, 'Stop', STATE_STOPPED, notify=True)
+        table.add(STATE_STARTED, 'Start', STATE_STARTED, action='started')
+        table.add(STATE_PAUSED, 'Start', STATE_STARTED, action='started')
+        table.add(STATE_PAUSED, State.EVENT_TIMEOUT, STATE_STOPPED)
+
+        def __init__(self):
+            self.handlers = []
+            self.starts = 0
+            self.pausable = False
+            self.state = TableState(self, self.table)
+
+        def identify_state(self, event):
+            return self.state.identify_state(event)
+
+        def started(self, event):
+            self.starts += 1
+
+        def inStopped_onEnter(self, event):
+            self.handlers.append(('inStopped_onEnter', event.old_state, event.new_state))
+
+        def inStarted_onLeave(self, event):
+            self.handlers.append(('inStarted_onLeave', event.old_state, event.new_state))
+
+        def onEnter(self, event):
+            self.handlers.append(('onEnter', event.old_state, event.new_state))
+
+        def onDefault(self, event, *args, **kwargs):
+            return self.state.process(event, *args, **kwargs)
+
+    def test(self):
+        c = Context('Root')
+        o = self.SampleObj()
+        Dispatcher.add(o, context=c)
+
+        assert o.state.current_state == 'Stopped'
+        assert Dispatcher.send(Event('Start'), o, o)()
+        assert o.state.current_state == 'Started'
+        assert o.starts == 1
+        assert o.handlers == [('onEnter', 'Stopped', 'Started')]
+
+        # A transition to the same state only calls its action.
+        assert o.state.process(Event('Start'))
+        assert o.starts == 2 and len(o.handlers) == 1
+
+        # Guards and unknown events.
+        assert not o.state.process(Event('Pause'))
+        assert not o.state.process(Event('Unknown'))
+        o.pausable = True
+        assert o.state.process(Event('Pause'))
+        assert o.state.current_state == 'Paused'
+        assert o.state.state_timer.pending()
+
+        # Timeouts for a state that was already left are ignored.
+        stale = o.table.timeout_events[o.table.state_index['Started']]
+        assert not o.state.process(stale)
+        assert o.state.process(o.table.timeout_events[o.table.state_index['Paused']])
+        assert o.state.current_state == 'Stopped'
+        assert not o.state.state_timer.pending()
+
+        # Listeners are notified, and change_state() calls the handlers.
+        listener = self.SampleObj()
+        Dispatcher.add(listener, context=c)
+        Dispatcher.add_listener(o, listener, [State.EVENT_STATE_CHANGE])
+        o.state.change_state('Started')
+        assert o.handlers[-1] == ('onEnter', 'Stopped', 'Started')
+        assert o.state.process('Stop')
+        assert o.handlers[-2:] == [('inStarted_onLeave', 'Started', 'Stopped'), ('inStopped_onEnter', 'Started', 'Stopped')]
+        c.poll()
+
+        # Tables are validated when they are compiled.
+        with pytest.raises(ValueError):
+            StateTable(['A'], 'B').compile()
+        with pytest.raises(ValueError):
+            StateTable(['A'], 'A').add('A', 'Go', 'B').compile()
+        with pytest.raises(ValueError):
+            StateTable(['A', 'B'], 'A').add('A', 'Go', 'B').add('A', Event('Go'), 'A').compile()
+        with pytest.raises(ValueError):
+            StateTable(['A'], 'A', {'B': 1}).compile()
+        with pytest.raises(Exception):
+            o.table.add('Stopped', 'Go', 'Started')
+
+        Dispatcher.remove(listener)
+        Dispatcher.remove(o)